@@ -0,0 +1,100 @@
+"""
+Frames and bytes pushed to a busy room when every chat/plugin message is its
+own frame (default) vs collected by RoomBatcher and pushed once per tick
+(--room-batch-ms). Writers are not started, so this measures the lobby side:
+encoding, framing and queueing, plus the frames each player has to read.
+
+    python benchmarks/bench_batching.py
+    python benchmarks/bench_batching.py --room 50 --per-tick 20
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import socket_state, DEFAULT_COMPRESS_THRESHOLD
+from server.session_registry import SessionRegistry
+from server.outbound import POLICY_DROP_OLDEST
+from server.room_batcher import RoomBatcher
+
+
+class FakeSocket:
+    """Stands in for a client socket; only needs to be hashable."""
+    def shutdown(self, how):
+        pass
+
+def build(players):
+    registry = SessionRegistry(max_queued=1 << 20, policy=POLICY_DROP_OLDEST)
+    registry.start_writer = lambda sock, queue: None
+    for i in range(players):
+        sock = FakeSocket()
+        state = socket_state(sock)
+        state.encoding = ENCODING_BINARY
+        state.compress_threshold = DEFAULT_COMPRESS_THRESHOLD
+        registry.add(sock, f"player{i}", ROLE_PLAYER)
+    return registry
+
+def tick_messages(players, per_tick, tick):
+    # Mostly emoji reactions from a plugin, with some chat in between
+    messages = []
+    for i in range(per_tick):
+        sender = f"player{(tick * per_tick + i) % players}"
+        if i % 4 == 0:
+            messages.append(create_message(MSG_CHAT, {"room_id": "42", "sender": sender, "message": "nice move!"}))
+        else:
+            messages.append(create_message(MSG_PLUGIN_MESSAGE, {
+                "room_id": "42", "plugin_id": "reactions", "sender": sender, "payload": {"emoji": "clap"}}))
+    return messages
+
+def drain(registry):
+    """Frames and bytes queued per player so far, emptying the queues."""
+    frames = size = 0
+    for queue in registry.outbound.values():
+        while True:
+            buffers = queue.pop_nowait()
+            if buffers is None:
+                break
+            frames += 1
+            size += sum(len(buffer) for buffer in buffers)
+    return frames, size
+
+def run(players, per_tick, ticks, batched):
+    registry = build(players)
+    usernames = [f"player{i}" for i in range(players)]
+    batcher = RoomBatcher(registry, tick=None) if batched else None
+    frames = size = 0
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for msg in tick_messages(players, per_tick, tick):
+            if batcher:
+                batcher.add("42", usernames, msg)
+            else:
+                registry.push(usernames, msg)
+        if batcher:
+            batcher.flush()
+        tick_frames, tick_size = drain(registry)
+        frames += tick_frames
+        size += tick_size
+    elapsed = time.perf_counter() - start
+    return elapsed / (ticks * per_tick) * 1e6, frames / (ticks * players), size / (ticks * players)
+
+def main():
+    parser = argparse.ArgumentParser(description='Room batching benchmark')
+    parser.add_argument('--room', type=int, default=20, help='Players in the room (default: 20)')
+    parser.add_argument('--per-tick', type=int, default=10, help='Messages sent to the room per tick (default: 10)')
+    parser.add_argument('--ticks', type=int, default=200, help='Ticks simulated (default: 200)')
+    args = parser.parse_args()
+
+    print(f"{args.room} players, {args.per_tick} messages per tick, {args.ticks} ticks\n")
+    print(f"{'Mode':<10} | {'us per message':>14} | {'Frames/player/tick':>18} | {'Bytes/player/tick':>17}")
+    print("-" * 69)
+    for label, batched in [("immediate", False), ("batched", True)]:
+        us, frames, size = run(args.room, args.per_tick, args.ticks, batched)
+        print(f"{label:<10} | {us:>14.1f} | {frames:>18.1f} | {size:>17.0f}")
+
+if __name__ == "__main__":
+    main()
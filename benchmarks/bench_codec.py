@@ -0,0 +1,126 @@
+"""
+Microbenchmark for the framed JSON codec (shared/utils.send_json/recv_json).
+
+Compares the current functions with the previous implementation (two sendall
+calls per frame, recv_all growing a bytes object) over TCP loopback.
+
+    python benchmarks/bench_codec.py
+    python benchmarks/bench_codec.py --sizes 100 10000 --max-frames 500
+"""
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.utils import send_json, recv_json
+
+DEFAULT_SIZES = [100, 1000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+# Previous implementation, kept here as the baseline
+def legacy_send_json(sock, data):
+    json_bytes = json.dumps(data).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(json_bytes)))
+    sock.sendall(json_bytes)
+
+def legacy_recv_all(sock, n):
+    data = b''
+    while len(data) < n:
+        packet = sock.recv(n - len(data))
+        if not packet:
+            return None
+        data += packet
+    return data
+
+def legacy_recv_json(sock):
+    len_bytes = legacy_recv_all(sock, 4)
+    if not len_bytes:
+        return None
+    msg_len = struct.unpack('>I', len_bytes)[0]
+    json_bytes = legacy_recv_all(sock, msg_len)
+    if not json_bytes:
+        return None
+    return json.loads(json_bytes.decode('utf-8'))
+
+
+CODECS = {
+    "legacy": (legacy_send_json, legacy_recv_json),
+    "current": (send_json, recv_json),
+}
+
+def make_payload(size):
+    msg = {"type": "LIST_GAMES", "data": {"blob": ""}}
+    overhead = len(json.dumps(msg))
+    msg["data"]["blob"] = "x" * max(0, size - overhead)
+    return msg
+
+def tcp_pair():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    return client, server
+
+def echo_server(sock, send, recv):
+    try:
+        while True:
+            msg = recv(sock)
+            if msg is None:
+                break
+            send(sock, msg)
+    except OSError:
+        pass
+
+def run_case(name, size, frames):
+    send, recv = CODECS[name]
+    client, server = tcp_pair()
+    t = threading.Thread(target=echo_server, args=(server, send, recv), daemon=True)
+    t.start()
+
+    payload = make_payload(size)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        send(client, payload)
+        recv(client)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    client.close()
+    t.join()
+    server.close()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    # Each round trip moves two frames
+    return (2 * frames) / elapsed, p99
+
+def main():
+    parser = argparse.ArgumentParser(description='Framed codec microbenchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Payload sizes in bytes')
+    parser.add_argument('--max-frames', type=int, default=2000,
+                        help='Upper bound on round trips per case')
+    args = parser.parse_args()
+
+    print(f"{'Size':>10} | {'Codec':<8} | {'Frames/s':>10} | {'p99 (ms)':>9}")
+    print("-" * 48)
+    for size in args.sizes:
+        # Keep every case around 50 MB of traffic
+        frames = max(5, min(args.max_frames, 50_000_000 // size))
+        for name in CODECS:
+            fps, p99 = run_case(name, size, frames)
+            print(f"{size:>10} | {name:<8} | {fps:>10.0f} | {p99 * 1000:>9.3f}")
+
+if __name__ == "__main__":
+    main()
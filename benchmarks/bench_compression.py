@@ -0,0 +1,82 @@
+"""
+Compression ratio and CPU cost per frame type for the negotiated zlib frame
+compression. Frames below the threshold are sent uncompressed.
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --games 1000 --reviews 5000 --threshold 512
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import SocketState, encode_frame, decode_frame, HEADER, DEFAULT_COMPRESS_THRESHOLD
+
+WORDS = ["fun", "great", "laggy", "classic", "strategy", "cards", "board", "friends", "quick", "hard"]
+
+def text(n):
+    return " ".join(random.choice(WORDS) for _ in range(n))
+
+def sample_frames(n_games, n_reviews, n_rooms):
+    games = [{
+        "game_id": f"dev{i % 50}_game{i}", "name": f"game{i}", "description": text(12), "type": "CLI",
+        "author": f"dev{i % 50}", "latest_version": "1.0.3", "versions": ["1.0.3"],
+        "min_players": 2, "max_players": 4
+    } for i in range(n_games)]
+    details = dict(games[0])
+    details["reviews"] = [{"username": f"player{i}", "rating": random.randint(1, 5), "comment": text(8)}
+                          for i in range(n_reviews)]
+    details["avg_rating"] = 3.4
+    rooms = [{"id": str(i), "game_id": games[i % n_games]["game_id"], "game_name": games[i % n_games]["name"],
+              "host": f"player{i}", "players": [f"player{i}", f"player{i + 1}"], "max_players": 4,
+              "status": "WAITING"} for i in range(n_rooms)]
+    return {
+        MSG_LIST_GAMES: create_response(STATUS_OK, data={"games": games}),
+        MSG_GAME_DETAILS: create_response(STATUS_OK, data={"game": details}),
+        MSG_LIST_ROOMS: create_response(STATUS_OK, data={"rooms": rooms}),
+        MSG_CHAT: create_message(MSG_CHAT, {"room_id": "1", "sender": "player1", "message": "gl hf"}),
+    }
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame compression benchmark')
+    parser.add_argument('--games', type=int, default=300)
+    parser.add_argument('--reviews', type=int, default=1000)
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--threshold', type=int, default=DEFAULT_COMPRESS_THRESHOLD)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(1)
+    plain = SocketState()
+    compressed = SocketState()
+    compressed.compress_threshold = args.threshold
+
+    print(f"{'Frame':<14} | {'Raw B':>8} | {'Sent B':>8} | {'Ratio':>6} | {'Encode us':>10} | {'Decode us':>10} | {'Extra us':>9}")
+    print("-" * 84)
+    for name, msg in sample_frames(args.games, args.reviews, args.rooms).items():
+        raw_header, raw_body = encode_frame(msg, plain)
+        header, body = encode_frame(msg, compressed)
+        flags = HEADER.unpack(header)[0]
+
+        plain_enc = timed(lambda: encode_frame(msg, plain), args.iterations)
+        enc = timed(lambda: encode_frame(msg, compressed), args.iterations)
+        plain_dec = timed(lambda: decode_frame(0, raw_body), args.iterations)
+        dec = timed(lambda: decode_frame(flags, body), args.iterations)
+        # CPU added by compression on both ends, per frame
+        extra = (enc - plain_enc) + (dec - plain_dec)
+        ratio = len(raw_body) / len(body)
+        print(f"{name:<14} | {len(raw_body):>8} | {len(body):>8} | {ratio:>6.1f} | {enc:>10.1f} | {dec:>10.1f} | {extra:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Writes/s of the storage backends with a large store: registrations and
+reviews against the JSON files (every write rewrites the whole collection),
+the journal (one appended line) and SQLite (one INSERT). The journal and
+SQLite stores start from the same JSON files, so their first start is
+reported too. Reads are timed as well, since login and GAME_DETAILS go
+through them.
+
+    python benchmarks/bench_database.py
+    python benchmarks/bench_database.py --users 10000 --reviews 100000 --json-writes 20
+    python benchmarks/bench_database.py --backends journal sqlite
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import ROLE_PLAYER
+from server.database import Database
+from server.sqlite_database import SqliteDatabase
+from server.journal_database import JournalDatabase
+
+BACKENDS = {"json": Database, "journal": JournalDatabase, "sqlite": SqliteDatabase}
+
+
+def prefill(storage_dir, users, reviews, games):
+    """Writes JSON files of the given size in the layout Database uses."""
+    os.makedirs(storage_dir, exist_ok=True)
+    with open(os.path.join(storage_dir, "users.json"), "w") as f:
+        json.dump({f"{ROLE_PLAYER}:player{i}": {"username": f"player{i}", "password": "secret", "role": ROLE_PLAYER}
+                   for i in range(users)}, f, indent=4)
+    with open(os.path.join(storage_dir, "games.json"), "w") as f:
+        json.dump({f"dev_game{i}": {"game_id": f"dev_game{i}", "name": f"game{i}", "author": "dev",
+                                    "latest_version": "1.0.0", "versions": ["1.0.0"]}
+                   for i in range(games)}, f, indent=4)
+    by_game = {}
+    rng = random.Random(1)
+    for i in range(reviews):
+        by_game.setdefault(f"dev_game{rng.randrange(games)}", []).append(
+            {"username": f"player{rng.randrange(max(1, users))}", "rating": rng.randint(1, 5), "comment": "Fun with friends"})
+    with open(os.path.join(storage_dir, "reviews.json"), "w") as f:
+        json.dump(by_game, f, indent=4)
+
+def rate(operation, count):
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    return count / elapsed, elapsed / count * 1000
+
+def measure(db, writes, reads, games):
+    rng = random.Random(2)
+    results = {}
+    results["register"] = rate(lambda i: db.register_user(f"new{i}", "secret", ROLE_PLAYER), writes)
+    results["review"] = rate(lambda i: db.add_review(f"dev_game{rng.randrange(games)}", f"new{i}", 5, "gg"), writes)
+    results["login"] = rate(lambda i: db.login_user(f"player{i}", "secret", ROLE_PLAYER), reads)
+    results["get_reviews"] = rate(lambda i: db.get_reviews(f"dev_game{i % games}"), reads)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Storage backend benchmark')
+    parser.add_argument('--users', type=int, default=100000, help='Users already stored (default: 100000)')
+    parser.add_argument('--reviews', type=int, default=1000000, help='Reviews already stored (default: 1000000)')
+    parser.add_argument('--games', type=int, default=1000, help='Games the reviews are spread over (default: 1000)')
+    parser.add_argument('--json-writes', type=int, default=3, help='Writes timed on JSON, each rewrites a whole file (default: 3)')
+    parser.add_argument('--writes', type=int, default=5000, help='Writes timed on the journal and SQLite (default: 5000)')
+    parser.add_argument('--reads', type=int, default=2000, help='Reads timed per backend (default: 2000)')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS),
+                        help='Backends to compare (default: all)')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_database_")
+    try:
+        results = {}
+        for backend in args.backends:
+            # A fresh copy each time, so every backend starts from the same data
+            storage_dir = os.path.join(tmp_dir, backend)
+            print(f"{backend}: prefilling {args.users} users and {args.reviews} reviews over {args.games} games...")
+            prefill(storage_dir, args.users, args.reviews, args.games)
+            start = time.perf_counter()
+            db = BACKENDS[backend](storage_dir)
+            opened = time.perf_counter() - start
+            results[backend] = measure(db, args.json_writes if backend == "json" else args.writes, args.reads, args.games)
+            start = time.perf_counter()
+            db.close()
+            closed = time.perf_counter() - start
+            print(f"{backend}: first start {opened:.2f}s, close {closed:.2f}s")
+            shutil.rmtree(storage_dir, ignore_errors=True)
+
+        print(f"\n{'Operation':<12} | " + " | ".join(f"{backend + ' ops/s':>14}" for backend in results))
+        print("-" * (15 + 17 * len(results)))
+        for operation in next(iter(results.values())):
+            print(f"{operation:<12} | " + " | ".join(f"{rows[operation][0]:>14.1f}" for rows in results.values()))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Encode/decode cost and bytes on the wire for JSON vs the negotiated binary
+encoding, per hot lobby message type.
+
+    python benchmarks/bench_encoding.py
+    python benchmarks/bench_encoding.py --iterations 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import SocketState, encode_frame, decode_frame, HEADER
+
+
+def sample_messages():
+    players = [f"player{i}" for i in range(8)]
+    return {
+        MSG_ROOM_UPDATE: create_message(MSG_ROOM_UPDATE, {
+            "room_id": "42",
+            "players": players,
+            "host": players[0],
+            "status": "WAITING",
+            "joined": players[-1]
+        }),
+        MSG_CHAT: create_message(MSG_CHAT, {
+            "room_id": "42",
+            "sender": "player3",
+            "message": "gg, one more round?"
+        }),
+        MSG_PLUGIN_MESSAGE: create_message(MSG_PLUGIN_MESSAGE, {
+            "room_id": "42",
+            "plugin_id": "chat_plugin",
+            "sender": "player5",
+            "payload": {"text": "nice move"}
+        }),
+        MSG_LIST_ROOMS + " reply": create_response(STATUS_OK, data={"rooms": [
+            {"id": str(i), "game_id": "dev_connect4", "game_name": "connect4", "host": f"host{i}",
+             "players": players[:3], "max_players": 4, "status": "WAITING"}
+            for i in range(20)
+        ]}),
+    }
+
+def measure(msg, encoding, iterations):
+    options = SocketState()
+    options.encoding = encoding
+    header, body = encode_frame(msg, options)
+    flags = HEADER.unpack(header)[0]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode_frame(msg, options)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode_frame(flags, body)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    assert decode_frame(flags, body) == msg
+    return len(header) + len(body), encode_us, decode_us
+
+def main():
+    parser = argparse.ArgumentParser(description='Wire encoding benchmark')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'Message':<20} | {'Encoding':<8} | {'Bytes':>6} | {'Encode (us)':>11} | {'Decode (us)':>11}")
+    print("-" * 68)
+    for name, msg in sample_messages().items():
+        for encoding in (ENCODING_JSON, ENCODING_BINARY):
+            size, enc, dec = measure(msg, encoding, args.iterations)
+            print(f"{name:<20} | {encoding:<8} | {size:>6} | {enc:>11.2f} | {dec:>11.2f}")
+
+if __name__ == "__main__":
+    main()
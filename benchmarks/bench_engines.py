@@ -0,0 +1,115 @@
+"""
+Idle-connection benchmark for the server's threads and asyncio engines.
+
+Starts the lobby server once per engine in a scratch directory, parks N idle
+client sockets on it, then measures server memory/thread count and the
+round-trip latency of LIST_ROOMS from one logged-in player.
+
+    python benchmarks/bench_engines.py
+    python benchmarks/bench_engines.py --connections 10000 --engines asyncio
+"""
+import argparse
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import send_json, recv_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def server_stats(pid):
+    rss_kb = threads = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return rss_kb / 1024, threads
+
+def wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+def call(sock, msg_type, data=None):
+    send_json(sock, create_message(msg_type, data))
+    return recv_json(sock)
+
+def run_engine(engine, port, connections, requests):
+    with tempfile.TemporaryDirectory() as tmp:
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "server", "main.py"), "--host", "127.0.0.1",
+             "--port", str(port), "--engine", engine],
+            cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        idle = []
+        try:
+            wait_for_port(port)
+            base_rss, _ = server_stats(server.pid)
+
+            start = time.perf_counter()
+            for _ in range(connections):
+                idle.append(socket.create_connection(("127.0.0.1", port)))
+            connect_s = time.perf_counter() - start
+            time.sleep(1) # let the server finish accepting
+
+            player = socket.create_connection(("127.0.0.1", port))
+            creds = {"username": "bench", "password": "pw", "role": ROLE_PLAYER}
+            call(player, MSG_REGISTER, creds)
+            call(player, MSG_LOGIN, creds)
+            latencies = []
+            for _ in range(requests):
+                t0 = time.perf_counter()
+                call(player, MSG_LIST_ROOMS)
+                latencies.append(time.perf_counter() - t0)
+            player.close()
+
+            rss, threads = server_stats(server.pid)
+        finally:
+            for sock in idle:
+                sock.close()
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"{engine:<8} | {connect_s:>9.2f} | {rss:>7.1f} | {(rss - base_rss) * 1024 / connections:>9.1f} | "
+          f"{threads:>7} | {p50:>8.0f} | {p99:>8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Server engine idle-connection benchmark')
+    parser.add_argument('--connections', type=int, default=2000, help='Idle sockets to hold open')
+    parser.add_argument('--requests', type=int, default=2000, help='LIST_ROOMS round trips to time')
+    parser.add_argument('--engines', nargs='+', default=["threads", "asyncio"], choices=["threads", "asyncio"])
+    parser.add_argument('--port', type=int, default=18888)
+    args = parser.parse_args()
+
+    # Both ends of every connection live on this machine
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.connections + 100 > hard:
+        print(f"Warning: open file limit {hard} is too low for {args.connections} connections")
+
+    print(f"{args.connections} idle connections, {args.requests} LIST_ROOMS round trips")
+    print(f"{'Engine':<8} | {'Connect s':>9} | {'RSS MB':>7} | {'KB/conn':>9} | {'Threads':>7} | {'p50 us':>8} | {'p99 us':>8}")
+    print("-" * 74)
+    for i, engine in enumerate(args.engines):
+        run_engine(engine, args.port + i, args.connections, args.requests)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Cost of pushing one lobby message to many sessions through SessionRegistry.push,
+encoding it once per recipient (previous behaviour) vs once per distinct wire
+settings. Writers are not started, so this measures the fan-out itself:
+serialization, framing and queueing.
+
+    python benchmarks/bench_fanout.py
+    python benchmarks/bench_fanout.py --lobby 10000 --json-share 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import encode_frame, socket_state, DEFAULT_COMPRESS_THRESHOLD
+from server.session_registry import SessionRegistry
+from server.outbound import POLICY_DROP_OLDEST, coalesce_key
+
+
+class FakeSocket:
+    """Stands in for a client socket; only needs to be hashable and weak-referenceable."""
+    def shutdown(self, how):
+        pass
+
+class PerRecipientRegistry(SessionRegistry):
+    # Previous push(): every recipient gets its own json.dumps/compress/framing
+    def push(self, usernames, message, role=ROLE_PLAYER):
+        with self.lock:
+            targets = [(sock, self.outbound[sock]) for username in usernames
+                       for sock in self.by_user.get((username, role), ())]
+        key = coalesce_key(message)
+        for sock, queue in targets:
+            queue.put(encode_frame(message, socket_state(sock)), key)
+
+def build(registry_class, sessions, json_share):
+    registry = registry_class(max_queued=64, policy=POLICY_DROP_OLDEST)
+    registry.start_writer = lambda sock, queue: None
+    json_sessions = int(sessions * json_share)
+    for i in range(sessions):
+        sock = FakeSocket()
+        state = socket_state(sock)
+        if i >= json_sessions:
+            # Current clients negotiate binary + zlib at login
+            state.encoding = ENCODING_BINARY
+            state.compress_threshold = DEFAULT_COMPRESS_THRESHOLD
+        registry.add(sock, f"player{i}", ROLE_PLAYER)
+    return registry
+
+def messages(recipients):
+    players = [f"player{i}" for i in range(min(recipients, 8))]
+    return {
+        MSG_ROOM_UPDATE: create_message(MSG_ROOM_UPDATE, {
+            "room_id": "42", "players": players, "host": players[0], "status": "WAITING", "joined": players[-1]
+        }),
+        MSG_CHAT: create_message(MSG_CHAT, {
+            "room_id": "42", "sender": players[0], "message": "gg, one more round?"
+        }),
+        "LOBBY_NOTICE": create_message("LOBBY_NOTICE", {
+            "message": "Server restarting for maintenance in 5 minutes", "rooms": [
+                {"id": str(i), "game_name": "connect4", "players": players[:3], "status": "WAITING"}
+                for i in range(40)
+            ]
+        }),
+    }
+
+def measure(registry, usernames, msg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        registry.push(usernames, msg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Lobby fan-out benchmark')
+    parser.add_argument('--room', type=int, default=8, help='Players in a room')
+    parser.add_argument('--lobby', type=int, default=5000, help='Sessions for lobby-wide pushes')
+    parser.add_argument('--json-share', type=float, default=0.0,
+                        help='Fraction of sessions still on plain JSON frames')
+    parser.add_argument('--iterations', type=int, default=20, help='Lobby-wide pushes per case (rooms do 50x more)')
+    args = parser.parse_args()
+
+    print(f"{'Case':<28} | {'Per-recipient us':>16} | {'Encode-once us':>14} | {'Speedup':>7}")
+    print("-" * 75)
+    for label, recipients, iterations in [("room", args.room, args.iterations * 50),
+                                          ("lobby", args.lobby, args.iterations)]:
+        old = build(PerRecipientRegistry, recipients, args.json_share)
+        new = build(SessionRegistry, recipients, args.json_share)
+        usernames = [f"player{i}" for i in range(recipients)]
+        for msg_type, msg in messages(recipients).items():
+            old_us = measure(old, usernames, msg, iterations)
+            new_us = measure(new, usernames, msg, iterations)
+            print(f"{f'{label} x{recipients} {msg_type}':<28} | {old_us:>16.1f} | {new_us:>14.1f} | {old_us / new_us:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
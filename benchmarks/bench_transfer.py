@@ -0,0 +1,110 @@
+"""
+Loopback throughput benchmark for game/plugin transfers (send_file/recv_file).
+
+Compares the current kernel sendfile + recv_into path with the previous
+4 KiB Python-level loop. Reports MB/s and process CPU seconds per GB moved.
+
+    python benchmarks/bench_transfer.py
+    python benchmarks/bench_transfer.py --size-mb 500 --chunk-sizes 65536 1048576
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.utils import send_file, recv_file, recv_all, FILE_CHUNK_SIZE
+
+
+# Previous implementation, kept here as the baseline
+def legacy_send_file(sock, file_path):
+    file_size = os.path.getsize(file_path)
+    sock.sendall(struct.pack('>Q', file_size))
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                break
+            sock.sendall(chunk)
+
+def legacy_recv_file(sock, dest_path, chunk_size=None):
+    size_bytes = recv_all(sock, 8)
+    if not size_bytes:
+        return False
+    file_size = struct.unpack('>Q', size_bytes)[0]
+    with open(dest_path, 'wb') as f:
+        remaining = file_size
+        while remaining > 0:
+            chunk_size = 4096 if remaining > 4096 else remaining
+            chunk = recv_all(sock, chunk_size)
+            if not chunk:
+                return False
+            f.write(chunk)
+            remaining -= len(chunk)
+    return True
+
+
+def tcp_pair():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    return client, server
+
+def run_case(send, recv, src_path, dest_path, chunk_size):
+    sender, receiver = tcp_pair()
+    t = threading.Thread(target=send, args=(sender, src_path))
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    t.start()
+    ok = recv(receiver, dest_path, chunk_size)
+    t.join()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    sender.close()
+    receiver.close()
+    if not ok or os.path.getsize(dest_path) != os.path.getsize(src_path):
+        raise RuntimeError("transfer incomplete")
+    return wall, cpu
+
+def main():
+    parser = argparse.ArgumentParser(description='File transfer throughput benchmark')
+    parser.add_argument('--size-mb', type=int, default=200, help='Archive size in MB')
+    parser.add_argument('--chunk-sizes', type=int, nargs='+',
+                        default=[64 * 1024, FILE_CHUNK_SIZE, 1024 * 1024],
+                        help='recv_file chunk sizes to try')
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    gb = size / (1024 ** 3)
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "game.zip")
+        dest = os.path.join(tmp, "received.zip")
+        with open(src, 'wb') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        cases = [("legacy 4 KiB", legacy_send_file, legacy_recv_file, 4096)]
+        for chunk_size in args.chunk_sizes:
+            cases.append((f"sendfile/{chunk_size // 1024} KiB", send_file, recv_file, chunk_size))
+
+        print(f"Transferring {args.size_mb} MB over loopback")
+        print(f"{'Path':<20} | {'MB/s':>8} | {'CPU s/GB':>9}")
+        print("-" * 43)
+        for name, send, recv, chunk_size in cases:
+            wall, cpu = run_case(send, recv, src, dest, chunk_size)
+            print(f"{name:<20} | {args.size_mb / wall:>8.1f} | {cpu / gb:>9.2f}")
+
+if __name__ == "__main__":
+    main()
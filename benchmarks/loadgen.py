@@ -0,0 +1,414 @@
+"""
+Load generator for the lobby server.
+
+Simulated players and developers connect with the real protocol, register
+and log in, then run scenarios picked from a weighted mix:
+
+    browse    LIST_GAMES, GAME_DETAILS
+    chat      JOIN_ROOM on a waiting room (or CREATE_ROOM), CHAT x3, LEAVE_ROOM
+    play      CREATE_ROOM, START_GAME, LEAVE_ROOM (launches and stops a game process)
+    download  DOWNLOAD_GAME of the test game
+    update    UPDATE_GAME with a new version (developers only)
+
+With --rate, scenarios arrive as a Poisson process at that many per second
+and wait for a free simulated user; without it every user runs scenarios
+back to back. Prints throughput plus p50/p95/p99 latency and error rate per
+message type.
+
+    python benchmarks/loadgen.py --spawn --players 50 --duration 30
+    python benchmarks/loadgen.py --port 8888 --players 200 --developers 2 --rate 100 --mix browse=60,chat=30,download=10
+    python benchmarks/loadgen.py --spawn --server-args "--engine asyncio" --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import send_json, recv_response, recv_file, send_file, pop_pushes, socket_state, \
+    calculate_file_hash, verify_resume_point, DEFAULT_COMPRESS_THRESHOLD
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "loadgen"
+DEFAULT_MIX = "browse=50,chat=30,play=5,download=10,update=5"
+SCENARIOS = ["browse", "chat", "play", "download", "update"]
+DEVELOPER_SCENARIOS = {"update"}
+CHATS_PER_ROOM = 3
+
+# A game whose server only announces its port and idles until the lobby stops it
+GAME_SERVER = '''import sys, time
+print(f"Game Server started on {sys.argv[1]}", flush=True)
+time.sleep(600)
+'''
+
+
+class Stats:
+    """Latencies and errors per message type, shared by every simulated user."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {} # msg_type -> [seconds]
+        self.errors = {} # msg_type -> count
+        self.lag = [] # seconds a scenario waited for a free user after it arrived
+
+    def record(self, msg_type, seconds, error=False):
+        with self.lock:
+            self.latency.setdefault(msg_type, []).append(seconds)
+            if error:
+                self.errors[msg_type] = self.errors.get(msg_type, 0) + 1
+
+    def record_lag(self, seconds):
+        with self.lock:
+            self.lag.append(seconds)
+
+def percentile(values, p):
+    # values must be sorted
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+class LoadError(Exception):
+    """A request failed in a way that ends the current scenario."""
+
+class SimulatedUser:
+    """One connection speaking the real protocol; every request is timed into Stats."""
+    def __init__(self, args, stats, name, role, scratch_dir):
+        self.args = args
+        self.stats = stats
+        self.name = name
+        self.role = role
+        self.sock = None
+        self.scratch_dir = scratch_dir
+        self.download_path = os.path.join(scratch_dir, f"{name}.zip")
+        # Developers each own one test game
+        self.game_id = f"{name}_loadgen"
+        self.version = 0
+
+    def connect(self):
+        self.sock = socket.create_connection((self.args.host, self.args.port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.call(MSG_REGISTER, {"username": self.name, "password": PASSWORD, "role": self.role}, allow_error=True)
+        response = self.call(MSG_LOGIN, {"username": self.name, "password": PASSWORD, "role": self.role,
+                                         "encodings": SUPPORTED_ENCODINGS, "compression": SUPPORTED_COMPRESSION})
+        options = socket_state(self.sock)
+        options.encoding = response["data"].get("encoding", ENCODING_JSON)
+        if response["data"].get("compression") == COMPRESSION_ZLIB:
+            options.compress_threshold = DEFAULT_COMPRESS_THRESHOLD
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def call(self, msg_type, data=None, allow_error=False, upload=None, download=None):
+        """Sends one request and waits for its response. With a file to upload or
+        a path to download to, the transfer is part of the request and its timing."""
+        started = time.perf_counter()
+        error = True
+        try:
+            send_json(self.sock, create_message(msg_type, data))
+            response = self._response(msg_type)
+            if response["status"] == STATUS_OK and upload:
+                offset = verify_resume_point(upload, response["data"].get("offset", 0), response["data"].get("chunk_sha256"))
+                send_file(self.sock, upload, offset)
+                response = self._response(msg_type)
+            elif response["status"] == STATUS_OK and download:
+                if not recv_file(self.sock, download):
+                    raise LoadError(f"{msg_type}: transfer interrupted")
+            error = response["status"] != STATUS_OK
+            if error and not allow_error:
+                raise LoadError(f"{msg_type}: {response.get('message')}")
+            return response
+        except OSError as e:
+            raise LoadError(f"{msg_type}: {e}")
+        finally:
+            # A refused registration for an existing user is expected, not an error
+            self.stats.record(msg_type, time.perf_counter() - started, error and not allow_error)
+            # Room updates and chat pile up while we only read responses
+            pop_pushes(self.sock)
+
+    def _response(self, msg_type):
+        response = recv_response(self.sock)
+        if response is None:
+            raise LoadError(f"{msg_type}: connection closed")
+        return response
+
+    def _archive(self):
+        path = os.path.join(self.scratch_dir, f"{self.game_id}-{self.version}.zip")
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("server.py", GAME_SERVER)
+            # Padding so downloads move a realistic amount of data
+            archive.writestr("assets.bin", os.urandom(self.args.game_kb * 1024))
+        return path
+
+    def publish(self):
+        """Uploads this developer's test game unless an earlier run already did."""
+        games = self.call(MSG_LIST_GAMES)["data"]["games"]
+        game = next((game for game in games if game["game_id"] == self.game_id), None)
+        if game:
+            # Continue the version sequence of the earlier run
+            self.version = max(int(version.split(".")[-1]) for version in game["versions"])
+            return
+        self.version = 1
+        archive = self._archive()
+        self.call(MSG_UPLOAD_GAME, {
+            "game_name": "loadgen", "description": "Load generator test game", "game_type": "CLI",
+            "version": f"1.{self.version}", "min_players": 1, "max_players": 8, "sha256": calculate_file_hash(archive)
+        }, upload=archive)
+        os.remove(archive)
+
+    # Scenarios
+
+    def browse(self, world):
+        games = self.call(MSG_LIST_GAMES)["data"]["games"]
+        if games:
+            self.call(MSG_GAME_DETAILS, {"game_id": random.choice(games)["game_id"]})
+
+    def chat(self, world):
+        rooms = self.call(MSG_LIST_ROOMS)["data"]["rooms"]
+        waiting = [room for room in rooms if room["status"] == "WAITING" and len(room["players"]) < room["max_players"]]
+        joined = False
+        if waiting:
+            room_id = random.choice(waiting)["id"]
+            # Someone else may have filled or closed it meanwhile
+            joined = self.call(MSG_JOIN_ROOM, {"room_id": room_id}, allow_error=True)["status"] == STATUS_OK
+        if not joined:
+            room_id = self.call(MSG_CREATE_ROOM, {"game_id": world.game_id})["data"]["room_id"]
+        try:
+            for i in range(CHATS_PER_ROOM):
+                # The host may close the room under us; that ends the conversation, not the run
+                if self.call(MSG_CHAT, {"room_id": room_id, "message": f"gl hf #{i}"}, allow_error=True)["status"] != STATUS_OK:
+                    break
+                time.sleep(self.args.think)
+        finally:
+            self.call(MSG_LEAVE_ROOM)
+
+    def play(self, world):
+        room_id = self.call(MSG_CREATE_ROOM, {"game_id": world.game_id})["data"]["room_id"]
+        try:
+            self.call(MSG_START_GAME, {"room_id": room_id})
+            time.sleep(self.args.think)
+        finally:
+            # The host leaving stops the game process
+            self.call(MSG_LEAVE_ROOM)
+
+    def download(self, world):
+        self.call(MSG_DOWNLOAD_GAME, {"game_id": world.game_id}, download=self.download_path)
+
+    def update(self, world):
+        self.version += 1
+        archive = self._archive()
+        try:
+            self.call(MSG_UPDATE_GAME, {"game_id": self.game_id, "version": f"1.{self.version}",
+                                        "sha256": calculate_file_hash(archive)}, upload=archive)
+        finally:
+            os.remove(archive)
+
+class World:
+    """What the simulated users share: the game players use, published by the first developer."""
+    def __init__(self, args):
+        self.game_id = f"{args.prefix}_dev0_loadgen"
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def run_user(user, world, scenarios, weights, arrivals, deadline, failures):
+    try:
+        user.connect()
+        if user.role == ROLE_DEVELOPER:
+            user.publish()
+    except (LoadError, OSError) as e:
+        failures.append(f"{user.name}: {e}")
+        return
+    try:
+        while time.time() < deadline:
+            if arrivals is not None:
+                arrived = arrivals.take(deadline)
+                if arrived is None:
+                    return
+                user.stats.record_lag(time.time() - arrived)
+            scenario = random.choices(scenarios, weights)[0]
+            started = time.perf_counter()
+            failed = False
+            try:
+                getattr(user, scenario)(world)
+            except LoadError as e:
+                failed = True
+                failures.append(f"{user.name} {scenario}: {e}")
+                # A failed transfer leaves the stream in an unknown state
+                user.close()
+                user.connect()
+            finally:
+                user.stats.record(f"scenario:{scenario}", time.perf_counter() - started, failed)
+            if arrivals is None:
+                time.sleep(user.args.think)
+    except (LoadError, OSError) as e:
+        failures.append(f"{user.name}: {e}")
+    finally:
+        user.close()
+
+class Arrivals:
+    """Poisson arrivals of scenarios; users take them in order, so a backlog shows as lag."""
+    def __init__(self, rate):
+        self.rate = rate
+        self.cond = threading.Condition()
+        self.queue = deque()
+        self.stopped = False
+
+    def run(self, deadline):
+        next_at = time.time()
+        while next_at < deadline:
+            time.sleep(max(0, next_at - time.time()))
+            with self.cond:
+                self.queue.append(next_at)
+                self.cond.notify()
+            next_at += random.expovariate(self.rate)
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def take(self, deadline):
+        with self.cond:
+            while not self.queue:
+                if self.stopped:
+                    return None
+                self.cond.wait(max(0.01, deadline - time.time()))
+                if time.time() >= deadline:
+                    return None
+            return self.queue.popleft()
+
+def start_server(args):
+    tmp = tempfile.mkdtemp(prefix="loadgen-server-")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server", "main.py"), "--host", args.host, "--port", str(args.port),
+         "--log-level", "WARNING"] + shlex.split(args.server_args),
+        cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection((args.host, args.port)).close()
+            return server, tmp
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+def report(stats, elapsed, failures, args):
+    rows = []
+    total = errors = 0
+    for msg_type in sorted(stats.latency, key=lambda t: (t.startswith("scenario:"), t)):
+        values = sorted(stats.latency[msg_type])
+        count = len(values)
+        failed = stats.errors.get(msg_type, 0)
+        if not msg_type.startswith("scenario:"):
+            total += count
+            errors += failed
+        rows.append({"type": msg_type, "count": count, "errors": failed, "per_second": round(count / elapsed, 1),
+                     "p50_ms": percentile(values, 50) * 1000, "p95_ms": percentile(values, 95) * 1000,
+                     "p99_ms": percentile(values, 99) * 1000, "max_ms": values[-1] * 1000})
+
+    print(f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, "
+          f"{errors} errors ({errors / max(1, total):.2%})")
+    if stats.lag:
+        lag = sorted(stats.lag)
+        print(f"Scenario start lag p50 {percentile(lag, 50) * 1000:.1f} ms, p99 {percentile(lag, 99) * 1000:.1f} ms "
+              f"(high lag means the users could not keep up with --rate)")
+    print(f"\n{'Message':<20} | {'Count':>7} | {'Per s':>7} | {'Err %':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'max ms':>8}")
+    print("-" * 97)
+    for row in rows:
+        print(f"{row['type']:<20} | {row['count']:>7} | {row['per_second']:>7.1f} | {row['errors'] / row['count']:>6.1%} | "
+              f"{row['p50_ms']:>8.2f} | {row['p95_ms']:>8.2f} | {row['p99_ms']:>8.2f} | {row['max_ms']:>8.2f}")
+    if failures:
+        print(f"\n{len(failures)} failed scenarios, first ones:")
+        for failure in failures[:5]:
+            print(f"  {failure}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"duration": elapsed, "requests": total, "errors": errors, "messages": rows,
+                       "args": vars(args)}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Lobby server load generator')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Server address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8888, help='Server port (default: 8888)')
+    parser.add_argument('--spawn', action='store_true', help='Start a fresh server in a scratch directory for the run')
+    parser.add_argument('--server-args', type=str, default='', help='Extra arguments for the spawned server, e.g. "--engine asyncio"')
+    parser.add_argument('--players', type=int, default=20, help='Simulated players (default: 20)')
+    parser.add_argument('--developers', type=int, default=1, help='Simulated developers (default: 1)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load (default: 20)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Scenarios started per second across all users, Poisson arrivals; 0 = back to back (default: 0)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--think', type=float, default=0.05, help='Seconds a user pauses between actions (default: 0.05)')
+    parser.add_argument('--game-kb', type=int, default=256, help='Size of the test game archive in KB (default: 256)')
+    parser.add_argument('--prefix', type=str, default='load', help='Username prefix, so runs can share a server (default: load)')
+    parser.add_argument('--json', type=str, default=None, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    server = server_dir = None
+    if args.spawn:
+        server, server_dir = start_server(args)
+    stats = Stats()
+    world = World(args)
+    scratch_dir = tempfile.mkdtemp(prefix="loadgen-")
+    try:
+        # Players need a game before anyone starts
+        owner = SimulatedUser(args, stats, f"{args.prefix}_dev0", ROLE_DEVELOPER, scratch_dir)
+        owner.connect()
+        owner.publish()
+        owner.close()
+        users = [SimulatedUser(args, stats, f"{args.prefix}_p{i}", ROLE_PLAYER, scratch_dir) for i in range(args.players)]
+        users += [SimulatedUser(args, stats, f"{args.prefix}_dev{i}", ROLE_DEVELOPER, scratch_dir) for i in range(args.developers)]
+        player_mix = {name: weight for name, weight in args.mix.items() if name not in DEVELOPER_SCENARIOS}
+        developer_mix = {name: weight for name, weight in args.mix.items() if name in DEVELOPER_SCENARIOS}
+
+        started = time.time()
+        deadline = started + args.duration
+        arrivals = Arrivals(args.rate) if args.rate > 0 else None
+        failures = []
+        threads = []
+        for user in users:
+            mix = developer_mix if user.role == ROLE_DEVELOPER else player_mix
+            if not mix:
+                continue
+            thread = threading.Thread(target=run_user, daemon=True,
+                                      args=(user, world, list(mix), list(mix.values()), arrivals, deadline, failures))
+            thread.start()
+            threads.append(thread)
+        if arrivals:
+            threading.Thread(target=arrivals.run, args=(deadline,), daemon=True).start()
+        print(f"Running {len(threads)} simulated users for {args.duration:g}s against {args.host}:{args.port}...")
+        for thread in threads:
+            thread.join(max(0, deadline - time.time()) + 30)
+        report(stats, time.time() - started, failures, args)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        if server:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(server_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from shared.protocol import *
-from shared.utils import send_json, recv_json
+from shared.utils import send_json, recv_json, socket_state, DEFAULT_COMPRESS_THRESHOLD
 from shared.gui_auth import AuthDialog
 
 class Auth:
@@ -29,7 +29,9 @@ class Auth:
         msg = create_message(MSG_LOGIN, {
             "username": username,
             "password": password,
-            "role": ROLE_DEVELOPER
+            "role": ROLE_DEVELOPER,
+            "encodings": SUPPORTED_ENCODINGS,
+            "compression": SUPPORTED_COMPRESSION
         })
         send_json(self.sock, msg)
         
@@ -37,6 +39,11 @@ class Auth:
         if response and response["status"] == STATUS_OK:
             print("Login successful!")
             self.username = username
+            # Use whatever the server picked for the rest of the session
+            options = socket_state(self.sock)
+            options.encoding = response["data"].get("encoding", ENCODING_JSON)
+            if response["data"].get("compression") == COMPRESSION_ZLIB:
+                options.compress_threshold = DEFAULT_COMPRESS_THRESHOLD
             return True
         else:
             print(f"Login failed: {response.get('message', 'Unknown error')}")
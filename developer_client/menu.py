@@ -7,7 +7,7 @@ import tempfile
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from shared.protocol import *
-from shared.utils import send_json, recv_json, send_file
+from shared.utils import send_json, recv_json, send_file, verify_resume_point, calculate_file_hash, socket_lock
 from developer_client.game_manager import GameManager
 from developer_client.gui_upload import GameUploadDialog
 
@@ -56,14 +56,24 @@ class Menu:
             if not self.game_manager.package_game(path, zip_path):
                 return
 
-            send_json(self.sock, msg)
+            # Lets the server verify the archive arrived intact
+            msg["data"]["sha256"] = calculate_file_hash(zip_path)
+            # Held until the file is sent: a heartbeat ping between the request
+            # and the file would be read by the server as part of the file stream
+            with socket_lock(self.sock):
+                send_json(self.sock, msg)
+                
+                # Wait for Ready signal or error
+                response = recv_json(self.sock)
+                if response and response["status"] == STATUS_OK:
+                    # The server may hold part of an earlier, interrupted upload of this archive
+                    offset = verify_resume_point(zip_path, response["data"].get("offset", 0), response["data"].get("chunk_sha256"))
+                    if offset:
+                        print(f"Resuming upload from {offset // (1024 * 1024)} MB...")
+                    print("Uploading game files...")
+                    send_file(self.sock, zip_path, offset)
             
-            # Wait for Ready signal or error
-            response = recv_json(self.sock)
             if response and response["status"] == STATUS_OK:
-                print("Uploading game files...")
-                send_file(self.sock, zip_path)
-                
                 # Wait for final confirmation
                 final_response = recv_json(self.sock)
                 if final_response and final_response["status"] == STATUS_OK:
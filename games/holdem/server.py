@@ -116,8 +116,11 @@ class Player:
         self.allin = False
     
     def send(self, data):
+        self.send_raw(json.dumps(data).encode() + b"\n")
+
+    def send_raw(self, line):
         try:
-            self.conn.sendall(json.dumps(data).encode() + b"\n")
+            self.conn.sendall(line)
         except Exception:
             pass
 
@@ -229,10 +232,11 @@ class HoldemServer:
                 }
                 state["players"].append(p_info)
             
-            for i, p in enumerate(self.players):
-                my_state = state.copy()
-                my_state["my_cards"] = p.cards
-                p.send(my_state)
+            # Each table field is encoded once; a player's message is those members plus their own cards
+            shared = [f"{json.dumps(key)}: {json.dumps(value)}" for key, value in state.items()]
+            for p in self.players:
+                members = shared + [f'"my_cards": {json.dumps(p.cards)}']
+                p.send_raw(("{" + ", ".join(members) + "}\n").encode())
 
     def game_loop(self):
         while len(self.players) < 2:
@@ -3,7 +3,7 @@ from tkinter import scrolledtext, messagebox
 import select
 import sys
 from shared.protocol import *
-from shared.utils import send_json, recv_json
+from shared.utils import recv_json, send_request, request, pop_pushes
 
 class RoomGUI:
     def __init__(self, sock, room_id, username, is_host, game_id, launcher, plugin_manager, active_plugins, initial_players=None, initial_host=None, server_host=None):
@@ -158,11 +158,10 @@ class RoomGUI:
         
         if not consumed:
             # Send chat message to server
-            msg = create_message(MSG_CHAT, {
+            send_request(self.sock, MSG_CHAT, {
                 "room_id": self.room_id,
                 "message": msg_text
             })
-            send_json(self.sock, msg)
             
         self.msg_entry.delete(0, tk.END)
 
@@ -170,18 +169,15 @@ class RoomGUI:
         if not self.is_host:
             return
             
-        msg = create_message(MSG_START_GAME, {"room_id": self.room_id})
-        send_json(self.sock, msg)
+        send_request(self.sock, MSG_START_GAME, {"room_id": self.room_id})
         self._append_log("Requesting game start...")
 
     def _leave_room(self):
-        # Notify server
-        msg = create_message(MSG_LEAVE_ROOM)
-        send_json(self.sock, msg)
-        
-        # Consume response
+        # Notify server and consume the response
         try:
-            recv_json(self.sock)
+            request(self.sock, MSG_LEAVE_ROOM)
+            # Drop pushes for this room that were set aside meanwhile
+            pop_pushes(self.sock)
         except Exception:
             pass
             
@@ -196,6 +192,12 @@ class RoomGUI:
             return
 
         try:
+            # Pushes that arrived while another request was waiting for its reply
+            for msg in pop_pushes(self.sock):
+                self._handle_server_message(msg)
+                if not self.running:
+                    return
+            
             # Non-blocking check
             rlist, _, _ = select.select([self.sock], [], [], 0)
             if rlist:
@@ -241,6 +243,13 @@ class RoomGUI:
                 if hasattr(p, "handle_message"):
                     p.handle_message(payload, sender)
             
+        elif msg_type == MSG_BATCH:
+            # Chat and plugin messages the server collected over one tick, in order
+            for message in msg["data"]["messages"]:
+                self._handle_server_message(message)
+                if not self.running:
+                    return
+            
         elif msg_type == MSG_CHAT:
             sender = msg["data"]["sender"]
             message = msg["data"]["message"]
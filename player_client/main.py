@@ -9,7 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from player_client.auth import Auth
 from player_client.menu import Menu
 from shared.protocol import MSG_LOGOUT, create_message
-from shared.utils import send_json
+from shared.utils import send_json, start_heartbeat, enable_keepalive
 from shared.config import ConfigManager
 
 def main():
@@ -29,6 +29,7 @@ def main():
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.connect((host, port))
+        enable_keepalive(sock)
         print("Connected successfully!")
     except ConnectionRefusedError:
         print(f"Error: Could not connect to server at {host}:{port}")
@@ -40,6 +41,8 @@ def main():
         print(f"Connection error: {e}")
         return
 
+    # Keeps the server from reaping the connection while the user sits in a menu
+    heartbeat = start_heartbeat(sock)
     auth = Auth(sock)
     
     while True:
@@ -61,6 +64,7 @@ def main():
         else:
             print("Invalid option.")
 
+    heartbeat.set()
     try:
         send_json(sock, create_message(MSG_LOGOUT))
     except:
@@ -7,8 +7,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from player_client.store import Store
 from player_client.room import RoomManager
 from player_client.plugin_manager import PluginManager
-from shared.protocol import MSG_LOGOUT, create_message
-from shared.utils import send_json
+from shared.protocol import MSG_LOGOUT
+from shared.utils import request
 
 class Menu:
     def __init__(self, sock, username, server_host):
@@ -41,7 +41,7 @@ class Menu:
             elif choice == '5':
                 # Send logout message to server before returning to auth menu
                 try:
-                    send_json(self.sock, create_message(MSG_LOGOUT))
+                    request(self.sock, MSG_LOGOUT)
                 except:
                     pass
                 print("Logged out successfully.")
@@ -5,7 +5,7 @@ import json
 import importlib.util
 import sys
 from shared.protocol import *
-from shared.utils import send_json, recv_json, recv_file
+from shared.utils import send_json, recv_file, request, recv_response
 
 class PluginManager:
     def __init__(self, sock, username):
@@ -41,9 +41,7 @@ class PluginManager:
     
     def _browse_plugin_store(self):
         """Browse and download plugins from the server."""
-        msg = create_message(MSG_LIST_PLUGINS)
-        send_json(self.sock, msg)
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_LIST_PLUGINS)
         
         if not response or response["status"] != STATUS_OK:
             print("Failed to load plugins.")
@@ -140,7 +138,7 @@ class PluginManager:
         msg = create_message(MSG_DOWNLOAD_PLUGIN, {"plugin_name": plugin_name})
         send_json(self.sock, msg)
         
-        response = recv_json(self.sock)
+        response = recv_response(self.sock)
         if response and response["status"] == STATUS_OK:
             temp_zip = os.path.join(self.plugins_dir, f"{plugin_name}.zip")
             if recv_file(self.sock, temp_zip):
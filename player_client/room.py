@@ -1,6 +1,6 @@
 import time
 from shared.protocol import *
-from shared.utils import send_json, recv_json
+from shared.utils import send_request, request
 from player_client.game_launcher import GameLauncher
 from player_client.plugin_manager import PluginManager
 from player_client.gui_room import RoomGUI
@@ -13,12 +13,12 @@ class RoomContext:
         self.username = username
 
     def send_plugin_message(self, plugin_id, payload):
-        msg = create_message(MSG_PLUGIN_MESSAGE, {
+        # The reply is picked up by the room's poll loop
+        send_request(self.sock, MSG_PLUGIN_MESSAGE, {
             "room_id": self.room_id,
             "plugin_id": plugin_id,
             "payload": payload
         })
-        send_json(self.sock, msg)
 
 class RoomManager:
     def __init__(self, sock, username, server_host):
@@ -32,9 +32,7 @@ class RoomManager:
 
     def create_room(self):
         # First select a game
-        msg = create_message(MSG_LIST_GAMES)
-        send_json(self.sock, msg)
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_LIST_GAMES)
         
         if not response or response["status"] != STATUS_OK:
             print("Failed to fetch games.")
@@ -59,10 +57,7 @@ class RoomManager:
             print("Invalid input.")
             return
 
-        msg = create_message(MSG_CREATE_ROOM, {"game_id": game["game_id"]})
-        send_json(self.sock, msg)
-        
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_CREATE_ROOM, {"game_id": game["game_id"]})
         if response and response["status"] == STATUS_OK:
             room_id = response["data"]["room_id"]
             print(f"Room created! ID: {room_id}")
@@ -75,9 +70,7 @@ class RoomManager:
             print(f"Failed to create room: {response.get('message')}")
 
     def join_room(self):
-        msg = create_message(MSG_LIST_ROOMS)
-        send_json(self.sock, msg)
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_LIST_ROOMS)
         
         if not response or response["status"] != STATUS_OK:
             print("Failed to fetch rooms.")
@@ -101,10 +94,7 @@ class RoomManager:
 
         room_id = input("Enter Room ID to join: ")
         
-        msg = create_message(MSG_JOIN_ROOM, {"room_id": room_id})
-        send_json(self.sock, msg)
-        
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_JOIN_ROOM, {"room_id": room_id})
         if response and response["status"] == STATUS_OK:
             room = response["data"]["room"]
             print(f"Joined room {room_id}!")
@@ -3,7 +3,9 @@ import shutil
 import zipfile
 import tempfile
 from shared.protocol import *
-from shared.utils import send_json, recv_json, recv_file
+from shared.utils import send_json, recv_file, request, request_many, recv_response, resume_point
+
+PAGE_SIZE = 10
 
 class Store:
     def __init__(self, sock, username):
@@ -12,11 +14,13 @@ class Store:
         self.downloads_dir = os.path.join("player_client", "downloads", username)
         if not os.path.exists(self.downloads_dir):
             os.makedirs(self.downloads_dir)
+        # Downloaded archives, named by SHA-256 so identical content is never fetched twice
+        self.archives_dir = os.path.join(self.downloads_dir, "archives")
+        if not os.path.exists(self.archives_dir):
+            os.makedirs(self.archives_dir)
 
     def browse_store(self):
-        msg = create_message(MSG_LIST_GAMES)
-        send_json(self.sock, msg)
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_LIST_GAMES)
         
         if not response or response["status"] != STATUS_OK:
             print(f"Failed to load games: {response.get('message') if response else 'No response'}")
@@ -27,37 +31,61 @@ class Store:
             print("No games available in the store.")
             return
 
+        page = 0
+        pages = (len(games) + PAGE_SIZE - 1) // PAGE_SIZE
         while True:
-            print("\n=== Game Store ===")
-            print(f"{'No.':<4} | {'Name':<20} | {'Type':<10} | {'Version':<10}")
-            print("-" * 50)
-            for i, game in enumerate(games):
-                print(f"{i+1:<4} | {game['name']:<20} | {game['type']:<10} | {game['latest_version']:<10}")
+            page_games = games[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+            # Details for the whole page are fetched in parallel over the one connection
+            details = self._fetch_details([game["game_id"] for game in page_games])
+            
+            print(f"\n=== Game Store (page {page + 1}/{pages}) ===")
+            print(f"{'No.':<4} | {'Name':<20} | {'Type':<10} | {'Version':<10} | {'Rating':<6}")
+            print("-" * 60)
+            for i, game in enumerate(page_games):
+                game_details = details.get(game["game_id"])
+                rating = f"{game_details['avg_rating']:.1f}" if game_details and game_details.get("reviews") else "-"
+                print(f"{i+1:<4} | {game['name']:<20} | {game['type']:<10} | {game['latest_version']:<10} | {rating:<6}")
+            if pages > 1:
+                print("n. Next page  p. Previous page")
             print("0. Back")
 
             choice = input("Select game number to view details (0 to back): ")
             if choice == '0':
                 return
+            if choice.lower() == 'n' and page + 1 < pages:
+                page += 1
+                continue
+            if choice.lower() == 'p' and page > 0:
+                page -= 1
+                continue
             
             try:
                 idx = int(choice) - 1
-                if 0 <= idx < len(games):
-                    self.view_game_details(games[idx]["game_id"])
+                if 0 <= idx < len(page_games):
+                    game_id = page_games[idx]["game_id"]
+                    self.view_game_details(game_id, details.get(game_id))
                 else:
                     print("Invalid choice.")
             except ValueError:
                 print("Invalid input.")
 
-    def view_game_details(self, game_id):
-        msg = create_message(MSG_GAME_DETAILS, {"game_id": game_id})
-        send_json(self.sock, msg)
-        response = recv_json(self.sock)
-        
-        if not response or response["status"] != STATUS_OK:
-            print("Failed to get game details.")
-            return
+    def _fetch_details(self, game_ids):
+        responses = request_many(self.sock, [(MSG_GAME_DETAILS, {"game_id": game_id}) for game_id in game_ids])
+        details = {}
+        for game_id, response in zip(game_ids, responses):
+            if response and response["status"] == STATUS_OK:
+                details[game_id] = response["data"]["game"]
+        return details
+
+    def view_game_details(self, game_id, game=None):
+        if game is None:
+            response = request(self.sock, MSG_GAME_DETAILS, {"game_id": game_id})
+            
+            if not response or response["status"] != STATUS_OK:
+                print("Failed to get game details.")
+                return
+            game = response["data"]["game"]
 
-        game = response["data"]["game"]
         print(f"\n=== {game['name']} ===")
         print(f"Author: {game['author']}")
         print(f"Type: {game['type']}")
@@ -103,37 +131,9 @@ class Store:
                 return
 
         print(f"Downloading {game['name']} version {version}...")
-        msg = create_message(MSG_DOWNLOAD_GAME, {"game_id": game_id, "version": version})
-        send_json(self.sock, msg)
-        
-        response = recv_json(self.sock)
-        if response and response["status"] == STATUS_OK:
-            # Receive file
-            temp_zip = os.path.join(self.downloads_dir, f"{game_id}.zip")
-            if recv_file(self.sock, temp_zip):
-                print("Download complete. Installing...")
-                
-                # Unzip
-                if os.path.exists(game_dir):
-                    shutil.rmtree(game_dir)
-                os.makedirs(game_dir)
-                
-                try:
-                    with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-                        zip_ref.extractall(game_dir)
-                    
-                    # Write version file
-                    with open(version_file, 'w') as f:
-                        f.write(version)
-                        
-                    os.remove(temp_zip)
-                    print("Installation successful!")
-                except zipfile.BadZipFile:
-                    print("Error: Downloaded file is corrupted.")
-            else:
-                print("Download failed during file transfer.")
-        else:
-            print(f"Download failed: {response.get('message')}")
+        # A forced re-download skips the local copies
+        expected = game.get("archives", {}).get(version)
+        self._download_and_install(game_id, version, expected, force=current_version == version)
 
     def write_review(self, game_id):
         print("\n--- Write Review ---")
@@ -148,14 +148,11 @@ class Store:
             
         comment = input("Comment: ")
         
-        msg = create_message(MSG_SUBMIT_REVIEW, {
+        response = request(self.sock, MSG_SUBMIT_REVIEW, {
             "game_id": game_id,
             "rating": rating,
             "comment": comment
         })
-        send_json(self.sock, msg)
-        
-        response = recv_json(self.sock)
         if response and response["status"] == STATUS_OK:
             print("Review submitted!")
         else:
@@ -163,9 +160,7 @@ class Store:
 
     def download_game_if_needed(self, game_id):
         # Fetch game details to get latest version
-        msg = create_message(MSG_GAME_DETAILS, {"game_id": game_id})
-        send_json(self.sock, msg)
-        response = recv_json(self.sock)
+        response = request(self.sock, MSG_GAME_DETAILS, {"game_id": game_id})
         
         if not response or response["status"] != STATUS_OK:
             print(f"Failed to get game details for auto-download: {response.get('message') if response else 'No response'}")
@@ -187,40 +182,80 @@ class Store:
             return True
 
         print(f"Auto-downloading {game['name']} (v{version})...")
+        return self._download_and_install(game_id, version, game.get("archives", {}).get(version))
+
+    def _download_and_install(self, game_id, version, expected_sha256=None, force=False):
+        game_dir = os.path.join(self.downloads_dir, game_id)
+        version_file = os.path.join(game_dir, "version.txt")
+        digest_file = os.path.join(game_dir, "archive.sha256")
         
-        # Reuse download logic but without prompts
-        # We can call download_game but it has prompts.
-        # Let's duplicate the core download logic or refactor.
-        # Refactoring is better but for now let's just implement the core logic here to avoid breaking existing flow.
+        if expected_sha256 and not force:
+            # Same content already installed, e.g. re-released under a new version label
+            if os.path.exists(digest_file):
+                with open(digest_file, 'r') as f:
+                    if f.read().strip() == expected_sha256:
+                        with open(version_file, 'w') as vf:
+                            vf.write(version)
+                        print("Installed files already match this version.")
+                        return True
+            archive_path = os.path.join(self.archives_dir, f"{expected_sha256}.zip")
+            if os.path.exists(archive_path):
+                print("Using cached archive.")
+                return self._install(game_dir, archive_path, version, expected_sha256)
         
-        msg = create_message(MSG_DOWNLOAD_GAME, {"game_id": game_id, "version": version})
+        # Partial downloads survive restarts and are resumed from the last whole chunk
+        part_path = os.path.join(self.downloads_dir, f"{game_id}-{version}.zip.part")
+        offset, chunk_sha256 = (0, None) if force else resume_point(part_path)
+        if offset:
+            print(f"Resuming download from {offset // (1024 * 1024)} MB...")
+        
+        msg = create_message(MSG_DOWNLOAD_GAME, {
+            "game_id": game_id,
+            "version": version,
+            "offset": offset,
+            "chunk_sha256": chunk_sha256
+        })
         send_json(self.sock, msg)
         
-        response = recv_json(self.sock)
-        if response and response["status"] == STATUS_OK:
-            temp_zip = os.path.join(self.downloads_dir, f"{game_id}.zip")
-            if recv_file(self.sock, temp_zip):
-                print("Download complete. Installing...")
-                if os.path.exists(game_dir):
-                    shutil.rmtree(game_dir)
-                os.makedirs(game_dir)
+        response = recv_response(self.sock)
+        if not response or response["status"] != STATUS_OK:
+            print(f"Download failed: {response.get('message') if response else 'No response'}")
+            return False
+        
+        # recv_file hashes while receiving, so verification needs no second pass
+        digest = recv_file(self.sock, part_path)
+        if not digest:
+            print("Download interrupted. It will resume from where it stopped next time.")
+            return False
+        expected_sha256 = response["data"].get("sha256") or expected_sha256
+        if expected_sha256 and digest != expected_sha256:
+            os.remove(part_path)
+            print("Error: Downloaded file is corrupted (checksum mismatch).")
+            return False
+        
+        archive_path = os.path.join(self.archives_dir, f"{digest}.zip")
+        os.replace(part_path, archive_path)
+        print("Download complete. Installing...")
+        return self._install(game_dir, archive_path, version, digest)
+
+    def _install(self, game_dir, archive_path, version, digest):
+        if os.path.exists(game_dir):
+            shutil.rmtree(game_dir)
+        os.makedirs(game_dir)
+        
+        try:
+            with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+                zip_ref.extractall(game_dir)
+            
+            # Write version and content hash files
+            with open(os.path.join(game_dir, "version.txt"), 'w') as f:
+                f.write(version)
+            with open(os.path.join(game_dir, "archive.sha256"), 'w') as f:
+                f.write(digest)
                 
-                try:
-                    with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-                        zip_ref.extractall(game_dir)
-                    
-                    with open(version_file, 'w') as f:
-                        f.write(version)
-                        
-                    os.remove(temp_zip)
-                    print("Installation successful!")
-                    return True
-                except zipfile.BadZipFile:
-                    print("Error: Downloaded file is corrupted.")
-                    return False
-            else:
-                print("Download failed during file transfer.")
-                return False
-        else:
-            print(f"Download failed: {response.get('message')}")
+            print("Installation successful!")
+            return True
+        except zipfile.BadZipFile:
+            os.remove(archive_path)
+            print("Error: Downloaded file is corrupted.")
             return False
@@ -0,0 +1,121 @@
+"""
+Sends ADMIN commands to a running server.
+
+    python server/admin.py --token <token> profile --seconds 10 --output lobby.folded
+    python server/admin.py --token <token> profile-start
+    python server/admin.py --token <token> profile-stop --output lobby.folded
+    python server/admin.py --token <token> memory-start
+    python server/admin.py --token <token> memory-snapshot --types
+    python server/admin.py --token <token> memory-counts
+
+The .folded output can be fed to flamegraph.pl or opened in speedscope.
+"""
+import argparse
+import os
+import socket
+import sys
+
+# Add parent directory to path to import shared modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import *
+from shared.utils import request
+
+def print_profile(report, output):
+    print(f"{report['samples']} samples over {report['duration']}s "
+          f"(every {report['interval_ms']:g} ms, sampler overhead {report['overhead']:.2%})")
+    print(f"\n{'Handler':<24} {'Samples':>8}")
+    for handler, count in report["handlers"].items():
+        print(f"{handler:<24} {count:>8}")
+    print(f"\n{'Function':<56} {'Self':>6} {'Total':>6}")
+    for row in report["functions"]:
+        print(f"{row['function']:<56} {row['self']:>6} {row['total']:>6}")
+    if output:
+        with open(output, "w") as f:
+            f.write(report["collapsed"] + "\n")
+        print(f"\nCollapsed stacks written to {output}")
+
+def print_memory(report):
+    if "traced_bytes" in report:
+        print(f"Traced {report['traced_bytes'] / 1e6:.1f} MB (peak {report['peak_bytes'] / 1e6:.1f} MB, "
+              f"tracemalloc itself {report['tracemalloc_overhead_bytes'] / 1e6:.1f} MB)")
+    if report.get("rss_bytes"):
+        print(f"RSS {report['rss_bytes'] / 1e6:.1f} MB")
+    if "growth" in report:
+        print(f"\n{'Growth since baseline':<60} {'KB':>10} {'Objects':>9}")
+        for row in report["growth"]:
+            print(f"{row['site']:<60} {row['size_diff'] / 1024:>+10.1f} {row['count_diff']:>+9}")
+    if "top" in report:
+        print(f"\n{'Largest allocation sites':<60} {'KB':>10} {'Objects':>9}")
+        for row in report["top"]:
+            print(f"{row['site']:<60} {row['size'] / 1024:>10.1f} {row['count']:>9}")
+    if "objects" in report:
+        print(f"\n{'Server objects':<30} {'Count':>9}")
+        for name, count in report["objects"].items():
+            print(f"{name:<30} {count:>9}")
+    if "types" in report:
+        print(f"\n{'Live objects by type':<30} {'Count':>9}")
+        for name, count in report["types"].items():
+            print(f"{name:<30} {count:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Game server admin commands')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Server address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8888, help='Server port (default: 8888)')
+    parser.add_argument('--token', type=str, default=os.environ.get("GAMESERVER_ADMIN_TOKEN"),
+                        help='Admin token (default: $GAMESERVER_ADMIN_TOKEN)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    profile = commands.add_parser('profile', help='Sample handler threads for a while and print the hot spots')
+    profile.add_argument('--seconds', type=float, default=10, help='How long to sample (default: 10)')
+    profile_start = commands.add_parser('profile-start', help='Start sampling until profile-stop')
+    profile_start.add_argument('--seconds', type=float, default=None, help='Stop on its own after this long')
+    profile_stop = commands.add_parser('profile-stop', help='Stop sampling and print the hot spots')
+    for sub in (profile, profile_start):
+        sub.add_argument('--interval-ms', type=float, default=5, help='Time between samples (default: 5)')
+        sub.add_argument('--all-threads', action='store_true', help='Include idle and internal threads, not only handlers')
+    for sub in (profile, profile_stop):
+        sub.add_argument('--output', type=str, default=None, help='Write collapsed stacks here for a flame graph')
+
+    memory_start = commands.add_parser('memory-start', help='Start tracemalloc and take the baseline')
+    memory_start.add_argument('--frames', type=int, default=10, help='Stack frames kept per allocation (default: 10)')
+    memory_snapshot = commands.add_parser('memory-snapshot', help='Top allocation sites and growth since memory-start')
+    memory_snapshot.add_argument('--limit', type=int, default=20, help='Sites to show (default: 20)')
+    memory_snapshot.add_argument('--traceback', action='store_true', help='Group by whole stack instead of line')
+    commands.add_parser('memory-stop', help='Stop tracemalloc')
+    memory_counts = commands.add_parser('memory-counts', help='Sessions, rooms, pending sockets and other object counts')
+    for sub in (memory_snapshot, memory_counts):
+        sub.add_argument('--types', action='store_true', help='Also count every live object by type (slow on big heaps)')
+    args = parser.parse_args()
+
+    data = {"token": args.token, "command": args.command.replace("-", "_")}
+    if args.command in ("profile", "profile-start"):
+        data.update(seconds=args.seconds, interval_ms=args.interval_ms, all_threads=args.all_threads)
+    elif args.command == "memory-start":
+        data.update(frames=args.frames)
+    elif args.command == "memory-snapshot":
+        data.update(limit=args.limit, group_by="traceback" if args.traceback else "lineno", types=args.types)
+    elif args.command == "memory-counts":
+        data.update(types=args.types)
+
+    sock = socket.create_connection((args.host, args.port))
+    try:
+        response = request(sock, MSG_ADMIN, data)
+    finally:
+        sock.close()
+    if not response:
+        sys.exit("Connection closed by server")
+    if response["status"] != STATUS_OK:
+        sys.exit(f"Error: {response['message']}")
+
+    if args.command.startswith("memory"):
+        if response["message"]:
+            print(response["message"])
+        print_memory(response["data"])
+    elif args.command == "profile-start":
+        print(response["message"])
+    else:
+        print_profile(response["data"], args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import hmac
+import os
+import time
+from shared.protocol import *
+from server.profiler import SamplingProfiler, DEFAULT_INTERVAL
+from server.memory import MemoryInspector, object_counts, type_counts, rss_bytes, DEFAULT_FRAMES, TOP_SITES
+from server import log as logging
+
+log = logging.get_logger("admin")
+
+PROFILES_DIR = os.path.join("server", "profiles")
+
+class AdminService:
+    """Operator commands for a running server, sent as ADMIN messages.
+
+    Every message carries the --admin-token; without one configured the
+    commands are refused. Requests look like
+    {"token": ..., "command": "profile", "seconds": 10}.
+    """
+    def __init__(self, server, token=None):
+        self.server = server
+        self.token = token
+        self.profiler = SamplingProfiler()
+        self.memory = MemoryInspector()
+        self.commands = {
+            "profile": self.handle_profile,
+            "profile_start": self.handle_profile_start,
+            "profile_stop": self.handle_profile_stop,
+            "memory_start": self.handle_memory_start,
+            "memory_snapshot": self.handle_memory_snapshot,
+            "memory_stop": self.handle_memory_stop,
+            "memory_counts": self.handle_memory_counts,
+        }
+
+    def register_handlers(self, handlers):
+        # Authorised by token rather than by a login role
+        handlers.add(MSG_ADMIN, self.handle_admin)
+
+    def handle_admin(self, sock, data, user_info):
+        if not self.token:
+            return create_response(STATUS_ERROR, message="Admin commands are disabled")
+        if not hmac.compare_digest(str(data.get("token") or "").encode(), self.token.encode()):
+            log.warning("Rejected admin command with a bad token", command=data.get("command"))
+            return create_response(STATUS_ERROR, message="Invalid admin token")
+        command = self.commands.get(data.get("command"))
+        if not command:
+            return create_response(STATUS_ERROR, message=f"Unknown admin command: {data.get('command')}")
+        log.info("Admin command", command=data.get("command"))
+        try:
+            return command(data)
+        except (TypeError, ValueError) as e:
+            return create_response(STATUS_ERROR, message=f"Invalid arguments: {e}")
+
+    @staticmethod
+    def _profile_options(data, default_seconds=None):
+        seconds = data.get("seconds", default_seconds)
+        interval = float(data.get("interval_ms", DEFAULT_INTERVAL * 1000)) / 1000
+        return (float(seconds) if seconds else None), interval, bool(data.get("all_threads"))
+
+    def handle_profile(self, data):
+        """Samples every handler thread for the given seconds and returns the report."""
+        report = self.profiler.profile(*self._profile_options(data, 10))
+        if report is None:
+            return create_response(STATUS_ERROR, message="A profile is already running")
+        return create_response(STATUS_OK, data=report)
+
+    def handle_profile_start(self, data):
+        if not self.profiler.start(*self._profile_options(data)):
+            return create_response(STATUS_ERROR, message="A profile is already running")
+        return create_response(STATUS_OK, message="Profiling started")
+
+    def handle_profile_stop(self, data):
+        report = self.profiler.stop()
+        if report is None:
+            return create_response(STATUS_ERROR, message="No profile has been taken")
+        return create_response(STATUS_OK, data=report)
+
+    def handle_memory_start(self, data):
+        """Starts tracemalloc and takes the baseline that snapshots are diffed against."""
+        status = self.memory.start(int(data.get("frames", DEFAULT_FRAMES)))
+        return create_response(STATUS_OK, message="Memory tracing started", data=status)
+
+    def handle_memory_snapshot(self, data):
+        group_by = data.get("group_by", "lineno")
+        if group_by not in ("lineno", "traceback"):
+            return create_response(STATUS_ERROR, message="group_by must be lineno or traceback")
+        report = self.memory.snapshot(int(data.get("limit", TOP_SITES)), group_by)
+        if report is None:
+            return create_response(STATUS_ERROR, message="Memory tracing is not running, send memory_start first")
+        report.update(self._counts(data))
+        return create_response(STATUS_OK, data=report)
+
+    def handle_memory_stop(self, data):
+        status = self.memory.stop()
+        return create_response(STATUS_OK, message="Memory tracing stopped", data=status)
+
+    def handle_memory_counts(self, data):
+        """Object counts only; needs no tracing, so it costs nothing until asked."""
+        return create_response(STATUS_OK, data=self._counts(data))
+
+    def _counts(self, data):
+        counts = {"rss_bytes": rss_bytes(), "objects": object_counts(self.server)}
+        if data.get("types"):
+            counts["types"] = type_counts()
+        return counts
+
+    def toggle_profile(self, signum=None, frame=None):
+        """SIGUSR1: the first signal starts profiling, the next writes the collapsed stacks to PROFILES_DIR."""
+        if not self.profiler.running:
+            self.profiler.start()
+            log.info("Profiling started, send the signal again to stop")
+            return
+        report = self.profiler.stop()
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        path = os.path.join(PROFILES_DIR, time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+        with open(path, "w") as f:
+            f.write(report["collapsed"] + "\n")
+        log.info("Profile written", path=path, samples=report["samples"], overhead=report["overhead"],
+                 top=",".join(f"{name}:{count}" for name, count in list(report["handlers"].items())[:5]))
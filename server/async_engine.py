@@ -0,0 +1,238 @@
+import asyncio
+import socket
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from shared.protocol import *
+from shared.utils import encode_frame, decode_frame, socket_state, HEADER, FRAME_LENGTH_MASK
+from server.worker_pool import PoolSaturated
+from server import log as logging
+
+log = logging.get_logger("server")
+
+# Requests whose handlers read or write the socket directly (archive streams)
+TRANSFER_MESSAGES = {MSG_UPLOAD_GAME, MSG_UPDATE_GAME, MSG_DOWNLOAD_GAME, MSG_DOWNLOAD_PLUGIN}
+TRANSFER_WORKERS = 32
+
+def raise_open_file_limit():
+    """Lifts the soft open-file limit to the hard one so idle clients are not capped at ~1024."""
+    try:
+        import resource
+    except ImportError:
+        return # Not available on Windows
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = 65536 if hard == resource.RLIM_INFINITY else hard
+    if soft < target:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+class Connection:
+    """Event loop side of one client socket."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.responses = deque() # encoded responses waiting to be written
+        self.outbound = None # the session's OutboundQueue of pushes, once logged in
+        self.ready = asyncio.Event() # set when either has something to write
+        # Held by the writer for each frame and by a transfer for its whole stream
+        self.write_lock = asyncio.Lock()
+        self.writer = None
+        self.last_active = asyncio.get_running_loop().time() # when the client last sent a message or got a reply
+        self.in_flight = 0 # requests being handled; the client is waiting, not idle
+        self.reaped = False
+
+    def next_frame(self):
+        # Responses first: a client blocked on a reply should not wait behind pushes
+        if self.responses:
+            return self.responses.popleft()
+        if self.outbound is not None:
+            return self.outbound.pop_nowait()
+        return None
+
+class AsyncioEngine:
+    """Serves GameServer connections from one event loop instead of a thread each.
+
+    Sockets are read and written by the loop; message handlers, which block on
+    the database, unzip and subprocess launch, run in the server's request
+    pool. File transfers get the socket to themselves: it is switched back to
+    blocking mode and handed to a transfer worker until the stream is done.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.loop = None
+        self.connections = {} # socket -> Connection
+        self.transfer_pool = ThreadPoolExecutor(max_workers=TRANSFER_WORKERS)
+        # Session pushes (room updates, chat, ...) are drained by the connection's writer task
+        server.sessions.start_writer = self.attach_outbound
+
+    def serve(self, server_socket):
+        raise_open_file_limit()
+        asyncio.run(self._accept_loop(server_socket))
+
+    async def _accept_loop(self, server_socket):
+        self.loop = asyncio.get_running_loop()
+        server_socket.setblocking(False)
+        tasks = set()
+        if self.server.idle_timeout:
+            tasks.add(asyncio.create_task(self._reap_loop(self.server.idle_timeout)))
+        while True:
+            sock, addr = await self.loop.sock_accept(server_socket)
+            self.server.connections_accepted.inc()
+            log.info("New connection", addr=f"{addr[0]}:{addr[1]}")
+            sock.setblocking(False)
+            self.server.configure_client_socket(sock)
+            task = asyncio.create_task(self._serve_client(sock))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def _serve_client(self, sock):
+        conn = Connection(sock)
+        conn.writer = asyncio.create_task(self._write_loop(conn))
+        self.connections[sock] = conn
+        pending = set()
+        try:
+            while True:
+                msg = await self._recv_message(sock)
+                if not msg:
+                    break
+                conn.last_active = self.loop.time()
+
+                msg_type = msg.get("type")
+                if msg_type == MSG_PING:
+                    # Trivial, and must not be refused as busy: answered on the loop
+                    buffers = self._process(sock, msg)
+                    if buffers:
+                        self._queue_response(conn, buffers)
+                elif msg.get("id") is not None and msg_type in self.server.pipelined_messages:
+                    task = asyncio.create_task(self._handle(conn, msg))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                elif msg_type in TRANSFER_MESSAGES:
+                    await self._handle_transfer(conn, msg)
+                else:
+                    await self._handle(conn, msg)
+        except Exception as e:
+            if not conn.reaped:
+                log.warning("Error handling client", error=e)
+        finally:
+            if conn.reaped:
+                self.server.reap(sock)
+            log.info("Client disconnected")
+            del self.connections[sock]
+            # Cleanup must not be refused by a saturated request pool
+            await self.loop.run_in_executor(None, self.server.handle_disconnect, sock)
+            conn.writer.cancel()
+            for task in pending:
+                task.cancel()
+            sock.close()
+            self.server.connections_closed.inc()
+
+    async def _reap_loop(self, idle_timeout):
+        # One timer for all connections instead of a timeout around every read
+        while True:
+            await asyncio.sleep(min(5, idle_timeout / 4))
+            now = self.loop.time()
+            for conn in list(self.connections.values()):
+                if now - conn.last_active > idle_timeout and not conn.in_flight and not conn.reaped:
+                    conn.reaped = True
+                    try:
+                        # The reader sees EOF and runs the normal disconnect path
+                        conn.sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+    async def _recv_exact(self, sock, n):
+        buf = bytearray(n)
+        view = memoryview(buf)
+        pos = 0
+        while pos < n:
+            received = await self.loop.sock_recv_into(sock, view[pos:])
+            if not received:
+                return None
+            pos += received
+        return buf
+
+    async def _recv_message(self, sock):
+        len_bytes = await self._recv_exact(sock, HEADER.size)
+        if not len_bytes:
+            return None
+        header = HEADER.unpack(len_bytes)[0]
+        body = await self._recv_exact(sock, header & FRAME_LENGTH_MASK)
+        if not body:
+            return None
+        return decode_frame(header, body)
+
+    async def _handle(self, conn, msg):
+        try:
+            future = self.loop.run_in_executor(self.server.request_pool, self._process, conn.sock, msg)
+        except PoolSaturated:
+            self.send(conn.sock, self.server.busy_response(msg))
+            return
+        conn.in_flight += 1
+        try:
+            buffers = await future
+        finally:
+            conn.in_flight -= 1
+            conn.last_active = self.loop.time()
+        if buffers:
+            self._queue_response(conn, buffers)
+
+    async def _handle_transfer(self, conn, msg):
+        # Nothing else is written to the socket until the stream ends
+        conn.in_flight += 1
+        try:
+            async with conn.write_lock:
+                conn.sock.setblocking(True)
+                try:
+                    buffers = await self.loop.run_in_executor(self.transfer_pool, self._process, conn.sock, msg)
+                finally:
+                    conn.sock.setblocking(False)
+        finally:
+            conn.in_flight -= 1
+            conn.last_active = self.loop.time()
+        if buffers:
+            self._queue_response(conn, buffers)
+
+    def _process(self, sock, msg):
+        # Runs on a worker thread; the response is encoded there too
+        response = self.server.process_message(sock, msg)
+        if not response:
+            return None
+        if msg.get("id") is not None:
+            response["id"] = msg["id"]
+        return encode_frame(response, socket_state(sock))
+
+    async def _write_loop(self, conn):
+        while True:
+            await conn.ready.wait()
+            conn.ready.clear()
+            buffers = conn.next_frame()
+            while buffers is not None:
+                async with conn.write_lock:
+                    try:
+                        await self.loop.sock_sendall(conn.sock, b''.join(buffers))
+                    except OSError:
+                        # The reader sees the closed connection and cleans up
+                        return
+                buffers = conn.next_frame()
+
+    def _queue_response(self, conn, buffers):
+        conn.responses.append(buffers)
+        conn.ready.set()
+
+    def send(self, sock, message):
+        """Queues a response for a client; safe to call from any thread."""
+        conn = self.connections.get(sock)
+        if conn is None:
+            return
+        buffers = encode_frame(message, socket_state(sock))
+        self.loop.call_soon_threadsafe(self._queue_response, conn, buffers)
+
+    def attach_outbound(self, sock, queue):
+        """Lets the connection's writer task drain a session's push queue (called at login)."""
+        conn = self.connections.get(sock)
+        if conn is None:
+            return
+        conn.outbound = queue
+        queue.wakeup = lambda: self.loop.call_soon_threadsafe(conn.ready.set)
+        self.loop.call_soon_threadsafe(conn.ready.set)
@@ -0,0 +1,115 @@
+import os
+import json
+import threading
+from shared.utils import calculate_file_hash
+from server import log as logging
+
+log = logging.get_logger("blobs")
+
+class BlobStore:
+    """Content-addressed store for game archives.
+
+    Each archive is kept once under its SHA-256, no matter how many games or
+    versions upload the same bytes. Blobs are reference-counted by the
+    "<game_id>@<version>" entries that use them (persisted) and pinned by the
+    rooms currently running them (in memory); a blob is deleted once it has
+    neither.
+    """
+    def __init__(self, storage_dir=os.path.join("server", "storage", "blobs")):
+        self.storage_dir = storage_dir
+        self.index_file = os.path.join(storage_dir, "index.json")
+        self.lock = threading.Lock()
+        if not os.path.exists(self.storage_dir):
+            os.makedirs(self.storage_dir)
+        self.refs = self._load_index() # digest -> [ref, ...]
+        self.pins = {} # digest -> set of pin owners
+
+    def _load_index(self):
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def _save_index(self):
+        with open(self.index_file, 'w') as f:
+            json.dump(self.refs, f, indent=4)
+
+    def path(self, digest):
+        return os.path.join(self.storage_dir, digest[:2], f"{digest}.zip")
+
+    def add(self, file_path, ref, digest=None):
+        """Moves file_path into the store under ref and returns its digest.
+        If the same content is already stored, file_path is simply dropped."""
+        if digest is None:
+            digest = calculate_file_hash(file_path)
+        with self.lock:
+            blob_path = self.path(digest)
+            if os.path.exists(blob_path):
+                os.remove(file_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(file_path, blob_path)
+            refs = self.refs.setdefault(digest, [])
+            if ref not in refs:
+                refs.append(ref)
+            self._save_index()
+        return digest
+
+    def release(self, digest, ref):
+        """Drops a reference; the blob is collected if nothing else uses it."""
+        with self.lock:
+            refs = self.refs.get(digest, [])
+            if ref in refs:
+                refs.remove(ref)
+                self._save_index()
+            self._collect(digest)
+
+    def pin(self, digest, owner):
+        """Keeps a blob alive while owner (e.g. a running room) needs it."""
+        with self.lock:
+            self.pins.setdefault(digest, set()).add(owner)
+
+    def unpin(self, digest, owner):
+        with self.lock:
+            owners = self.pins.get(digest)
+            if owners:
+                owners.discard(owner)
+                if not owners:
+                    del self.pins[digest]
+            self._collect(digest)
+
+    def _collect(self, digest):
+        # Caller holds self.lock
+        if self.refs.get(digest) or self.pins.get(digest):
+            return
+        if digest in self.refs:
+            del self.refs[digest]
+            self._save_index()
+        blob_path = self.path(digest)
+        if os.path.exists(blob_path):
+            try:
+                os.remove(blob_path)
+                log.info("Collected unreferenced archive", digest=digest)
+            except Exception as e:
+                log.error("Error collecting archive", digest=digest, error=e)
+
+    def archive_path(self, game, version):
+        """Path of a game version's archive, or None if it is not stored."""
+        digest = game.get("archives", {}).get(version)
+        if not digest:
+            return None
+        blob_path = self.path(digest)
+        return blob_path if os.path.exists(blob_path) else None
+
+    def import_legacy_archives(self, db, games_dir):
+        """Moves <games_dir>/<game_id>/<version>.zip files from before the blob store into it."""
+        for game_id, game in db.get_all_games().items():
+            archives = game.get("archives", {})
+            imported = False
+            for version in game.get("versions", []):
+                legacy_path = os.path.join(games_dir, game_id, f"{version}.zip")
+                if version not in archives and os.path.exists(legacy_path):
+                    archives[version] = self.add(legacy_path, f"{game_id}@{version}")
+                    imported = True
+            if imported:
+                db.update_game(game_id, {"archives": archives})
@@ -8,9 +8,13 @@ class Database:
         self.users_file = os.path.join(storage_dir, "users.json")
         self.games_file = os.path.join(storage_dir, "games.json")
         self.reviews_file = os.path.join(storage_dir, "reviews.json")
+        self.files = {"users": self.users_file, "games": self.games_file, "reviews": self.reviews_file}
         self.lock = threading.Lock()
         
         self._ensure_storage()
+        self._load()
+
+    def _load(self):
         self.users = self._load_data(self.users_file)
         self.games = self._load_data(self.games_file)
         self.reviews = self._load_data(self.reviews_file)
@@ -29,6 +33,12 @@ class Database:
         with open(filepath, 'w') as f:
             json.dump(data, f, indent=4)
 
+    def _record(self, collection, key, value):
+        """Persists one change already made in memory: collection[key] = value, or
+        its removal if value is None; for reviews, value is appended to key's list.
+        Called with self.lock held. Here the collection's file is rewritten whole."""
+        self._save_data(self.files[collection], getattr(self, collection))
+
     def register_user(self, username, password, role):
         with self.lock:
             # Check if this specific role:username exists
@@ -41,7 +51,7 @@ class Database:
                 "password": password,
                 "role": role
             }
-            self._save_data(self.users_file, self.users)
+            self._record("users", user_key, self.users[user_key])
             return True
 
     def login_user(self, username, password, role):
@@ -56,13 +66,14 @@ class Database:
     def add_game(self, game_id, metadata):
         with self.lock:
             self.games[game_id] = metadata
-            self._save_data(self.games_file, self.games)
+            self._record("games", game_id, metadata)
 
     def update_game(self, game_id, metadata):
         with self.lock:
             if game_id in self.games:
-                self.games[game_id].update(metadata)
-                self._save_data(self.games_file, self.games)
+                # A new dict rather than an in-place update, so readers holding the old one see a consistent game
+                self.games[game_id] = {**self.games[game_id], **metadata}
+                self._record("games", game_id, self.games[game_id])
                 return True
             return False
 
@@ -70,13 +81,13 @@ class Database:
         with self.lock:
             if game_id in self.games:
                 del self.games[game_id]
-                self._save_data(self.games_file, self.games)
+                self._record("games", game_id, None)
                 return True
             return False
 
     def get_all_games(self):
         with self.lock:
-            return self.games
+            return dict(self.games)
 
     def get_game(self, game_id):
         with self.lock:
@@ -87,13 +98,23 @@ class Database:
             if game_id not in self.reviews:
                 self.reviews[game_id] = []
             
-            self.reviews[game_id].append({
+            review = {
                 "username": username,
                 "rating": rating,
                 "comment": comment
-            })
-            self._save_data(self.reviews_file, self.reviews)
+            }
+            self.reviews[game_id].append(review)
+            self._record("reviews", game_id, review)
 
     def get_reviews(self, game_id):
         with self.lock:
             return self.reviews.get(game_id, [])
+
+    def counts(self):
+        with self.lock:
+            return {"users": len(self.users), "games": len(self.games),
+                    "reviews": sum(len(reviews) for reviews in self.reviews.values())}
+
+    def close(self):
+        # Every change is already on disk
+        pass
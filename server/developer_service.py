@@ -1,25 +1,36 @@
 import os
 import shutil
 from shared.protocol import *
-from shared.utils import recv_file, send_json
+from shared.utils import recv_file, send_json, resume_point, FILE_CHUNK_SIZE
+from server import log as logging
+from server.metrics import Counter
+
+log = logging.get_logger("developer")
+
+# Versions kept per game after an update (older ones survive while a room runs them)
+RETAIN_VERSIONS = 1
 
 class DeveloperService:
-    def __init__(self, db):
+    def __init__(self, db, blob_store, chunk_size=FILE_CHUNK_SIZE, retain_versions=RETAIN_VERSIONS):
         self.db = db
+        self.blob_store = blob_store
+        self.chunk_size = chunk_size
+        self.retain_versions = max(1, retain_versions)
         self.storage_dir = os.path.join("server", "storage", "games")
+        self.uploads = Counter("gameserver_uploads_total", "Archive uploads by outcome", "result")
+        self.upload_bytes = Counter("gameserver_upload_bytes_total", "Archive bytes received from developers")
         if not os.path.exists(self.storage_dir):
             os.makedirs(self.storage_dir)
 
-    def handle_message(self, sock, msg_type, data, user_info):
-        if msg_type == MSG_UPLOAD_GAME:
-            return self.handle_upload_game(sock, data, user_info)
-        elif msg_type == MSG_UPDATE_GAME:
-            return self.handle_update_game(sock, data, user_info)
-        elif msg_type == MSG_REMOVE_GAME:
-            return self.handle_remove_game(data, user_info)
-        elif msg_type == MSG_LIST_GAMES:
-            return self.handle_list_my_games(user_info)
-        return create_response(STATUS_ERROR, message="Unknown developer command")
+    def register_handlers(self, handlers):
+        developers = [ROLE_DEVELOPER]
+        handlers.add(MSG_UPLOAD_GAME, self.handle_upload_game, developers)
+        handlers.add(MSG_UPDATE_GAME, self.handle_update_game, developers)
+        handlers.add(MSG_REMOVE_GAME, self.handle_remove_game, developers)
+        handlers.add(MSG_LIST_GAMES, self.handle_list_my_games, developers)
+
+    def metric_families(self):
+        return [self.uploads, self.upload_bytes]
 
     def handle_upload_game(self, sock, data, user_info):
         game_name = data.get("game_name")
@@ -56,10 +67,8 @@ class DeveloperService:
         file_path = os.path.join(game_dir, f"{version}.zip")
         
         # Tell client we are ready to receive file
-        send_json(sock, create_response(STATUS_OK, message="Ready to upload"))
-        
-        # Receive file
-        if recv_file(sock, file_path):
+        digest = self._receive_archive(sock, file_path, "Ready to upload", f"{game_id}@{version}", data.get("sha256"))
+        if digest:
             metadata = {
                 "game_id": game_id,
                 "name": game_name,
@@ -68,6 +77,7 @@ class DeveloperService:
                 "author": user_info["username"],
                 "latest_version": version,
                 "versions": [version],
+                "archives": {version: digest},
                 "min_players": min_players,
                 "max_players": max_players
             }
@@ -106,33 +116,61 @@ class DeveloperService:
 
         # Prepare to receive file
         game_dir = os.path.join(self.storage_dir, game_id)
+        os.makedirs(game_dir, exist_ok=True)
         file_path = os.path.join(game_dir, f"{version}.zip")
         
-        send_json(sock, create_response(STATUS_OK, message="Ready to upload update"))
-        
-        if recv_file(sock, file_path):
-            # Delete old version zip files to save disk space
-            old_versions = game["versions"]
-            for old_version in old_versions:
-                old_zip_path = os.path.join(game_dir, f"{old_version}.zip")
-                if os.path.exists(old_zip_path):
-                    try:
-                        os.remove(old_zip_path)
-                        print(f"Deleted old version: {old_zip_path}")
-                    except Exception as e:
-                        print(f"Error deleting old version {old_version}: {e}")
+        digest = self._receive_archive(sock, file_path, "Ready to upload update", f"{game_id}@{version}", data.get("sha256"))
+        if digest:
+            # Built aside and swapped in at once: downloads and game starts read
+            # the game concurrently and must never see a version without its archive
+            archives = dict(game.get("archives", {}))
+            archives[version] = digest
+            versions = game["versions"] + [version]
             
-            # Update metadata - only keep latest version in versions list
-            game["versions"] = [version]
-            game["latest_version"] = version
-            if min_players is not None: game["min_players"] = min_players
-            if max_players is not None: game["max_players"] = max_players
-            self.db.update_game(game_id, game)
+            released = []
+            while len(versions) > self.retain_versions:
+                old_version = versions.pop(0)
+                old_digest = archives.pop(old_version, None)
+                if old_digest:
+                    released.append((old_version, old_digest))
+            
+            updates = {"archives": archives, "versions": versions, "latest_version": version}
+            if min_players is not None: updates["min_players"] = min_players
+            if max_players is not None: updates["max_players"] = max_players
+            self.db.update_game(game_id, updates)
+            
+            # Release versions beyond the retention policy; their archives are
+            # deleted once no other version, game or running room uses them
+            for old_version, old_digest in released:
+                self.blob_store.release(old_digest, f"{game_id}@{old_version}")
+                log.info("Released old version", game_id=game_id, version=old_version)
             return create_response(STATUS_OK, message="Game updated successfully")
         else:
             return create_response(STATUS_ERROR, message="File upload failed")
 
-    def handle_remove_game(self, data, user_info):
+    def _receive_archive(self, sock, file_path, ready_message, ref, expected_sha256=None):
+        # An interrupted upload is kept as <version>.zip.part; offer to resume it
+        part_path = file_path + ".part"
+        offset, chunk_sha256 = resume_point(part_path)
+        send_json(sock, create_response(STATUS_OK, message=ready_message, data={"offset": offset, "chunk_sha256": chunk_sha256}))
+        
+        digest = recv_file(sock, part_path, self.chunk_size)
+        if os.path.exists(part_path):
+            self.upload_bytes.inc(max(0, os.path.getsize(part_path) - offset))
+        if not digest:
+            self.uploads.inc(1, "failed")
+            return None
+        if expected_sha256 and digest != expected_sha256:
+            # Corrupted in transit (or a stale .part); start over next time
+            log.warning("Upload failed checksum verification", ref=ref)
+            os.remove(part_path)
+            self.uploads.inc(1, "corrupt")
+            return None
+        self.uploads.inc(1, "ok")
+        # Completed archives live in the blob store, deduplicated by content
+        return self.blob_store.add(part_path, ref, digest)
+
+    def handle_remove_game(self, sock, data, user_info):
         game_id = data.get("game_id")
         game = self.db.get_game(game_id)
         
@@ -142,12 +180,14 @@ class DeveloperService:
         if game["author"] != user_info["username"]:
             return create_response(STATUS_ERROR, message="Permission denied")
             
-        self.db.remove_game(game_id)
-        # Files are kept archived
+        if self.db.remove_game(game_id):
+            # Archives no other game shares are deleted; rooms still running a version keep theirs pinned until they end
+            for version, digest in game.get("archives", {}).items():
+                self.blob_store.release(digest, f"{game_id}@{version}")
         
         return create_response(STATUS_OK, message="Game removed successfully")
 
-    def handle_list_my_games(self, user_info):
+    def handle_list_my_games(self, sock, data, user_info):
         all_games = self.db.get_all_games()
         my_games = [g for g in all_games.values() if g["author"] == user_info["username"]]
         return create_response(STATUS_OK, data={"games": my_games})
@@ -0,0 +1,50 @@
+import time
+from shared.protocol import *
+from server.metrics import HandlerMetrics
+
+class HandlerRegistry:
+    """Routes a message to its handler by (message type, role).
+
+    Handlers are registered by the services themselves and all take
+    (sock, data, user_info). Public handlers (roles=None) run without a login;
+    every other handler only runs for a logged-in user whose role it was
+    registered for. Each dispatch is timed into the per-type metrics.
+    """
+    def __init__(self):
+        self.routes = {} # (msg_type, role or None) -> handler
+        self.metrics = HandlerMetrics()
+
+    def add(self, msg_type, handler, roles=None):
+        """Registers handler for msg_type, for the given roles (None = no login needed)."""
+        for role in roles or [None]:
+            key = (msg_type, role)
+            if key in self.routes:
+                raise ValueError(f"Duplicate handler for {msg_type} ({role or 'public'})")
+            self.routes[key] = handler
+
+    def resolve(self, msg_type, user_info):
+        """Returns (handler, None) or (None, error response)."""
+        handler = self.routes.get((msg_type, None))
+        if handler:
+            return handler, None
+        if not user_info:
+            return None, create_response(STATUS_ERROR, message="Not logged in")
+        handler = self.routes.get((msg_type, user_info["role"]))
+        if not handler:
+            return None, create_response(STATUS_ERROR, message=f"Unknown message type for {user_info['role'].lower()}")
+        return handler, None
+
+    def dispatch(self, sock, msg, user_info):
+        msg_type = msg.get("type")
+        handler, error = self.resolve(msg_type, user_info)
+        if error:
+            return error
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = handler(sock, msg.get("data"), user_info)
+            failed = bool(response) and response.get("status") == STATUS_ERROR
+            return response
+        finally:
+            self.metrics.observe(msg_type, started, failed)
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import threading
+import time
+from server.database import Database
+from server.lobby_state import write_atomic
+from server import log as logging
+
+log = logging.get_logger("database")
+
+JOURNAL_DIR = "journal"
+# Compact this often, or sooner once the journal holds COMPACT_RECORDS changes
+COMPACT_INTERVAL = 60
+COMPACT_RECORDS = 10000
+
+GENERATION_FILE = re.compile(r"^(snapshot|journal)-(\d+)\.(json|log)$")
+
+def _apply(state, collection, key, value):
+    """Replays one journal record onto state, a dict of collections."""
+    data = state[collection]
+    if collection == "reviews":
+        data.setdefault(key, []).append(value)
+    elif value is None:
+        data.pop(key, None)
+    else:
+        data[key] = value
+
+class JournalDatabase(Database):
+    """Database that appends each change to a journal instead of rewriting the JSON files.
+
+    Storage is a series of generations under <storage_dir>/journal:
+    snapshot-N.json holds every collection as it was when journal-N.log
+    started, and journal-N.log holds one JSON line per change after that. A
+    change costs one appended line, flushed like the files used to be.
+
+    A background thread compacts: it starts a new journal under the lock,
+    then folds the closed journals into the next snapshot from disk, so
+    writers are never held up while the snapshot is built. Startup loads the
+    newest snapshot (or the plain JSON files the first time) and replays the
+    journals after it.
+    """
+    def __init__(self, storage_dir="server/storage", compact_interval=COMPACT_INTERVAL, compact_records=COMPACT_RECORDS):
+        self.journal_dir = os.path.join(storage_dir, JOURNAL_DIR)
+        self.compact_interval = compact_interval
+        self.compact_records = compact_records
+        self.journal = None
+        self.generation = 0 # journal being appended to
+        self.snapshot_generation = 0 # newest snapshot; 0 means the plain JSON files
+        self.records = 0 # changes in the current journal
+        self.replayed = 0 # changes replayed at startup and not yet in a snapshot
+        self.compact_lock = threading.Lock()
+        self.compact_event = threading.Event()
+        self.stop_event = threading.Event()
+        super().__init__(storage_dir)
+        self.thread = threading.Thread(target=self._run, name="db-compactor", daemon=True)
+        self.thread.start()
+
+    def _path(self, kind, generation):
+        extension = "json" if kind == "snapshot" else "log"
+        return os.path.join(self.journal_dir, f"{kind}-{generation:06d}.{extension}")
+
+    def _generations(self, kind):
+        found = []
+        for name in os.listdir(self.journal_dir):
+            match = GENERATION_FILE.match(name)
+            if match and match.group(1) == kind:
+                found.append(int(match.group(2)))
+        return sorted(found)
+
+    def _load(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        snapshots = self._generations("snapshot")
+        if snapshots:
+            self.snapshot_generation = snapshots[-1]
+        state = self._read_state(self.snapshot_generation)
+        journals = [generation for generation in self._generations("journal") if generation >= self.snapshot_generation]
+        self.replayed = sum(self._replay(state, generation) for generation in journals)
+        for generation in journals:
+            # Left by runs that changed nothing; they would otherwise pile up across restarts
+            if os.path.getsize(self._path("journal", generation)) == 0:
+                os.remove(self._path("journal", generation))
+        self.users, self.games, self.reviews = state["users"], state["games"], state["reviews"]
+        # Always a fresh file: the last one may end in a line torn by a crash
+        self._open_journal(max([self.snapshot_generation] + journals) + 1)
+        log.info("Loaded journaled storage", snapshot=self.snapshot_generation, journals=len(journals), replayed=self.replayed)
+
+    def _read_state(self, generation):
+        """Collections as of snapshot generation; generation 0 reads the plain JSON files."""
+        if not generation:
+            return {collection: self._load_data(path) for collection, path in self.files.items()}
+        with open(self._path("snapshot", generation), "r") as f:
+            return json.load(f)
+
+    def _replay(self, state, generation):
+        """Applies journal generation to state and returns the number of records replayed."""
+        path = self._path("journal", generation)
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, "r") as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                collection, key, value = json.loads(line)
+            except ValueError:
+                if number == len(lines):
+                    # Written as the process died; the change was never acknowledged
+                    log.warning("Ignoring torn journal record", path=path)
+                    break
+                raise
+            _apply(state, collection, key, value)
+            count += 1
+        return count
+
+    def _open_journal(self, generation):
+        # Caller holds self.lock (or is still in __init__)
+        if self.journal:
+            self.journal.close()
+        self.generation = generation
+        self.journal = open(self._path("journal", generation), "a")
+        self.records = 0
+
+    def _record(self, collection, key, value):
+        self.journal.write(json.dumps([collection, key, value]) + "\n")
+        self.journal.flush()
+        self.records += 1
+        if self.records >= self.compact_records:
+            self.compact_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.compact_event.wait(self.compact_interval)
+            self.compact_event.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                log.error("Error compacting journal", error=e)
+
+    def compact(self):
+        """Folds the journals written so far into a new snapshot. Returns False if there was nothing to fold."""
+        with self.compact_lock:
+            with self.lock:
+                if not self.records and not self.replayed:
+                    return False
+                closed = self.generation
+                self._open_journal(closed + 1)
+            # Built from the files rather than the live dicts, which keep changing meanwhile
+            start = time.perf_counter()
+            state = self._read_state(self.snapshot_generation)
+            replayed = sum(self._replay(state, generation) for generation in range(self.snapshot_generation, closed + 1))
+            write_atomic(self._path("snapshot", closed + 1), json.dumps(state))
+            self.snapshot_generation = closed + 1
+            self.replayed = 0
+            for kind in ("snapshot", "journal"):
+                for generation in self._generations(kind):
+                    if generation <= closed:
+                        os.remove(self._path(kind, generation))
+            log.info("Compacted journal", snapshot=closed + 1, records=replayed,
+                     seconds=round(time.perf_counter() - start, 3))
+            return True
+
+    def close(self):
+        self.stop_event.set()
+        self.compact_event.set()
+        self.thread.join()
+        # Leaves the next start a snapshot to load instead of a journal to replay
+        self.compact()
+        with self.lock:
+            self.journal.close()
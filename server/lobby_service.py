@@ -6,34 +6,66 @@ import socket
 import time
 import shutil
 from shared.protocol import *
+from server import log as logging
+from server.metrics import Counter, Gauge
+from server.lobby_state import AdoptedProcess, pid_alive
+from server.rate_limit import RateLimiter, SESSION_RATE, SESSION_BURST, ROOM_RATE, ROOM_BURST
+
+log = logging.get_logger("lobby")
+game_log = logging.get_logger("game")
+
+# Seconds between reads of a game's output file when it has nothing new
+OUTPUT_POLL = 0.1
+# Same while waiting for a starting game to announce its port; the host is waiting on it
+STARTUP_POLL = 0.01
+# Restored rooms keep their places this long for players to log back in
+RESTORE_GRACE = 60
+# Room fields only the server uses; never sent to clients
+INTERNAL_ROOM_FIELDS = ("process", "run_dir", "script", "log", "archive")
+
+def _public_room(room):
+    """Copy of room as clients see it."""
+    return {key: value for key, value in room.items() if key not in INTERNAL_ROOM_FIELDS}
+
+def _next_line(output):
+    """Next complete line of a file still being written, or None if there is none yet."""
+    line = output.readline()
+    if line.endswith(b"\n"):
+        return line.decode(errors="replace").strip()
+    # The game is mid-line; read it again once it is finished
+    output.seek(-len(line), os.SEEK_CUR)
+    return None
 
 class LobbyService:
-    def __init__(self, db, broadcast_func):
+    def __init__(self, db, sessions, blob_store, session_limiter=None, room_limiter=None, batcher=None):
         self.db = db
-        self.broadcast_func = broadcast_func
+        self.sessions = sessions
+        self.blob_store = blob_store
         self.rooms = {} # room_id -> room_info
         self.room_counter = 1
         self.lock = threading.Lock()
         self.next_port = 9000 # Start allocating game ports from 9000
+        self.starting = {} # room_id -> token of the launch in progress; gone once it is cancelled
+        self.games_started = Counter("gameserver_games_started_total", "Game server processes launched")
+        self.room_messages = Counter("gameserver_room_messages_total", "Chat and plugin messages relayed to rooms", "kind")
+        self.restored_rooms = set() # room ids waiting for their players after a restart
+        # Chat and plugin messages fan out to the whole room, so each sender and each room is throttled
+        self.session_limiter = session_limiter if session_limiter is not None else RateLimiter(SESSION_RATE, SESSION_BURST)
+        self.room_limiter = room_limiter if room_limiter is not None else RateLimiter(ROOM_RATE, ROOM_BURST)
+        self.batcher = batcher # None relays every chat and plugin message at once
+        self.rate_limited = Counter("gameserver_rate_limited_total", "Chat and plugin messages refused by a rate limit", "scope")
 
-    def handle_message(self, sock, msg_type, data, user_info):
-        if msg_type == MSG_CREATE_ROOM:
-            return self.handle_create_room(data, user_info)
-        elif msg_type == MSG_JOIN_ROOM:
-            return self.handle_join_room(data, user_info)
-        elif msg_type == MSG_LIST_ROOMS:
-            return self.handle_list_rooms()
-        elif msg_type == MSG_START_GAME:
-            return self.handle_start_game(data, user_info)
-        elif msg_type == MSG_PLUGIN_MESSAGE:
-            return self.handle_plugin_message(data, user_info)
-        elif msg_type == MSG_LEAVE_ROOM:
-            return self.handle_leave_room(user_info)
-        elif msg_type == MSG_CHAT:
-            return self.handle_chat(data, user_info)
-        return create_response(STATUS_ERROR, message="Unknown lobby command")
+    def register_handlers(self, handlers):
+        players = [ROLE_PLAYER]
+        handlers.add(MSG_CREATE_ROOM, self.handle_create_room, players)
+        handlers.add(MSG_JOIN_ROOM, self.handle_join_room, players)
+        handlers.add(MSG_LIST_ROOMS, self.handle_list_rooms, players)
+        handlers.add(MSG_START_GAME, self.handle_start_game, players)
+        handlers.add(MSG_PLUGIN_MESSAGE, self.handle_plugin_message, players)
+        handlers.add(MSG_LEAVE_ROOM, self.handle_leave_room, players)
+        handlers.add(MSG_CHAT, self.handle_chat, players)
 
-    def handle_create_room(self, data, user_info):
+    def handle_create_room(self, sock, data, user_info):
         game_id = data.get("game_id")
         game = self.db.get_game(game_id)
         if not game:
@@ -55,7 +87,7 @@ class LobbyService:
             
         return create_response(STATUS_OK, message="Room created", data={"room_id": room_id})
 
-    def handle_join_room(self, data, user_info):
+    def handle_join_room(self, sock, data, user_info):
         room_id = data.get("room_id")
         
         with self.lock:
@@ -83,21 +115,17 @@ class LobbyService:
                 "joined": user_info["username"]
             })
             existing_players = [p for p in room["players"] if p != user_info["username"]]
-            self.broadcast_func(existing_players, msg)
+            self.sessions.push(existing_players, msg)
+            room_data = _public_room(room)
             
-        return create_response(STATUS_OK, message="Joined room", data={"room": room})
+        return create_response(STATUS_OK, message="Joined room", data={"room": room_data})
 
-    def handle_list_rooms(self):
+    def handle_list_rooms(self, sock, data, user_info):
         with self.lock:
-            rooms_list = []
-            for r in self.rooms.values():
-                room_data = r.copy()
-                if "process" in room_data:
-                    del room_data["process"]
-                rooms_list.append(room_data)
+            rooms_list = [_public_room(r) for r in self.rooms.values()]
             return create_response(STATUS_OK, data={"rooms": rooms_list})
 
-    def handle_start_game(self, data, user_info):
+    def handle_start_game(self, sock, data, user_info):
         room_id = data.get("room_id")
         
         with self.lock:
@@ -107,6 +135,9 @@ class LobbyService:
                 
             if room["host"] != user_info["username"]:
                 return create_response(STATUS_ERROR, message="Only host can start game")
+            
+            if room["status"] != "WAITING":
+                return create_response(STATUS_ERROR, message="Game already started")
                 
             # Check min players
             game_id = room["game_id"]
@@ -117,13 +148,13 @@ class LobbyService:
                 return create_response(STATUS_ERROR, message=f"Not enough players (min {min_players})")
             
             version = game["latest_version"]
+            zip_path = self.blob_store.archive_path(game, version)
             
             run_dir = os.path.join("server", "running_games", f"{game_id}_{version}")
             if not os.path.exists(run_dir):
                 # Unzip if not exists
                 import zipfile
-                zip_path = os.path.join("server", "storage", "games", game_id, f"{version}.zip")
-                if not os.path.exists(zip_path):
+                if not zip_path:
                      return create_response(STATUS_ERROR, message="Game files missing")
                 
                 os.makedirs(run_dir)
@@ -145,73 +176,217 @@ class LobbyService:
             if not os.path.exists(server_script):
                 return create_response(STATUS_ERROR, message="Game server script not found")
                 
+            # Reserve the room and a port, then launch the game and wait for it without the lock:
+            # that takes a while and every other lobby request needs the lock
             port = self.next_port
+            self.next_port += 1
+            room["status"] = "STARTING"
+            # Recorded now so a room that ends meanwhile does not delete the directory under this launch
+            room["run_dir"] = run_dir
+            token = self.starting[room_id] = object()
+            # Keep this version's archive while the room runs it, even if the game is updated meanwhile
+            archive = game.get("archives", {}).get(version)
+            if archive:
+                self.blob_store.pin(archive, f"room:{room_id}")
+                room["archive"] = archive
             
             server_script_abs = os.path.abspath(server_script)
-            server_dir_abs = os.path.dirname(server_script_abs)
+            log_path = os.path.join(run_dir, f"room_{room_id}.log")
+        
+        try:
+            proc, port, output = self._launch_game(server_script_abs, port, log_path, game_id, room_id)
+        except Exception as e:
+            self._cancel_start(room_id, room, token)
+            if isinstance(e, ChildProcessError):
+                return create_response(STATUS_ERROR, message=str(e))
+            return create_response(STATUS_ERROR, message=f"Failed to launch game server: {e}")
+        
+        with self.lock:
+            cancelled = self.starting.get(room_id) is not token
+            if not cancelled:
+                del self.starting[room_id]
+                self._commit_start(room_id, room, proc, port, output, server_script_abs, log_path)
+        if cancelled:
+            # The host left or a player dropped out while the game was starting
+            output.close()
+            proc.terminate()
+            proc.wait()
+            return create_response(STATUS_ERROR, message="Room changed while the game was starting")
+        return create_response(STATUS_OK, message="Game start requested")
+
+    def _commit_start(self, room_id, room, proc, port, output, script, log_path):
+        # Caller holds self.lock
+        self._follow_output(proc, output, room["game_id"], room_id)
+        self.next_port = max(self.next_port, port + 1)
+        
+        room["process"] = proc
+        room["port"] = port
+        room["script"] = script
+        room["log"] = log_path
+        room["status"] = "PLAYING"
+        self.games_started.inc()
+        
+        # Broadcast GAME_STARTED to all players
+        msg = create_message(MSG_GAME_STARTED, {
+            "room_id": room_id,
+            "port": port,
+            "host": "127.0.0.1"
+        })
+        self.sessions.push(room["players"], msg)
+
+    def _launch_game(self, script, port, log_path, game_id, room_id):
+        """Starts a game server and waits up to 5s for the port it announces.
+
+        Returns (process, port, open output file). Raises ChildProcessError
+        with the game's output if it exits first. Called without the lobby lock.
+        """
+        # python3 -u server.py <port>
+        # Output goes to a file rather than a pipe and the game gets its own session,
+        # so it keeps running through a server restart and can be adopted again
+        with open(log_path, "wb") as game_output:
+            proc = subprocess.Popen(
+                [sys.executable, "-u", script, str(port)], 
+                cwd=os.path.dirname(script),
+                stdout=game_output,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        
+        import re
+        start_time = time.time()
+        output = open(log_path, "rb")
+        
+        while time.time() - start_time < 5:
+            line = _next_line(output)
+            if line is None:
+                if proc.poll() is not None:
+                    output.seek(0)
+                    err = output.read().decode(errors="replace")
+                    output.close()
+                    raise ChildProcessError(f"Game process died: {err}")
+                time.sleep(STARTUP_POLL)
+                continue
+                
+            game_log.info(line, game_id=game_id, room_id=room_id)
             
+            match = re.search(r"Game Server started on (\d+)", line)
+            if match:
+                port = int(match.group(1))
+                break
+        return proc, port, output
+
+    def _cancel_start(self, room_id, room, token):
+        """Puts a room whose game failed to start back to waiting, unless a player leaving did so already."""
+        with self.lock:
+            if self.starting.get(room_id) is not token:
+                return
+            del self.starting[room_id]
+            room.pop("run_dir", None)
+            if "archive" in room:
+                self.blob_store.unpin(room.pop("archive"), f"room:{room_id}")
+            room["status"] = "WAITING"
+
+    def _follow_output(self, proc, output, game_id, room_id):
+        """Copies what the game writes to its output file into the game log until it exits."""
+        def reader_thread():
             try:
-                # python3 -u server.py <port>
-                proc = subprocess.Popen(
-                    [sys.executable, "-u", server_script_abs, str(port)], 
-                    cwd=server_dir_abs,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                
-                import re
-                port = self.next_port 
-                start_time = time.time()
-                
-                while time.time() - start_time < 5:
-                    line = proc.stdout.readline()
-                    if not line:
-                        if proc.poll() is not None:
-                            _, err = proc.communicate()
-                            return create_response(STATUS_ERROR, message=f"Game process died: {err}")
-                        break
-                        
-                    print(f"[{game_id}] {line.strip()}") 
-                    
-                    match = re.search(r"Game Server started on (\d+)", line)
-                    if match:
-                        port = int(match.group(1))
-                        break
+                with output:
+                    while True:
+                        line = _next_line(output)
+                        if line is not None:
+                            game_log.info(line, game_id=game_id, room_id=room_id)
+                        elif proc.poll() is not None:
+                            for line in output.read().decode(errors="replace").splitlines():
+                                game_log.info(line.strip(), game_id=game_id, room_id=room_id)
+                            break
+                        else:
+                            time.sleep(OUTPUT_POLL)
+            except Exception: pass
+        
+        threading.Thread(target=reader_thread, name=f"game-output-{room_id}", daemon=True).start()
 
-                def reader_thread(p):
-                    try:
-                        while p.poll() is None:
-                            line = p.stdout.readline()
-                            if line: print(f"[GAME LOG] {line.strip()}")
-                    except: pass
-                
-                threading.Thread(target=reader_thread, args=(proc,), daemon=True).start()
+    def snapshot(self):
+        """Rooms and game process bindings as plain data, for a restart to pick up again."""
+        with self.lock:
+            rooms = {}
+            for room_id, room in self.rooms.items():
+                state = {key: value for key, value in room.items() if key != "process"}
+                state["players"] = list(room["players"])
+                if room.get("process"):
+                    state["pid"] = room["process"].pid
+                rooms[room_id] = state
+            return {"room_counter": self.room_counter, "next_port": self.next_port, "rooms": rooms}
 
-                self.next_port = port + 1 
-                
-                room["process"] = proc
-                room["port"] = port
-                room["run_dir"] = run_dir
-                room["status"] = "PLAYING"
+    def restore(self, state, grace=RESTORE_GRACE):
+        """Brings back the rooms of a snapshot and re-adopts the game servers still running.
+
+        Players are not connected yet; each room keeps their places for grace
+        seconds and then drops whoever has not logged back in, exactly as if
+        they had disconnected.
+        """
+        adopted = lost = 0
+        with self.lock:
+            for room_id, room in state.get("rooms", {}).items():
+                pid = room.pop("pid", None)
+                if room.get("status") in ("STARTING", "PLAYING"):
+                    if pid and pid_alive(pid, room.get("script")):
+                        room["process"] = AdoptedProcess(pid, room.get("script"))
+                        if room.get("archive"):
+                            self.blob_store.pin(room["archive"], f"room:{room_id}")
+                        if room.get("log") and os.path.exists(room["log"]):
+                            output = open(room["log"], "rb")
+                            output.seek(0, os.SEEK_END)
+                            self._follow_output(room["process"], output, room["game_id"], room_id)
+                        adopted += 1
+                    else:
+                        # The game ended (or never finished starting) while the server was down;
+                        # the room is back to waiting
+                        for key in ("port", "run_dir", "script", "log", "archive"):
+                            room.pop(key, None)
+                        room["status"] = "WAITING"
+                        lost += 1
+                self.rooms[room_id] = room
+                self.restored_rooms.add(room_id)
+            ids = [int(room_id) for room_id in self.rooms if room_id.isdigit()]
+            self.room_counter = max([state.get("room_counter", 1)] + [i + 1 for i in ids])
+            self.next_port = max(self.next_port, state.get("next_port", self.next_port))
+        log.info("Restored lobby", rooms=len(state.get("rooms", {})), games_adopted=adopted, games_lost=lost,
+                 grace=grace)
+        if self.restored_rooms:
+            timer = threading.Timer(grace, self.prune_restored)
+            timer.daemon = True
+            timer.start()
+
+    def prune_restored(self):
+        """Drops players of restored rooms who did not come back; rooms left empty or hostless close."""
+        with self.lock:
+            absent = {username for room_id in self.restored_rooms if room_id in self.rooms
+                      for username in self.rooms[room_id]["players"] if not self.sessions.is_online(username)}
+            self.restored_rooms = set()
+        for username in absent:
+            log.info("Player did not return after restart", username=username)
+            self._remove_player_from_rooms(username)
+
+    def stop_games(self):
+        """Terminates every game server, for a shutdown that no snapshot will restore."""
+        with self.lock:
+            # Launches still in progress stop their games themselves when they find their token gone
+            self.starting.clear()
+            games = [(room_id, room["process"]) for room_id, room in self.rooms.items() if room.get("process")]
+        for room_id, proc in games:
+            try:
+                proc.terminate()
+                proc.wait(timeout=5)
             except Exception as e:
-                return create_response(STATUS_ERROR, message=f"Failed to launch game server: {e}")
-            
-            # Broadcast GAME_STARTED to all players
-            msg = create_message(MSG_GAME_STARTED, {
-                "room_id": room_id,
-                "port": port,
-                "host": "127.0.0.1"
-            })
-            self.broadcast_func(room["players"], msg)
-            
-        return create_response(STATUS_OK, message="Game start requested")
+                log.error("Error killing game server", room_id=room_id, error=e)
+        if games:
+            log.info("Stopped game servers", count=len(games))
 
-    def handle_leave_room(self, user_info):
+    def handle_leave_room(self, sock, data, user_info):
         self._remove_player_from_rooms(user_info["username"])
         return create_response(STATUS_OK, message="Left room")
 
-    def handle_chat(self, data, user_info):
+    def handle_chat(self, sock, data, user_info):
         room_id = data.get("room_id")
         message = data.get("message")
         
@@ -222,16 +397,68 @@ class LobbyService:
             
             if user_info["username"] not in room["players"]:
                 return create_response(STATUS_ERROR, message="Not in room")
+            
+            limited = self._rate_limited(sock, room_id)
+            if limited:
+                return limited
                 
             msg = create_message(MSG_CHAT, {
                 "room_id": room_id,
                 "sender": user_info["username"],
                 "message": message
             })
-            self.broadcast_func(room["players"], msg)
+            self._relay(room_id, room["players"], msg)
+            self.room_messages.inc(1, "chat")
             
         return create_response(STATUS_OK)
 
+    def _relay(self, room_id, players, msg):
+        if self.batcher:
+            self.batcher.add(room_id, players, msg)
+        else:
+            self.sessions.push(players, msg)
+
+    def _rate_limited(self, sock, room_id):
+        """Refusal for a session or room over its message rate, or None.
+
+        Checked only once the sender is known to be in the room, so outsiders
+        cannot drain a room's bucket. A message the room refuses gives the
+        session its token back.
+        """
+        scope = "session"
+        retry_after = self.session_limiter.acquire(sock)
+        if not retry_after:
+            scope = "room"
+            retry_after = self.room_limiter.acquire(room_id)
+            if retry_after:
+                self.session_limiter.refund(sock)
+        if not retry_after:
+            return None
+        self.rate_limited.inc(1, scope)
+        retry_after = round(retry_after, 2)
+        return create_response(STATUS_ERROR, message=f"Too many messages, retry in {retry_after}s",
+                               data={"retry_after": retry_after})
+
+    def metric_families(self):
+        rooms = Gauge("gameserver_rooms", "Rooms by status", "status")
+        processes = Gauge("gameserver_game_processes", "Game server processes still running")
+        rooms_created = Counter("gameserver_rooms_created_total", "Rooms created")
+        with self.lock:
+            for status in ("WAITING", "STARTING", "PLAYING"):
+                rooms.set(0, status)
+            running = 0
+            for room in self.rooms.values():
+                rooms.inc(1, room["status"])
+                proc = room.get("process")
+                if proc and proc.poll() is None:
+                    running += 1
+            rooms_created.inc(self.room_counter - 1)
+        processes.set(running)
+        families = [rooms, processes, rooms_created, self.games_started, self.room_messages, self.rate_limited]
+        if self.batcher:
+            families += self.batcher.metric_families()
+        return families
+
     def handle_player_disconnect(self, username):
         self._remove_player_from_rooms(username)
 
@@ -243,30 +470,36 @@ class LobbyService:
                     is_host = (username == room["host"])
                     room["players"].remove(username)
                     
-                    # If game was playing, stop it
-                    if room.get("status") == "PLAYING":
-                        print(f"Player {username} left/disconnected during game in room {room_id}. Stopping game server.")
+                    # If game was playing (or starting), stop it
+                    if room.get("status") in ("STARTING", "PLAYING"):
+                        log.info("Player left during game, stopping game server", username=username, room_id=room_id)
+                        # A launch still in progress sees this and stops its game itself
+                        self.starting.pop(room_id, None)
                         if "process" in room:
                             try:
                                 room["process"].terminate()
                                 room["process"].wait()
                             except Exception as e:
-                                print(f"Error killing game server: {e}")
+                                log.error("Error killing game server", room_id=room_id, error=e)
                             del room["process"]
                         
-                        # Cleanup running game directory
-                        if "run_dir" in room:
+                        if "archive" in room:
+                            self.blob_store.unpin(room.pop("archive"), f"room:{room_id}")
+                        
+                        # Cleanup running game directory, unless another room runs or starts the same version from it
+                        run_dir = room.pop("run_dir", None)
+                        if run_dir and not any(other.get("run_dir") == run_dir for other in self.rooms.values()):
                             try:
-                                shutil.rmtree(room["run_dir"])
-                                print(f"Cleaned up running game directory: {room['run_dir']}")
+                                shutil.rmtree(run_dir)
+                                log.info("Cleaned up running game directory", path=run_dir)
                             except Exception as e:
-                                print(f"Error cleaning up running game directory: {e}")
+                                log.error("Error cleaning up running game directory", path=run_dir, error=e)
                         
                         room["status"] = "WAITING"
                     
                     if is_host:
                         # Host left -> Close Room
-                        print(f"Host {username} left room {room_id}. Closing room.")
+                        log.info("Host left, closing room", username=username, room_id=room_id)
                         
                         # Notify remaining players
                         if room["players"]:
@@ -276,7 +509,7 @@ class LobbyService:
                                 "host": None,
                                 "status": "CLOSED"
                             })
-                            self.broadcast_func(room["players"], msg)
+                            self.sessions.push(room["players"], msg)
                         
                         del self.rooms[room_id]
                     
@@ -291,9 +524,9 @@ class LobbyService:
                             "host": room["host"],
                             "status": room["status"]
                         })
-                        self.broadcast_func(room["players"], msg)
+                        self.sessions.push(room["players"], msg)
 
-    def handle_plugin_message(self, data, user_info):
+    def handle_plugin_message(self, sock, data, user_info):
         room_id = data.get("room_id")
         plugin_id = data.get("plugin_id")
         payload = data.get("payload")
@@ -305,6 +538,10 @@ class LobbyService:
             
             if user_info["username"] not in room["players"]:
                 return create_response(STATUS_ERROR, message="Not in room")
+            
+            limited = self._rate_limited(sock, room_id)
+            if limited:
+                return limited
                 
             # Broadcast to all players in room
             msg = create_message(MSG_PLUGIN_MESSAGE, {
@@ -313,6 +550,7 @@ class LobbyService:
                 "sender": user_info["username"],
                 "payload": payload
             })
-            self.broadcast_func(room["players"], msg)
+            self._relay(room_id, room["players"], msg)
+            self.room_messages.inc(1, "plugin")
             
         return create_response(STATUS_OK)
@@ -0,0 +1,138 @@
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from server import log as logging
+
+log = logging.get_logger("lobby")
+
+STATE_FILE = os.path.join("server", "storage", "lobby_state.json")
+# Seconds between periodic snapshots; one is always written at shutdown
+SNAPSHOT_INTERVAL = 5
+
+def write_atomic(path, text):
+    """Replaces path with text so a crash leaves either the old file or the new one, never half of each."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_state(path):
+    """The last snapshot written to path, or None if there is none to restore."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable lobby snapshot", path=path, error=e)
+        return None
+
+def pid_alive(pid, script=None):
+    """True if pid is still running (and, where /proc shows it, still running script)."""
+    if os.name != "posix":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process took the PID over
+        return False
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            if f.read().rpartition(")")[2].split()[0] == "Z":
+                return False
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return True # no /proc; trust the signal
+    return script is None or script in cmdline
+
+class AdoptedProcess:
+    """Popen-like handle on a game server launched by an earlier run of this server.
+
+    It is no longer our child, so liveness comes from pid_alive() rather than
+    wait(); only poll, terminate, wait and pid are provided, which is all the
+    lobby uses.
+    """
+    def __init__(self, pid, script=None):
+        self.pid = pid
+        self.script = script
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                # Succeeds only if the process was re-parented to us
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+                if pid:
+                    self.returncode = os.waitstatus_to_exitcode(status)
+                    return self.returncode
+            except ChildProcessError:
+                pass
+            if not pid_alive(self.pid, self.script):
+                self.returncode = -1 # the real exit status went to whoever reaped it
+        return self.returncode
+
+    def terminate(self):
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() > deadline:
+                raise subprocess.TimeoutExpired(str(self.pid), timeout)
+            time.sleep(0.05)
+        return self.returncode
+
+class LobbySnapshotter:
+    """Writes LobbyService.snapshot() to path every interval seconds and once more on stop().
+
+    Unchanged snapshots are not rewritten, so an idle lobby costs one
+    serialisation per interval and no disk writes.
+    """
+    def __init__(self, lobby, path=STATE_FILE, interval=SNAPSHOT_INTERVAL):
+        self.lobby = lobby
+        self.path = path
+        self.interval = interval
+        self.last_written = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.interval:
+            self.thread = threading.Thread(target=self._run, name="lobby-snapshot", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.write()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            state = self.lobby.snapshot()
+            text = json.dumps(state, indent=4)
+            if text == self.last_written:
+                return
+            # Stamped only once it is known to differ, so the comparison above can match
+            state["saved_at"] = time.time()
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            write_atomic(self.path, json.dumps(state, indent=4))
+            self.last_written = text
+        except Exception as e:
+            log.error("Error writing lobby snapshot", path=self.path, error=e)
@@ -0,0 +1,146 @@
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+FORMAT_TEXT = "text"
+FORMAT_JSON = "json"
+FORMATS = [FORMAT_TEXT, FORMAT_JSON]
+
+# Records that may wait for the writer thread before new ones are dropped
+MAX_BUFFERED = 10000
+
+class LogWriter:
+    """Formats and writes log records on a background thread.
+
+    Callers only append a tuple to a bounded buffer, so a slow terminal or pipe
+    never blocks request handling. When the buffer is full new records are
+    dropped and the writer reports how many. Records below the level are
+    discarded up front, and categories can be sampled (keep 1 in N) so chatty
+    sources such as per-request or game output logs stay cheap.
+    """
+    def __init__(self, stream=None, level=INFO, max_buffered=MAX_BUFFERED, fmt=FORMAT_TEXT):
+        self.stream = stream or sys.stdout
+        self.level = level
+        self.max_buffered = max_buffered
+        self.fmt = fmt
+        self.sample_every = {} # category -> keep 1 in N (0 = keep none)
+        self.seen = {} # category -> records offered while sampled
+        self.cond = threading.Condition()
+        self.buffer = deque()
+        self.pending = 0 # buffered or being written
+        self.dropped = 0
+        self.thread = None
+
+    def set_sample_rate(self, category, rate):
+        """Keeps roughly rate (0..1) of the category's records below WARNING."""
+        self.sample_every[category] = round(1 / rate) if rate > 0 else 0
+
+    def emit(self, level, category, message, fields):
+        if level < self.level:
+            return
+        every = self.sample_every.get(category)
+        if every is not None and level < WARNING:
+            seen = self.seen.get(category, 0) + 1
+            self.seen[category] = seen
+            if not every or seen % every:
+                return
+        record = (time.time(), level, category, message, fields)
+        with self.cond:
+            if len(self.buffer) >= self.max_buffered:
+                self.dropped += 1
+                return
+            self.buffer.append(record)
+            self.pending += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.buffer and not self.dropped:
+                    self.cond.wait()
+                records = self.buffer
+                self.buffer = deque()
+                dropped = self.dropped
+                self.dropped = 0
+            lines = [self._format(*record) for record in records]
+            if dropped:
+                lines.append(self._format(time.time(), WARNING, "log", "Log records dropped", {"count": dropped}))
+            try:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+            with self.cond:
+                self.pending -= len(records)
+                self.cond.notify_all()
+
+    def _format(self, timestamp, level, category, message, fields):
+        if self.fmt == FORMAT_JSON:
+            record = {"ts": round(timestamp, 3), "level": LEVEL_NAMES[level], "category": category, "msg": message}
+            record.update(fields)
+            return json.dumps(record, default=str)
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) + f".{int(timestamp % 1 * 1000):03d}"
+        line = f"{ts} {LEVEL_NAMES[level]:<7} {category:<9} {message}"
+        for key, value in fields.items():
+            value = str(value)
+            if not value or any(c in value for c in ' "='):
+                value = json.dumps(value)
+            line += f" {key}={value}"
+        return line
+
+    def flush(self, timeout=5):
+        """Waits until everything logged so far has been written."""
+        with self.cond:
+            self.cond.wait_for(lambda: not self.pending, timeout)
+
+class Logger:
+    """Logging facade for one category, e.g. get_logger("lobby").info("Room closed", room_id=room_id)."""
+    def __init__(self, category):
+        self.category = category
+
+    def debug(self, message, **fields):
+        _writer.emit(DEBUG, self.category, message, fields)
+
+    def info(self, message, **fields):
+        _writer.emit(INFO, self.category, message, fields)
+
+    def warning(self, message, **fields):
+        _writer.emit(WARNING, self.category, message, fields)
+
+    def error(self, message, **fields):
+        _writer.emit(ERROR, self.category, message, fields)
+
+_writer = LogWriter()
+atexit.register(_writer.flush)
+
+def get_logger(category):
+    return Logger(category)
+
+def configure(level=None, sample_rates=None, max_buffered=None, fmt=None, stream=None):
+    """Applies command line settings to the process-wide writer."""
+    if level is not None:
+        _writer.level = LEVELS[level] if isinstance(level, str) else level
+    for category, rate in (sample_rates or {}).items():
+        _writer.set_sample_rate(category, rate)
+    if max_buffered is not None:
+        _writer.max_buffered = max_buffered
+    if fmt is not None:
+        _writer.fmt = fmt
+    if stream is not None:
+        _writer.stream = stream
+
+def flush(timeout=5):
+    _writer.flush(timeout)
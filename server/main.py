@@ -1,5 +1,5 @@
 import socket
-import threading
+import signal
 import sys
 import os
 
@@ -7,24 +7,109 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from shared.protocol import *
-from shared.utils import send_json, recv_json
+from shared.utils import send_json, recv_json, socket_state, enable_keepalive, FILE_CHUNK_SIZE, DEFAULT_COMPRESS_THRESHOLD, \
+    HEARTBEAT_INTERVAL, KEEPALIVE_IDLE, KEEPALIVE_INTERVAL, KEEPALIVE_COUNT
 from server.database import Database
-from server.developer_service import DeveloperService
-from server.lobby_service import LobbyService
+from server.sqlite_database import SqliteDatabase
+from server.journal_database import JournalDatabase
+from server.developer_service import DeveloperService, RETAIN_VERSIONS
+from server.lobby_service import LobbyService, RESTORE_GRACE
+from server.rate_limit import RateLimiter, SESSION_RATE, SESSION_BURST, ROOM_RATE, ROOM_BURST
+from server.room_batcher import RoomBatcher
+from server.lobby_state import LobbySnapshotter, load_state, STATE_FILE, SNAPSHOT_INTERVAL
 from server.store_service import StoreService
+from server.blob_store import BlobStore
+from server.async_engine import AsyncioEngine
+from server.worker_pool import WorkerPool, PoolSaturated
+from server.session_registry import SessionRegistry, MAX_SESSIONS_PER_USER
+from server.outbound import POLICIES, DEFAULT_POLICY, MAX_QUEUED
+from server.handler_registry import HandlerRegistry
+from server.metrics import Counter, Gauge
+from server.metrics_endpoint import MetricsEndpoint
+from server.admin_service import AdminService
+from server import log as logging
+
+log = logging.get_logger("server")
+request_log = logging.get_logger("request")
 
 HOST = '0.0.0.0'
 PORT = 8888
+REQUEST_WORKERS = 8
+# Thread engine: clients served at once; one more is refused straight away
+CLIENT_WORKERS = 1000
+# Pipelined requests that may wait for a free request worker
+QUEUE_DEPTH = 200
+BACKLOG = socket.SOMAXCONN
+# Seconds a rejected client is asked to wait before trying again
+RETRY_AFTER = 2
+# Connections silent for this long are reaped; clients ping every HEARTBEAT_INTERVAL
+IDLE_TIMEOUT = 4 * HEARTBEAT_INTERVAL
+
+ENGINE_THREADS = "threads"
+ENGINE_ASYNCIO = "asyncio"
+ENGINES = [ENGINE_THREADS, ENGINE_ASYNCIO]
+
+# Storage for users, games and reviews; both keep their files under server/storage
+DB_BACKENDS = {"json": Database, "journal": JournalDatabase, "sqlite": SqliteDatabase}
+DEFAULT_DB_BACKEND = "json"
+
+# Read-only requests that may be answered out of order when tagged with an id.
+# Everything else is handled in arrival order on the connection's thread.
+PIPELINED_MESSAGES = {MSG_LIST_GAMES, MSG_GAME_DETAILS, MSG_LIST_REVIEWS, MSG_LIST_ROOMS, MSG_LIST_PLUGINS}
 
 class GameServer:
-    def __init__(self, host=HOST, port=PORT):
+    def __init__(self, host=HOST, port=PORT, chunk_size=FILE_CHUNK_SIZE, encodings=SUPPORTED_ENCODINGS,
+                 compress_threshold=DEFAULT_COMPRESS_THRESHOLD, retain_versions=RETAIN_VERSIONS, engine=ENGINE_THREADS,
+                 workers=CLIENT_WORKERS, queue_depth=QUEUE_DEPTH, backlog=BACKLOG,
+                 max_sessions=MAX_SESSIONS_PER_USER, outbound_queue=MAX_QUEUED, slow_consumer=DEFAULT_POLICY,
+                 metrics_port=None, admin_token=None, idle_timeout=IDLE_TIMEOUT,
+                 keepalive_idle=KEEPALIVE_IDLE, keepalive_interval=KEEPALIVE_INTERVAL, keepalive_count=KEEPALIVE_COUNT,
+                 lobby_state=STATE_FILE, snapshot_interval=SNAPSHOT_INTERVAL, restore_grace=RESTORE_GRACE,
+                 session_rate=SESSION_RATE, session_burst=SESSION_BURST, room_rate=ROOM_RATE, room_burst=ROOM_BURST,
+                 room_batch_ms=0, db_backend=DEFAULT_DB_BACKEND):
         self.host = host
         self.port = port
-        self.db = Database()
-        self.dev_service = DeveloperService(self.db)
-        self.clients = {} # socket -> user_info
-        self.lobby_service = LobbyService(self.db, self.broadcast)
-        self.store_service = StoreService(self.db)
+        self.metrics_port = metrics_port # None disables the Prometheus endpoint
+        self.idle_timeout = idle_timeout or None # None never reaps
+        self.keepalive = (keepalive_idle, keepalive_interval, keepalive_count) if keepalive_idle else None
+        self.lobby_state = lobby_state or None # None neither saves nor restores rooms
+        self.snapshot_interval = snapshot_interval
+        self.restore_grace = restore_grace
+        self.stopping = False
+        self.engine = engine
+        self.backlog = backlog
+        self.encodings = encodings
+        self.compress_threshold = compress_threshold # 0 disables compression
+        self.db = DB_BACKENDS[db_backend]()
+        self.blob_store = BlobStore()
+        self.dev_service = DeveloperService(self.db, self.blob_store, chunk_size, retain_versions)
+        self.blob_store.import_legacy_archives(self.db, self.dev_service.storage_dir)
+        self.sessions = SessionRegistry(max_sessions, outbound_queue, slow_consumer)
+        # Chat and plugin messages are relayed at once unless batched per room every room_batch_ms
+        self.room_batcher = RoomBatcher(self.sessions, room_batch_ms / 1000) if room_batch_ms else None
+        self.lobby_service = LobbyService(self.db, self.sessions, self.blob_store,
+                                          RateLimiter(session_rate, session_burst), RateLimiter(room_rate, room_burst),
+                                          self.room_batcher)
+        self.store_service = StoreService(self.db, self.blob_store)
+        # No queue: a client holds its worker until it disconnects, so a queued one could wait for hours
+        self.client_pool = WorkerPool(workers, 0, "client")
+        self.request_pool = WorkerPool(REQUEST_WORKERS, queue_depth, "request")
+        self.pipelined_messages = PIPELINED_MESSAGES
+        self.handlers = HandlerRegistry()
+        self.handlers.add(MSG_LOGIN, self.handle_login)
+        self.handlers.add(MSG_REGISTER, self.handle_register)
+        self.handlers.add(MSG_LOGOUT, self.handle_logout)
+        self.handlers.add(MSG_PING, self.handle_ping)
+        self.dev_service.register_handlers(self.handlers)
+        self.store_service.register_handlers(self.handlers)
+        self.lobby_service.register_handlers(self.handlers)
+        self.admin_service = AdminService(self, admin_token)
+        self.admin_service.register_handlers(self.handlers)
+        self.connections_accepted = Counter("gameserver_connections_accepted_total", "Client connections accepted")
+        self.connections_closed = Counter("gameserver_connections_closed_total", "Client connections closed, including rejected ones")
+        self.connections_rejected = Counter("gameserver_connections_rejected_total", "Client connections refused because the server was saturated")
+        self.messages_received = Counter("gameserver_messages_received_total", "Request messages received from clients")
+        self.connections_reaped = Counter("gameserver_connections_reaped_total", "Connections closed after --idle-timeout without a message")
 
     def get_local_ip(self):
         try:
@@ -54,34 +139,124 @@ class GameServer:
             except OSError as e:
                 # EADDRINUSE
                 if e.errno == 98 or e.errno == 48:
-                    print(f"Port {self.port} is already in use, trying next...")
+                    log.warning("Port already in use, trying next", port=self.port)
                 else:
-                    print(f"Socket error on port {self.port}: {e}")
+                    log.error("Socket error", port=self.port, error=e)
         
         if not bound:
-            print(f"\nError: Could not bind to any port in range {start_port}-{start_port + max_retries - 1}")
+            log.error("Could not bind to any port", ports=f"{start_port}-{start_port + max_retries - 1}")
+            logging.flush()
             sys.exit(1)
             
-        server_socket.listen(5)
-        print(f"\nServer started successfully!")
-        print(f"Binding address: {self.host}:{self.port}")
+        server_socket.listen(self.backlog)
+        log.info("Server started", address=f"{self.host}:{self.port}", engine=self.engine)
         
         # If binding to all interfaces (0.0.0.0), show the actual IP clients should use
         if self.host == '0.0.0.0':
             local_ip = self.get_local_ip()
-            print(f"Clients can connect to: {local_ip}:{self.port}")
-            print(f"(Use this IP address in your client configuration)\n")
+            log.info("Clients can connect to this address (use it in the client configuration)",
+                     address=f"{local_ip}:{self.port}")
+        
+        # Ctrl-C and a service manager's SIGTERM both stop the server with the lobby intact for the snapshot
+        signal.signal(signal.SIGINT, self.handle_stop_signal)
+        signal.signal(signal.SIGTERM, self.handle_stop_signal)
+        
+        snapshotter = None
+        if self.lobby_state:
+            state = load_state(self.lobby_state)
+            if state:
+                self.lobby_service.restore(state, self.restore_grace)
+            snapshotter = LobbySnapshotter(self.lobby_service, self.lobby_state, self.snapshot_interval)
+            snapshotter.start()
+        
+        if self.room_batcher:
+            self.room_batcher.start()
+        
+        if hasattr(signal, "SIGUSR1"):
+            # kill -USR1 <pid> starts a profile, the next one writes it out
+            signal.signal(signal.SIGUSR1, self.admin_service.toggle_profile)
+        
+        metrics_endpoint = None
+        if self.metrics_port:
+            metrics_endpoint = MetricsEndpoint(self, self.host, self.metrics_port)
+            metrics_endpoint.start()
 
         try:
+            if self.engine == ENGINE_ASYNCIO:
+                AsyncioEngine(self).serve(server_socket)
             while True:
                 client_sock, addr = server_socket.accept()
-                print(f"New connection from {addr}")
-                client_thread = threading.Thread(target=self.handle_client, args=(client_sock,))
-                client_thread.start()
+                self.connections_accepted.inc()
+                log.info("New connection", addr=f"{addr[0]}:{addr[1]}")
+                self.configure_client_socket(client_sock)
+                # A client silent for idle_timeout makes recv_json time out and is reaped
+                client_sock.settimeout(self.idle_timeout)
+                try:
+                    self.client_pool.submit(self.handle_client, client_sock)
+                except PoolSaturated:
+                    log.warning("Server saturated, rejecting client", addr=f"{addr[0]}:{addr[1]}")
+                    self.reject_client(client_sock)
         except KeyboardInterrupt:
-            print("\nServer stopping...")
+            log.info("Server stopping")
         finally:
             server_socket.close()
+            if self.room_batcher:
+                self.room_batcher.stop()
+            if snapshotter:
+                # Game servers run in their own sessions and outlive us; the next start adopts them
+                snapshotter.stop()
+                log.info("Lobby saved", path=self.lobby_state, rooms=len(self.lobby_service.rooms))
+            else:
+                # Games run in their own sessions; with nothing to adopt them they would be orphaned
+                self.lobby_service.stop_games()
+            if metrics_endpoint:
+                metrics_endpoint.stop()
+            log.info("Client pool", **self.client_pool.stats())
+            log.info("Request pool", **self.request_pool.stats())
+            log.info("Outbound queues", **self.sessions.outbound_stats())
+            for row in self.handlers.metrics.rows():
+                log.info("Handler latency", **row)
+            self.db.close()
+            logging.flush()
+
+    def handle_stop_signal(self, signum, frame):
+        # Set before any connection is torn down, so closing them does not empty the rooms
+        self.stopping = True
+        raise KeyboardInterrupt
+
+    def configure_client_socket(self, sock):
+        # Every frame is a single write, so Nagle would only delay pushes behind responses
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Catches crashed clients and dead links even if idle reaping is off
+        if self.keepalive:
+            enable_keepalive(sock, *self.keepalive)
+
+    def reap(self, sock):
+        """Counts a connection closed for silence; the caller's disconnect path does the cleanup."""
+        user_info = self.sessions.get(sock)
+        log.info("Reaping idle connection", username=user_info["username"] if user_info else None,
+                 idle_timeout=self.idle_timeout)
+        self.connections_reaped.inc()
+
+    def busy_response(self, msg=None):
+        """Fast refusal telling the client when to try again."""
+        response = create_response(STATUS_ERROR, message=f"Server busy, please retry in {RETRY_AFTER}s",
+                                   data={"retry_after": RETRY_AFTER})
+        if msg and msg.get("id") is not None:
+            response["id"] = msg["id"]
+        return response
+
+    def reject_client(self, sock):
+        # Answered on the accept thread, so never wait on a slow client
+        self.connections_rejected.inc()
+        self.connections_closed.inc()
+        try:
+            sock.settimeout(1)
+            send_json(sock, self.busy_response())
+        except OSError:
+            pass
+        finally:
+            sock.close()
 
     def handle_client(self, sock):
         try:
@@ -90,69 +265,95 @@ class GameServer:
                 if not msg:
                     break
                 
-                response = self.process_message(sock, msg)
-                if response:
-                    send_json(sock, response)
+                if msg.get("id") is not None and msg.get("type") in PIPELINED_MESSAGES:
+                    try:
+                        self.request_pool.submit(self.handle_pipelined, sock, msg)
+                    except PoolSaturated:
+                        send_json(sock, self.busy_response(msg))
+                else:
+                    self.handle_request(sock, msg)
+        except socket.timeout:
+            self.reap(sock)
         except Exception as e:
-            print(f"Error handling client: {e}")
+            log.warning("Error handling client", error=e)
         finally:
-            print("Client disconnected")
+            log.info("Client disconnected")
             self.handle_disconnect(sock)
             sock.close()
+            self.connections_closed.inc()
+
+    def handle_request(self, sock, msg):
+        response = self.process_message(sock, msg)
+        if response:
+            # Echo the correlation id so the client can match out-of-order replies
+            if msg.get("id") is not None:
+                response["id"] = msg["id"]
+            send_json(sock, response)
+
+    def handle_pipelined(self, sock, msg):
+        try:
+            self.handle_request(sock, msg)
+        except Exception as e:
+            log.error("Error handling pipelined request", type=msg.get("type"), error=e)
 
     def process_message(self, sock, msg):
-        msg_type = msg.get("type")
-        data = msg.get("data")
-        
-        print(f"Received message: {msg_type}")
+        request_log.debug("Received message", type=msg.get("type"))
+        self.messages_received.inc()
+        return self.handlers.dispatch(sock, msg, self.sessions.get(sock))
 
-        if msg_type == MSG_LOGIN:
-            return self.handle_login(sock, data)
-        elif msg_type == MSG_REGISTER:
-            return self.handle_register(data)
-        elif msg_type == MSG_LOGOUT:
-            self.handle_disconnect(sock)
-            return create_response(STATUS_OK, message="Logged out")
+    def metric_families(self):
+        """Counters and current gauges for the metrics endpoint, services included."""
+        connections_open = Gauge("gameserver_connections_open", "Client connections currently open")
+        connections_open.set(self.connections_accepted.value() - self.connections_closed.value())
+        sessions = Gauge("gameserver_sessions", "Logged-in sessions")
+        sessions.set(len(self.sessions))
         
-        # Check authentication for other messages
-        if sock not in self.clients:
-            return create_response(STATUS_ERROR, message="Not logged in")
+        pool_families = {
+            "workers": Gauge("gameserver_pool_workers", "Worker threads started", "pool"),
+            "active": Gauge("gameserver_pool_active", "Workers running a task", "pool"),
+            "queued": Gauge("gameserver_pool_queued", "Tasks waiting for a worker", "pool"),
+            "rejected": Counter("gameserver_pool_rejected_total", "Tasks refused because the pool was saturated", "pool"),
+            "completed": Counter("gameserver_pool_completed_total", "Tasks finished", "pool"),
+        }
+        for pool in (self.client_pool, self.request_pool):
+            for key, value in pool.stats().items():
+                pool_families[key].inc(value, pool.name)
         
-        user_info = self.clients[sock]
-        role = user_info["role"]
-
-        # Route to appropriate service
-        if role == ROLE_DEVELOPER:
-            return self.dev_service.handle_message(sock, msg_type, data, user_info)
-        elif role == ROLE_PLAYER:
-            # Player can access both Lobby and Store services
-            if msg_type in [MSG_LIST_GAMES, MSG_GAME_DETAILS, MSG_DOWNLOAD_GAME, MSG_SUBMIT_REVIEW, MSG_LIST_REVIEWS, MSG_LIST_PLUGINS, MSG_DOWNLOAD_PLUGIN]:
-                return self.store_service.handle_message(sock, msg_type, data, user_info)
-            elif msg_type in [MSG_CREATE_ROOM, MSG_JOIN_ROOM, MSG_LIST_ROOMS, MSG_START_GAME, MSG_PLUGIN_MESSAGE, MSG_LEAVE_ROOM, MSG_CHAT]:
-                return self.lobby_service.handle_message(sock, msg_type, data, user_info)
-            else:
-                return create_response(STATUS_ERROR, message="Unknown message type for player")
+        outbound = self.sessions.outbound_stats()
+        outbound_queued = Gauge("gameserver_outbound_queued", "Pushes waiting in session queues")
+        outbound_queued.set(outbound["queued"])
+        outbound_events = Counter("gameserver_outbound_events_total", "Pushes dropped or coalesced and slow clients disconnected", "event")
+        for event in ("dropped", "coalesced", "disconnected"):
+            outbound_events.inc(outbound[event], event)
         
-        return create_response(STATUS_ERROR, message="Unknown role")
+        return ([self.connections_accepted, self.connections_closed, self.connections_rejected, self.connections_reaped, connections_open,
+                 sessions, self.messages_received, outbound_queued, outbound_events] + list(pool_families.values())
+                + self.lobby_service.metric_families() + self.store_service.metric_families()
+                + self.dev_service.metric_families())
 
-    def handle_login(self, sock, data):
+    def handle_login(self, sock, data, user_info):
         username = data.get("username")
         password = data.get("password")
         role = data.get("role")
         
         if self.db.login_user(username, password, role):
-            # Check if already logged in with the SAME role
-            # We allow the same user to be logged in as DEVELOPER and PLAYER simultaneously
-            for client_info in self.clients.values():
-                if client_info["username"] == username and client_info["role"] == role:
-                    return create_response(STATUS_ERROR, message=f"User already logged in as {role}")
-
-            self.clients[sock] = {"username": username, "role": role}
-            return create_response(STATUS_OK, message="Login successful")
+            # Sessions are limited per role; the same user may be a DEVELOPER and a PLAYER at once
+            if not self.sessions.add(sock, username, role):
+                return create_response(STATUS_ERROR, message=f"User already logged in as {role}")
+            
+            # Switch the connection to the best wire settings both sides support
+            options = socket_state(sock)
+            encoding = negotiate_encoding(data.get("encodings"), self.encodings)
+            options.encoding = encoding
+            compression = None
+            if self.compress_threshold and COMPRESSION_ZLIB in (data.get("compression") or []):
+                compression = COMPRESSION_ZLIB
+                options.compress_threshold = self.compress_threshold
+            return create_response(STATUS_OK, message="Login successful", data={"encoding": encoding, "compression": compression})
         else:
             return create_response(STATUS_ERROR, message="Invalid credentials")
 
-    def handle_register(self, data):
+    def handle_register(self, sock, data, user_info):
         username = data.get("username")
         password = data.get("password")
         role = data.get("role")
@@ -162,21 +363,24 @@ class GameServer:
         else:
             return create_response(STATUS_ERROR, message="Username already exists")
 
+    def handle_ping(self, sock, data, user_info):
+        # Receiving it already reset the idle timer; heartbeats ask for no reply
+        if data and data.get("reply") is False:
+            return None
+        return create_response(STATUS_OK, message="pong")
+
+    def handle_logout(self, sock, data, user_info):
+        self.handle_disconnect(sock)
+        return create_response(STATUS_OK, message="Logged out")
+
     def handle_disconnect(self, sock):
-        if sock in self.clients:
-            user_info = self.clients[sock]
-            if user_info["role"] == ROLE_PLAYER:
-                self.lobby_service.handle_player_disconnect(user_info["username"])
-            del self.clients[sock]
-
-    def broadcast(self, usernames, message):
-        # Send message to specific users
-        for sock, info in self.clients.items():
-            if info["username"] in usernames:
-                try:
-                    send_json(sock, message)
-                except:
-                    pass
+        user_info = self.sessions.remove(sock)
+        if self.stopping:
+            # Rooms stay as they are for the snapshot; players rejoin them after the restart
+            return
+        # A player leaves their room only when their last session is gone
+        if user_info and user_info["role"] == ROLE_PLAYER and not self.sessions.is_online(user_info["username"]):
+            self.lobby_service.handle_player_disconnect(user_info["username"])
 
 if __name__ == "__main__":
     import argparse
@@ -188,14 +392,94 @@ if __name__ == "__main__":
             python server/main.py                    # Run with defaults (0.0.0.0:8888)
             python server/main.py --port 9000        # Run on port 9000
             python server/main.py --host 127.0.0.1   # Run on localhost only
+            python server/main.py --engine asyncio   # Serve all clients from one event loop
         """)
     
     parser.add_argument('--host', type=str, default=HOST, 
                         help=f'Host address to bind to (default: {HOST})')
     parser.add_argument('--port', type=int, default=PORT, 
                         help=f'Port number to bind to (default: {PORT})')
+    parser.add_argument('--chunk-size', type=int, default=FILE_CHUNK_SIZE,
+                        help=f'Receive buffer size for uploads in bytes (default: {FILE_CHUNK_SIZE})')
+    parser.add_argument('--retain-versions', type=int, default=RETAIN_VERSIONS,
+                        help=f'Versions kept per game after an update (default: {RETAIN_VERSIONS})')
+    parser.add_argument('--encodings', nargs='+', choices=SUPPORTED_ENCODINGS, default=SUPPORTED_ENCODINGS,
+                        help='Wire encodings clients may negotiate at login (default: all)')
+    parser.add_argument('--compress-threshold', type=int, default=DEFAULT_COMPRESS_THRESHOLD,
+                        help=f'Compress frames of at least this many bytes, 0 disables (default: {DEFAULT_COMPRESS_THRESHOLD})')
+    parser.add_argument('--engine', choices=ENGINES, default=ENGINE_THREADS,
+                        help=f'Connection handling: a thread per client or one asyncio event loop (default: {ENGINE_THREADS})')
+    parser.add_argument('--workers', type=int, default=CLIENT_WORKERS,
+                        help=f'Clients served at once by the thread engine; more are told to retry (default: {CLIENT_WORKERS})')
+    parser.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH,
+                        help=f'Requests that may wait for a worker before new ones are refused (default: {QUEUE_DEPTH})')
+    parser.add_argument('--backlog', type=int, default=BACKLOG,
+                        help=f'Listen backlog for pending connections (default: {BACKLOG})')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help=f'Close connections silent for this many seconds, 0 never (default: {IDLE_TIMEOUT}; clients ping every {HEARTBEAT_INTERVAL})')
+    parser.add_argument('--keepalive-idle', type=int, default=KEEPALIVE_IDLE,
+                        help=f'Seconds of silence before TCP keepalive probes start, 0 disables keepalive (default: {KEEPALIVE_IDLE})')
+    parser.add_argument('--keepalive-interval', type=int, default=KEEPALIVE_INTERVAL,
+                        help=f'Seconds between TCP keepalive probes (default: {KEEPALIVE_INTERVAL})')
+    parser.add_argument('--keepalive-count', type=int, default=KEEPALIVE_COUNT,
+                        help=f'Unanswered probes before the connection is dropped (default: {KEEPALIVE_COUNT})')
+    parser.add_argument('--lobby-state', type=str, default=STATE_FILE,
+                        help=f'Rooms and running games are saved here and restored on start, empty disables (default: {STATE_FILE})')
+    parser.add_argument('--snapshot-interval', type=float, default=SNAPSHOT_INTERVAL,
+                        help=f'Seconds between lobby snapshots, 0 saves only at shutdown (default: {SNAPSHOT_INTERVAL})')
+    parser.add_argument('--restore-grace', type=float, default=RESTORE_GRACE,
+                        help=f'Seconds restored rooms wait for their players to log back in (default: {RESTORE_GRACE})')
+    parser.add_argument('--session-rate', type=float, default=SESSION_RATE,
+                        help=f'Chat and plugin messages per second one session may send, 0 unlimited (default: {SESSION_RATE})')
+    parser.add_argument('--session-burst', type=int, default=SESSION_BURST,
+                        help=f'Messages a session may send at once before --session-rate applies (default: {SESSION_BURST})')
+    parser.add_argument('--room-rate', type=float, default=ROOM_RATE,
+                        help=f'Chat and plugin messages per second relayed to one room, 0 unlimited (default: {ROOM_RATE})')
+    parser.add_argument('--room-burst', type=int, default=ROOM_BURST,
+                        help=f'Messages a room may relay at once before --room-rate applies (default: {ROOM_BURST})')
+    parser.add_argument('--room-batch-ms', type=float, default=0,
+                        help='Collect chat and plugin messages per room for this many ms and push them as one frame, e.g. 20-50 (default: 0, off)')
+    parser.add_argument('--db-backend', choices=list(DB_BACKENDS), default=DEFAULT_DB_BACKEND,
+                        help=f'Storage for users, games and reviews; journal and sqlite start from the JSON files the first time (default: {DEFAULT_DB_BACKEND})')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics over HTTP on this port (default: disabled)')
+    parser.add_argument('--admin-token', type=str, default=os.environ.get("GAMESERVER_ADMIN_TOKEN"),
+                        help='Secret required by ADMIN messages such as profiling (default: $GAMESERVER_ADMIN_TOKEN, unset disables them)')
+    parser.add_argument('--log-level', choices=list(logging.LEVELS), default="INFO",
+                        help='Lowest level written; DEBUG includes every received message (default: INFO)')
+    parser.add_argument('--log-sample', nargs='+', default=[], metavar='CATEGORY=RATE',
+                        help='Keep only this fraction of a category below WARNING, e.g. request=0.01 game=0.1')
+    parser.add_argument('--log-buffer', type=int, default=logging.MAX_BUFFERED,
+                        help=f'Log records buffered for the writer thread before new ones are dropped (default: {logging.MAX_BUFFERED})')
+    parser.add_argument('--log-format', choices=logging.FORMATS, default=logging.FORMAT_TEXT,
+                        help=f'Log line format (default: {logging.FORMAT_TEXT})')
+    parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS_PER_USER,
+                        help=f'Concurrent logins allowed per user and role (default: {MAX_SESSIONS_PER_USER})')
+    parser.add_argument('--outbound-queue', type=int, default=MAX_QUEUED,
+                        help=f'Pushes that may wait for a slow client before --slow-consumer applies (default: {MAX_QUEUED})')
+    parser.add_argument('--slow-consumer', choices=POLICIES, default=DEFAULT_POLICY,
+                        help=f'What to do when a client falls behind on pushes (default: {DEFAULT_POLICY})')
     
     args = parser.parse_args()
     
-    server = GameServer(host=args.host, port=args.port)
+    sample_rates = {}
+    for item in args.log_sample:
+        category, _, rate = item.partition("=")
+        try:
+            sample_rates[category] = float(rate)
+        except ValueError:
+            parser.error(f"--log-sample expects CATEGORY=RATE, got {item}")
+    logging.configure(level=args.log_level, sample_rates=sample_rates, max_buffered=args.log_buffer, fmt=args.log_format)
+    
+    server = GameServer(host=args.host, port=args.port, chunk_size=args.chunk_size, encodings=args.encodings,
+                        compress_threshold=args.compress_threshold, retain_versions=args.retain_versions,
+                        engine=args.engine, workers=args.workers, queue_depth=args.queue_depth, backlog=args.backlog,
+                        max_sessions=args.max_sessions, outbound_queue=args.outbound_queue, slow_consumer=args.slow_consumer,
+                        metrics_port=args.metrics_port, admin_token=args.admin_token, idle_timeout=args.idle_timeout,
+                        keepalive_idle=args.keepalive_idle, keepalive_interval=args.keepalive_interval,
+                        keepalive_count=args.keepalive_count, lobby_state=args.lobby_state,
+                        snapshot_interval=args.snapshot_interval, restore_grace=args.restore_grace,
+                        session_rate=args.session_rate, session_burst=args.session_burst,
+                        room_rate=args.room_rate, room_burst=args.room_burst, room_batch_ms=args.room_batch_ms,
+                        db_backend=args.db_backend)
     server.start()
@@ -0,0 +1,111 @@
+import gc
+import os
+import threading
+import tracemalloc
+
+DEFAULT_FRAMES = 10
+TOP_SITES = 20
+TOP_TYPES = 25
+
+# Allocations made by tracemalloc itself and the import system are noise here
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def _site(stat, group_by):
+    """Allocation site of a statistic; grouped by traceback it is the whole stack, innermost first."""
+    frames = list(reversed(stat.traceback)) if group_by == "traceback" else [stat.traceback[0]]
+    return " <- ".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in frames)
+
+class MemoryInspector:
+    """tracemalloc snapshots of the live server, diffed against a baseline.
+
+    Tracing slows every allocation down, so it only runs between start() and
+    stop(); until then nothing is hooked. start() takes the baseline that
+    later snapshots are compared with.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.baseline = None
+
+    def start(self, frames=DEFAULT_FRAMES):
+        """Starts tracing (if it is not already) and takes a new baseline."""
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, frames))
+            self.baseline = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            return self.status()
+
+    def stop(self):
+        with self.lock:
+            self.baseline = None
+            status = self.status()
+            tracemalloc.stop()
+            return status
+
+    def status(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        }
+
+    def snapshot(self, limit=TOP_SITES, group_by="lineno"):
+        """Top allocation sites now and their growth since the baseline. None if not tracing."""
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                return None
+            snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            report = self.status()
+            report["top"] = [{"site": _site(stat, group_by), "size": stat.size, "count": stat.count}
+                             for stat in snapshot.statistics(group_by)[:limit]]
+            if self.baseline is not None:
+                diff = snapshot.compare_to(self.baseline, group_by)
+                report["growth"] = [{"site": _site(stat, group_by), "size_diff": stat.size_diff, "size": stat.size,
+                                     "count_diff": stat.count_diff}
+                                    for stat in diff[:limit] if stat.size_diff]
+            return report
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def object_counts(server):
+    """Sizes of the structures that grow with load, read without pausing the server."""
+    lobby = server.lobby_service
+    with lobby.lock:
+        rooms = list(lobby.rooms.values())
+    processes = [room["process"] for room in rooms if room.get("process")]
+    pools = {pool.name: pool.stats() for pool in (server.client_pool, server.request_pool)}
+    return {
+        "sessions": len(server.sessions),
+        "users_online": len(server.sessions.by_user),
+        "connections_open": server.connections_accepted.value() - server.connections_closed.value(),
+        "pending_clients": pools["client"]["queued"],
+        "pending_requests": pools["request"]["queued"],
+        "outbound_queued": server.sessions.outbound_stats()["queued"],
+        "rooms": len(rooms),
+        "game_processes": len(processes),
+        # Handles of games that have exited but are still held by their room
+        "exited_game_processes": sum(1 for proc in processes if proc.poll() is not None),
+        "rate_limit_buckets": len(lobby.session_limiter) + len(lobby.room_limiter),
+        **{f"db_{name}": count for name, count in server.db.counts().items()},
+    }
+
+def type_counts(limit=TOP_TYPES):
+    """Most common live object types; walks every tracked object, so only on request."""
+    counts = {}
+    for obj in gc.get_objects():
+        name = type(obj).__qualname__
+        counts[name] = counts.get(name, 0) + 1
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit])
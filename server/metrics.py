@@ -0,0 +1,141 @@
+import threading
+import time
+
+# Sub-buckets per power of two: values are kept to within ~3% (HdrHistogram style)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS >> 1
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds.
+
+    Small values get exact buckets; above that each power of two is split into
+    HALF_BUCKETS equal sub-buckets, so recording is O(1), memory stays a few
+    hundred ints whatever the range, and any percentile is accurate to ~3%.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = []
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return SUB_BUCKETS + (shift - 1) * HALF_BUCKETS + (value >> shift) - HALF_BUCKETS
+
+    @staticmethod
+    def _highest_value(index):
+        # Largest value that falls into bucket index
+        if index < SUB_BUCKETS:
+            return index
+        shift, offset = divmod(index - SUB_BUCKETS, HALF_BUCKETS)
+        shift += 1
+        return ((offset + HALF_BUCKETS + 1) << shift) - 1
+
+    def record(self, micros):
+        micros = max(0, int(micros))
+        index = self._index(micros)
+        with self.lock:
+            if index >= len(self.counts):
+                self.counts.extend([0] * (index + 1 - len(self.counts)))
+            self.counts[index] += 1
+            self.total += 1
+            self.sum += micros
+            if self.min is None or micros < self.min:
+                self.min = micros
+            if micros > self.max:
+                self.max = micros
+
+    def percentile(self, p):
+        """Value (in microseconds) at or below which p percent of recordings fall."""
+        with self.lock:
+            if not self.total:
+                return 0
+            target = max(1, -(-self.total * p // 100))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return min(self._highest_value(index), self.max)
+            return self.max
+
+    def mean(self):
+        with self.lock:
+            return self.sum / self.total if self.total else 0
+
+class HandlerMetrics:
+    """Always-on latency histogram and error count for every message type."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {} # msg_type -> LatencyHistogram
+        self.errors = {} # msg_type -> count
+
+    def observe(self, msg_type, started, error=False):
+        """Records one handled message; started is a time.perf_counter() value."""
+        micros = (time.perf_counter() - started) * 1e6
+        histogram = self.latency.get(msg_type)
+        if histogram is None:
+            with self.lock:
+                histogram = self.latency.setdefault(msg_type, LatencyHistogram())
+        histogram.record(micros)
+        if error:
+            with self.lock:
+                self.errors[msg_type] = self.errors.get(msg_type, 0) + 1
+
+    def items(self):
+        """(msg_type, LatencyHistogram, error count) for every type seen so far."""
+        with self.lock:
+            return [(msg_type, histogram, self.errors.get(msg_type, 0)) for msg_type, histogram in self.latency.items()]
+
+    def rows(self):
+        """Count, errors and latency percentiles (ms) per message type, slowest p99 first."""
+        rows = [{
+            "type": msg_type,
+            "count": histogram.total,
+            "errors": errors,
+            "p50_ms": round(histogram.percentile(50) / 1000, 2),
+            "p90_ms": round(histogram.percentile(90) / 1000, 2),
+            "p99_ms": round(histogram.percentile(99) / 1000, 2),
+            "max_ms": round(histogram.max / 1000, 2),
+        } for msg_type, histogram, errors in self.items()]
+        rows.sort(key=lambda row: row["p99_ms"], reverse=True)
+        return rows
+
+class Counter:
+    """Monotonic count for the metrics endpoint, optionally split by one label.
+
+    inc() is a dict update under a lock, cheap enough for every request.
+    """
+    kind = "counter"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.lock = threading.Lock()
+        self.values = {} if label else {None: 0} # label value -> count
+
+    def inc(self, amount=1, label_value=None):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def value(self, label_value=None):
+        with self.lock:
+            return self.values.get(label_value, 0)
+
+    def samples(self):
+        with self.lock:
+            return list(self.values.items())
+
+class Gauge(Counter):
+    """Current value for the metrics endpoint, usually filled in at scrape time."""
+    kind = "gauge"
+
+    def set(self, value, label_value=None):
+        with self.lock:
+            self.values[label_value] = value
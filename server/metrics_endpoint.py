@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from server import log as logging
+
+log = logging.get_logger("metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_QUANTILES = [0.5, 0.9, 0.99]
+
+def _label(name, value):
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{name}="{escaped}"'
+
+def render_families(families):
+    """Prometheus text lines for Counter and Gauge objects."""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for label_value, value in family.samples():
+            labels = "{" + _label(family.label, label_value) + "}" if family.label else ""
+            lines.append(f"{family.name}{labels} {value}")
+    return lines
+
+def render_latency(handler_metrics):
+    """The always-on handler histograms as a Prometheus summary plus an error counter."""
+    name = "gameserver_handler_latency_seconds"
+    lines = [f"# HELP {name} Time spent in the message handler, by message type",
+             f"# TYPE {name} summary"]
+    items = handler_metrics.items()
+    for msg_type, histogram, errors in items:
+        label = _label("type", msg_type)
+        for quantile in LATENCY_QUANTILES:
+            lines.append(f'{name}{{{label},quantile="{quantile}"}} {histogram.percentile(quantile * 100) / 1e6}')
+        lines.append(f"{name}_sum{{{label}}} {histogram.sum / 1e6}")
+        lines.append(f"{name}_count{{{label}}} {histogram.total}")
+    lines.append("# HELP gameserver_handler_errors_total Handled messages answered with an error or that raised")
+    lines.append("# TYPE gameserver_handler_errors_total counter")
+    for msg_type, histogram, errors in items:
+        lines.append(f"gameserver_handler_errors_total{{{_label('type', msg_type)}}} {errors}")
+    return lines
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        try:
+            body = self.server.endpoint.render().encode()
+        except Exception as e:
+            log.error("Failed to collect metrics", error=e)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are too frequent to log
+        pass
+
+class MetricsEndpoint:
+    """Serves a GameServer's counters in the Prometheus text format on its own port.
+
+    Nothing is computed on the request path beyond counter increments; room,
+    session and pool gauges are read when the endpoint is scraped.
+    """
+    def __init__(self, server, host, port):
+        self.server = server
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        """Starts listening on a background thread. Returns False if the port cannot be bound."""
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), _ScrapeHandler)
+        except OSError as e:
+            log.error("Metrics endpoint disabled, could not bind", port=self.port, error=e)
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.endpoint = self
+        threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True).start()
+        log.info("Metrics endpoint started", address=f"{self.host}:{self.port}", path="/metrics")
+        return True
+
+    def render(self):
+        lines = render_families(self.server.metric_families())
+        lines += render_latency(self.server.handlers.metrics)
+        return "\n".join(lines) + "\n"
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
@@ -0,0 +1,103 @@
+import threading
+from collections import deque
+from shared.protocol import MSG_ROOM_UPDATE
+
+# What to do when a client reads slower than the lobby pushes to it
+POLICY_DROP_OLDEST = "drop_oldest" # discard the oldest queued push
+POLICY_COALESCE = "coalesce" # a newer ROOM_UPDATE replaces a queued one for the same room, then drop oldest
+POLICY_DISCONNECT = "disconnect" # close the connection
+POLICIES = [POLICY_DROP_OLDEST, POLICY_COALESCE, POLICY_DISCONNECT]
+DEFAULT_POLICY = POLICY_COALESCE
+
+# Pushes a session may have waiting before the policy kicks in
+MAX_QUEUED = 256
+
+def coalesce_key(message):
+    """Pushes that only carry the latest state of something may replace an older queued copy."""
+    if message.get("type") == MSG_ROOM_UPDATE:
+        return (MSG_ROOM_UPDATE, message["data"].get("room_id"))
+    return None
+
+class OutboundQueue:
+    """Bounded queue of encoded frames waiting to be written to one client.
+
+    put() never blocks, so whoever pushes (usually a lobby handler holding the
+    lobby lock) is never held up by a client with a full TCP window.
+    """
+    def __init__(self, max_frames=MAX_QUEUED, policy=DEFAULT_POLICY):
+        self.max_frames = max(1, max_frames)
+        self.policy = policy
+        self.cond = threading.Condition()
+        self.frames = deque() # [key, buffers]
+        self.keyed = {} # coalesce key -> queued entry
+        self.closed = False
+        # Called after every put/close; lets an event loop writer know there is work
+        self.wakeup = None
+        self.high_water = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put(self, buffers, key=None):
+        """Queues a frame. Returns False if the queue overflowed under the
+        disconnect policy, meaning the client should be dropped."""
+        with self.cond:
+            if self.closed:
+                return True
+            entry = self.keyed.get(key) if key is not None and self.policy == POLICY_COALESCE else None
+            if entry is not None:
+                entry[1] = buffers
+                self.coalesced += 1
+            else:
+                if len(self.frames) >= self.max_frames:
+                    if self.policy == POLICY_DISCONNECT:
+                        self.dropped += len(self.frames)
+                        self.frames.clear()
+                        self.keyed.clear()
+                        self.closed = True
+                        self.cond.notify_all()
+                        return False
+                    self._pop()
+                    self.dropped += 1
+                entry = [key, buffers]
+                self.frames.append(entry)
+                if key is not None:
+                    self.keyed[key] = entry
+                self.high_water = max(self.high_water, len(self.frames))
+                self.cond.notify()
+        if self.wakeup:
+            self.wakeup()
+        return True
+
+    def get(self):
+        """Blocks until a frame is queued. Returns None once the queue is closed."""
+        with self.cond:
+            while not self.frames and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return None
+            return self._pop()
+
+    def pop_nowait(self):
+        with self.cond:
+            if self.closed or not self.frames:
+                return None
+            return self._pop()
+
+    def _pop(self):
+        # Caller holds self.cond
+        entry = self.frames.popleft()
+        if entry[0] is not None and self.keyed.get(entry[0]) is entry:
+            del self.keyed[entry[0]]
+        return entry[1]
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.wakeup:
+            self.wakeup()
+
+    def stats(self):
+        with self.cond:
+            return {"depth": len(self.frames), "high_water": self.high_water,
+                    "dropped": self.dropped, "coalesced": self.coalesced}
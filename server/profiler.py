@@ -0,0 +1,136 @@
+import os
+import re
+import sys
+import threading
+import time
+from server.handler_registry import HandlerRegistry
+
+# Time between samples; every thread's stack is captured at each one
+DEFAULT_INTERVAL = 0.005
+MAX_DURATION = 300
+TOP_FUNCTIONS = 30
+
+# The frame whose msg_type local tells which handler a thread is running
+DISPATCH_CODE = HandlerRegistry.dispatch.__code__
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class SamplingProfiler:
+    """Statistical profiler over every thread of the running server.
+
+    A background thread reads sys._current_frames() at a fixed interval and
+    counts each stack, so the server is never paused and nothing is hooked
+    into function calls. Nothing runs when the profiler is stopped. Samples
+    are wall-clock: a handler blocked on a lock or the disk shows up too.
+
+    By default only threads inside HandlerRegistry.dispatch are sampled and
+    their stacks are rooted at the message type being handled, which gives
+    per-handler hot spots; all_threads also counts idle and internal threads,
+    rooted at the thread name.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.report = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, duration=None, interval=DEFAULT_INTERVAL, all_threads=False):
+        """Starts sampling for duration seconds (or until stop). Returns False if already running."""
+        with self.lock:
+            if self.running:
+                return False
+            self.stop_event.clear()
+            self.report = None
+            duration = min(duration or MAX_DURATION, MAX_DURATION)
+            # The thread asking for the profile is waiting on it, not working
+            exclude = threading.get_ident()
+            self.thread = threading.Thread(target=self._run, args=(duration, max(0.001, interval), all_threads, exclude),
+                                           name="profiler", daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        """Stops sampling and returns the report (None if the profiler never ran)."""
+        thread = self.thread
+        if thread is not None:
+            self.stop_event.set()
+            thread.join()
+        return self.report
+
+    def profile(self, duration, interval=DEFAULT_INTERVAL, all_threads=False):
+        """Samples for duration seconds and returns the report, or None if a profile is already running."""
+        if not self.start(duration, interval, all_threads):
+            return None
+        self.thread.join()
+        return self.report
+
+    def _run(self, duration, interval, all_threads, exclude):
+        own = threading.get_ident()
+        stacks = {} # collapsed stack -> samples
+        samples = 0
+        sampling_time = 0.0
+        started = time.perf_counter()
+        deadline = started + duration
+        while not self.stop_event.wait(interval) and time.perf_counter() < deadline:
+            tick = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()} if all_threads else None
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident == exclude:
+                    continue
+                stack = self._collapse(frame, names.get(ident, "thread") if all_threads else None)
+                if stack:
+                    stacks[stack] = stacks.get(stack, 0) + 1
+            samples += 1
+            sampling_time += time.perf_counter() - tick
+        elapsed = time.perf_counter() - started
+        self.report = self._build_report(stacks, samples, elapsed, sampling_time, interval)
+
+    @staticmethod
+    def _collapse(frame, thread_name):
+        """Root-first 'root;file:function;...' for a thread, or None to skip it."""
+        labels = []
+        while frame is not None:
+            if frame.f_code is DISPATCH_CODE:
+                root = str(frame.f_locals.get("msg_type"))
+                break
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        else:
+            if thread_name is None:
+                return None
+            # Worker numbers would split one pool into many roots
+            root = re.sub(r"\d+", "N", thread_name)
+        labels.append(root)
+        labels.reverse()
+        return ";".join(labels)
+
+    @staticmethod
+    def _build_report(stacks, samples, elapsed, sampling_time, interval):
+        handlers = {}
+        own_samples = {} # function -> samples where it was running
+        total_samples = {} # function -> samples where it was on the stack
+        for stack, count in stacks.items():
+            root, *functions = stack.split(";")
+            handlers[root] = handlers.get(root, 0) + count
+            if functions:
+                own_samples[functions[-1]] = own_samples.get(functions[-1], 0) + count
+            for function in set(functions):
+                total_samples[function] = total_samples.get(function, 0) + count
+        functions = sorted(total_samples, key=lambda function: (own_samples.get(function, 0), total_samples[function]), reverse=True)
+        return {
+            "duration": round(elapsed, 3),
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            # Share of wall time the sampler itself spent walking stacks
+            "overhead": round(sampling_time / elapsed, 4) if elapsed else 0,
+            "handlers": dict(sorted(handlers.items(), key=lambda item: item[1], reverse=True)),
+            "functions": [{"function": function, "self": own_samples.get(function, 0), "total": total_samples[function]}
+                          for function in functions[:TOP_FUNCTIONS]],
+            # Brendan Gregg's folded format, ready for flamegraph.pl or speedscope
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in sorted(stacks.items())),
+        }
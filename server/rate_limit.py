@@ -0,0 +1,63 @@
+import threading
+import time
+
+# Chat and plugin messages: sustained per second and the burst allowed on top
+SESSION_RATE = 5
+SESSION_BURST = 10
+ROOM_RATE = 20
+ROOM_BURST = 40
+# Checks between sweeps of buckets that have refilled and are no different from new ones
+SWEEP_EVERY = 1024
+
+class RateLimiter:
+    """Token buckets, one per key (a session's socket, a room id).
+
+    Each bucket holds up to burst tokens and refills at rate per second; a
+    message takes one token. Buckets are created on first use and dropped
+    once they have refilled, so keys never need to be removed explicitly.
+    A rate of 0 disables the limit.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.buckets = {} # key -> [tokens, last refill]
+        self.lock = threading.Lock()
+        self.checks = 0
+
+    def acquire(self, key):
+        """Takes a token for key. Returns 0 if allowed, else the seconds until one is available."""
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            self.checks += 1
+            if self.checks % SWEEP_EVERY == 0:
+                self._sweep(now)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+    def refund(self, key):
+        """Gives back the token acquire() took for key, when the message was refused further on."""
+        if not self.rate:
+            return
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + 1)
+
+    def _sweep(self, now):
+        full_after = self.burst / self.rate
+        for key, (tokens, updated) in list(self.buckets.items()):
+            if now - updated >= full_after:
+                del self.buckets[key]
+
+    def __len__(self):
+        return len(self.buckets)
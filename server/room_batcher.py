@@ -0,0 +1,64 @@
+import threading
+from shared.protocol import MSG_BATCH, create_message
+from server.metrics import Counter
+
+class RoomBatcher:
+    """Collects chat and plugin pushes per room and sends them once per tick.
+
+    Every tick, the messages a room collected go out as one MSG_BATCH frame
+    per recipient instead of one frame per message, so a busy room costs
+    each player one write per tick. A tick with a single message sends it
+    as is. Messages wait at most one tick.
+    """
+    def __init__(self, sessions, tick):
+        self.sessions = sessions
+        self.tick = tick
+        self.lock = threading.Lock()
+        self.pending = {} # room_id -> [(players, message), ...]
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.batches = Counter("gameserver_room_batches_total", "Batches of room messages flushed, one per group of recipients")
+        self.batched_messages = Counter("gameserver_room_batched_messages_total", "Chat and plugin messages sent inside batches")
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="room-batcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+
+    def add(self, room_id, players, message):
+        """Queues message for players (copied now, so later joins and leaves do not change who gets it)."""
+        with self.lock:
+            self.pending.setdefault(room_id, []).append((tuple(players), message))
+
+    def _run(self):
+        while not self.stop_event.wait(self.tick):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for room_id, items in pending.items():
+            if len(items) == 1:
+                players, message = items[0]
+                self.sessions.push(players, message)
+                continue
+            inbox = {} # username -> messages addressed to them, in order
+            for players, message in items:
+                for username in players:
+                    inbox.setdefault(username, []).append(message)
+            # Usually nobody joined or left during the tick and everyone shares one batch, encoded once
+            groups = {}
+            for username, messages in inbox.items():
+                groups.setdefault(tuple(map(id, messages)), (messages, []))[1].append(username)
+            for messages, usernames in groups.values():
+                self.sessions.push(usernames, create_message(MSG_BATCH, {"room_id": room_id, "messages": messages}))
+                self.batches.inc()
+                self.batched_messages.inc(len(messages))
+
+    def metric_families(self):
+        return [self.batches, self.batched_messages]
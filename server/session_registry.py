@@ -0,0 +1,146 @@
+import socket
+import threading
+from shared.protocol import ROLE_PLAYER
+from shared.utils import encode_shared_frame, send_buffers, socket_state, socket_lock
+from server.outbound import OutboundQueue, coalesce_key, MAX_QUEUED, DEFAULT_POLICY
+from server import log as logging
+
+log = logging.get_logger("sessions")
+
+MAX_SESSIONS_PER_USER = 1
+
+class SessionRegistry:
+    """Logged-in connections, indexed both by socket and by (username, role).
+
+    Finding a user's sockets is a dict lookup rather than a scan over every
+    connected client, so pushes to a room cost O(recipients). A user may hold
+    up to max_sessions_per_user connections per role.
+
+    Pushes are not written by the caller: each session has a bounded
+    OutboundQueue drained by its own writer, and slow readers are handled by
+    the queue's policy.
+    """
+    def __init__(self, max_sessions_per_user=MAX_SESSIONS_PER_USER, max_queued=MAX_QUEUED, policy=DEFAULT_POLICY):
+        self.max_sessions_per_user = max(1, max_sessions_per_user)
+        self.max_queued = max_queued
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.by_sock = {} # socket -> user_info
+        self.by_user = {} # (username, role) -> [socket, ...]
+        self.outbound = {} # socket -> OutboundQueue
+        # Counters of sessions that have already gone
+        self.retired = {"dropped": 0, "coalesced": 0, "disconnected": 0}
+        # Starts the writer that drains a session's queue; the asyncio engine uses its event loop instead
+        self.start_writer = self._start_writer_thread
+
+    def add(self, sock, username, role):
+        """Registers a login. Returns its user_info, or None if the socket is already
+        logged in or the user has no free session."""
+        with self.lock:
+            socks = self.by_user.get((username, role), [])
+            if sock in self.by_sock or len(socks) >= self.max_sessions_per_user:
+                return None
+            self.by_user[(username, role)] = socks
+            user_info = {"username": username, "role": role}
+            socks.append(sock)
+            self.by_sock[sock] = user_info
+            queue = self.outbound[sock] = OutboundQueue(self.max_queued, self.policy)
+        self.start_writer(sock, queue)
+        return user_info
+
+    def remove(self, sock):
+        """Forgets a connection and returns its user_info (None if it was not logged in)."""
+        with self.lock:
+            return self._remove(sock)
+
+    def _remove(self, sock):
+        # Caller holds self.lock
+        user_info = self.by_sock.pop(sock, None)
+        if user_info:
+            key = (user_info["username"], user_info["role"])
+            socks = self.by_user[key]
+            socks.remove(sock)
+            if not socks:
+                del self.by_user[key]
+            queue = self.outbound.pop(sock)
+            queue.close()
+            stats = queue.stats()
+            self.retired["dropped"] += stats["dropped"]
+            self.retired["coalesced"] += stats["coalesced"]
+        return user_info
+
+    def get(self, sock):
+        return self.by_sock.get(sock)
+
+    def sockets(self, username, role=ROLE_PLAYER):
+        with self.lock:
+            return list(self.by_user.get((username, role), ()))
+
+    def is_online(self, username, role=ROLE_PLAYER):
+        return (username, role) in self.by_user
+
+    def push(self, usernames, message, role=ROLE_PLAYER):
+        """Queues a message for every session of the given users. Never blocks on the network."""
+        with self.lock:
+            targets = [(sock, self.outbound[sock]) for username in usernames
+                       for sock in self.by_user.get((username, role), ())]
+        key = coalesce_key(message)
+        # Serialized once per distinct encoding/compression, not once per recipient
+        frames = {}
+        for sock, queue in targets:
+            if not queue.put(encode_shared_frame(message, socket_state(sock), frames), key):
+                self._disconnect_slow(sock)
+
+    def _disconnect_slow(self, sock):
+        user_info = self.get(sock)
+        log.warning("Disconnecting slow client", username=user_info["username"] if user_info else None)
+        with self.lock:
+            self.retired["disconnected"] += 1
+        try:
+            # The connection's reader sees EOF and runs the normal disconnect path
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _start_writer_thread(self, sock, queue):
+        threading.Thread(target=self._write_loop, args=(sock, queue), daemon=True).start()
+
+    def _write_loop(self, sock, queue):
+        while True:
+            buffers = queue.get()
+            if buffers is None:
+                return
+            try:
+                with socket_lock(sock):
+                    send_buffers(sock, buffers)
+            except socket.timeout:
+                # The client stopped reading; the frame may be half written, so nothing more can go out on it
+                queue.close()
+                self._disconnect_slow(sock)
+                return
+            except OSError:
+                queue.close()
+                try:
+                    # Same for a failed write: the reader takes the normal disconnect path
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return
+
+    def outbound_stats(self):
+        """Queued pushes right now plus drops, coalesced updates and slow-client disconnects so far."""
+        with self.lock:
+            queues = list(self.outbound.values())
+            totals = dict(self.retired)
+        totals["queued"] = 0
+        totals["high_water"] = 0
+        for queue in queues:
+            stats = queue.stats()
+            totals["queued"] += stats["depth"]
+            totals["high_water"] = max(totals["high_water"], stats["high_water"])
+            totals["dropped"] += stats["dropped"]
+            totals["coalesced"] += stats["coalesced"]
+        return totals
+
+    def __len__(self):
+        return len(self.by_sock)
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+from server.database import Database
+from server import log as logging
+
+log = logging.get_logger("database")
+
+DB_FILE = "gameserver.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    role TEXT NOT NULL,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    PRIMARY KEY (role, username)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    game_id TEXT NOT NULL,
+    username TEXT NOT NULL,
+    rating INTEGER,
+    comment TEXT
+);
+CREATE INDEX IF NOT EXISTS reviews_by_game ON reviews (game_id, id);
+"""
+
+class SqliteDatabase:
+    """Database backed by SQLite instead of JSON files, with the same methods.
+
+    A registration or review is one indexed INSERT rather than a rewrite of
+    the whole collection, so write cost no longer grows with the data. The
+    file is in WAL mode, so a backup or the sqlite3 shell can read it while
+    the server writes. Game metadata is a JSON document per row and is also
+    kept in memory: there are few games and every LIST_GAMES reads them all.
+
+    On first use an empty database imports the JSON files found in
+    storage_dir; the files themselves are left untouched.
+    """
+    def __init__(self, storage_dir="server/storage", path=None):
+        self.storage_dir = storage_dir
+        self.path = path or os.path.join(storage_dir, DB_FILE)
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # One connection shared under self.lock; parameterised statements are prepared once and cached by sqlite3
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Durable at every checkpoint; a power cut may lose only the last few commits, never corrupt the file
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate_from_json()
+        self.games = {game_id: json.loads(data) for game_id, data in self.conn.execute("SELECT game_id, data FROM games")}
+
+    def _migrate_from_json(self):
+        if any(self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for table in ("users", "games", "reviews")):
+            return
+        legacy = Database(self.storage_dir)
+        if not (legacy.users or legacy.games or legacy.reviews):
+            return
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT OR IGNORE INTO users (role, username, password) VALUES (?, ?, ?)",
+                                  ((user["role"], user["username"], user["password"]) for user in legacy.users.values()))
+            self.conn.executemany("INSERT INTO games (game_id, data) VALUES (?, ?)",
+                                  ((game_id, json.dumps(game)) for game_id, game in legacy.games.items()))
+            self.conn.executemany("INSERT INTO reviews (game_id, username, rating, comment) VALUES (?, ?, ?, ?)",
+                                  ((game_id, review["username"], review["rating"], review["comment"])
+                                   for game_id, reviews in legacy.reviews.items() for review in reviews))
+        log.info("Imported JSON storage into SQLite", path=self.path, users=len(legacy.users),
+                 games=len(legacy.games), reviews=sum(len(reviews) for reviews in legacy.reviews.values()))
+
+    def register_user(self, username, password, role):
+        with self.lock:
+            cursor = self.conn.execute("INSERT OR IGNORE INTO users (role, username, password) VALUES (?, ?, ?)",
+                                       (role, username, password))
+            return cursor.rowcount == 1
+
+    def login_user(self, username, password, role):
+        with self.lock:
+            row = self.conn.execute("SELECT password FROM users WHERE role = ? AND username = ?",
+                                    (role, username)).fetchone()
+            return row is not None and row[0] == password
+
+    def add_game(self, game_id, metadata):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO games (game_id, data) VALUES (?, ?)", (game_id, json.dumps(metadata)))
+            self.games[game_id] = metadata
+
+    def update_game(self, game_id, metadata):
+        with self.lock:
+            if game_id in self.games:
+                # A new dict rather than an in-place update, so readers holding the old one see a consistent game
+                game = {**self.games[game_id], **metadata}
+                self.conn.execute("UPDATE games SET data = ? WHERE game_id = ?", (json.dumps(game), game_id))
+                self.games[game_id] = game
+                return True
+            return False
+
+    def remove_game(self, game_id):
+        with self.lock:
+            if game_id in self.games:
+                self.conn.execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+                del self.games[game_id]
+                return True
+            return False
+
+    def get_all_games(self):
+        with self.lock:
+            return dict(self.games)
+
+    def get_game(self, game_id):
+        with self.lock:
+            return self.games.get(game_id)
+
+    def add_review(self, game_id, username, rating, comment):
+        with self.lock:
+            self.conn.execute("INSERT INTO reviews (game_id, username, rating, comment) VALUES (?, ?, ?, ?)",
+                              (game_id, username, rating, comment))
+
+    def get_reviews(self, game_id):
+        with self.lock:
+            rows = self.conn.execute("SELECT username, rating, comment FROM reviews WHERE game_id = ? ORDER BY id",
+                                     (game_id,)).fetchall()
+        return [{"username": username, "rating": rating, "comment": comment} for username, rating, comment in rows]
+
+    def counts(self):
+        with self.lock:
+            users = self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            reviews = self.conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+            return {"users": users, "games": len(self.games), "reviews": reviews}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
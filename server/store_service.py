@@ -1,34 +1,33 @@
 import os
 from shared.protocol import *
-from shared.utils import send_file, send_json
+from shared.utils import send_file, send_json, socket_lock, verify_resume_point
+from server.metrics import Counter
 
 class StoreService:
-    def __init__(self, db):
+    def __init__(self, db, blob_store):
         self.db = db
-        self.storage_dir = os.path.join("server", "storage", "games")
+        self.blob_store = blob_store
+        self.downloads = Counter("gameserver_downloads_total", "Archives sent to players", "kind")
+        self.download_bytes = Counter("gameserver_download_bytes_total", "Archive bytes sent to players", "kind")
 
-    def handle_message(self, sock, msg_type, data, user_info):
-        if msg_type == MSG_LIST_GAMES:
-            return self.handle_list_games()
-        elif msg_type == MSG_GAME_DETAILS:
-            return self.handle_game_details(data)
-        elif msg_type == MSG_DOWNLOAD_GAME:
-            return self.handle_download_game(sock, data)
-        elif msg_type == MSG_SUBMIT_REVIEW:
-            return self.handle_submit_review(data, user_info)
-        elif msg_type == MSG_LIST_REVIEWS:
-            return self.handle_list_reviews(data)
-        elif msg_type == MSG_LIST_PLUGINS:
-            return self.handle_list_plugins()
-        elif msg_type == MSG_DOWNLOAD_PLUGIN:
-            return self.handle_download_plugin(sock, data)
-        return create_response(STATUS_ERROR, message="Unknown store command")
+    def register_handlers(self, handlers):
+        players = [ROLE_PLAYER]
+        handlers.add(MSG_LIST_GAMES, self.handle_list_games, players)
+        handlers.add(MSG_GAME_DETAILS, self.handle_game_details, players)
+        handlers.add(MSG_DOWNLOAD_GAME, self.handle_download_game, players)
+        handlers.add(MSG_SUBMIT_REVIEW, self.handle_submit_review, players)
+        handlers.add(MSG_LIST_REVIEWS, self.handle_list_reviews, players)
+        handlers.add(MSG_LIST_PLUGINS, self.handle_list_plugins, players)
+        handlers.add(MSG_DOWNLOAD_PLUGIN, self.handle_download_plugin, players)
 
-    def handle_list_games(self):
+    def metric_families(self):
+        return [self.downloads, self.download_bytes]
+
+    def handle_list_games(self, sock, data, user_info):
         games = list(self.db.get_all_games().values())
         return create_response(STATUS_OK, data={"games": games})
 
-    def handle_game_details(self, data):
+    def handle_game_details(self, sock, data, user_info):
         game_id = data.get("game_id")
         game = self.db.get_game(game_id)
         if game:
@@ -44,7 +43,7 @@ class StoreService:
             return create_response(STATUS_OK, data={"game": details})
         return create_response(STATUS_ERROR, message="Game not found")
 
-    def handle_download_game(self, sock, data):
+    def handle_download_game(self, sock, data, user_info):
         game_id = data.get("game_id")
         version = data.get("version") # Optional, defaults to latest
         
@@ -55,20 +54,29 @@ class StoreService:
         if not version:
             version = game["latest_version"]
             
-        file_path = os.path.join(self.storage_dir, game_id, f"{version}.zip")
-        if not os.path.exists(file_path):
+        file_path = self.blob_store.archive_path(game, version)
+        if not file_path:
             return create_response(STATUS_ERROR, message="Version file not found")
             
-        # Tell client we are ready to send
-        send_json(sock, create_response(STATUS_OK, message="Starting download", data={"file_size": os.path.getsize(file_path)}))
-        
-        send_file(sock, file_path)
+        # Resume where the client's partial download stopped if its last chunk matches ours
+        offset = verify_resume_point(file_path, data.get("offset", 0), data.get("chunk_sha256"))
+            
+        # Tell client we are ready to send; hold the socket so no push lands between header and file
+        with socket_lock(sock):
+            send_json(sock, create_response(STATUS_OK, message="Starting download", data={
+                "file_size": os.path.getsize(file_path),
+                "offset": offset,
+                "sha256": game["archives"][version]
+            }))
+            send_file(sock, file_path, offset)
+        self.downloads.inc(1, "game")
+        self.download_bytes.inc(os.path.getsize(file_path) - offset, "game")
         
         # After sending file, we don't return a response here because the client expects the file stream
         # The client should read the file and then continue
         return None 
 
-    def handle_submit_review(self, data, user_info):
+    def handle_submit_review(self, sock, data, user_info):
         game_id = data.get("game_id")
         rating = data.get("rating")
         comment = data.get("comment")
@@ -79,12 +87,12 @@ class StoreService:
         self.db.add_review(game_id, user_info["username"], rating, comment)
         return create_response(STATUS_OK, message="Review submitted")
 
-    def handle_list_reviews(self, data):
+    def handle_list_reviews(self, sock, data, user_info):
         game_id = data.get("game_id")
         reviews = self.db.get_reviews(game_id)
         return create_response(STATUS_OK, data={"reviews": reviews})
 
-    def handle_list_plugins(self):
+    def handle_list_plugins(self, sock, data, user_info):
         # List directories in server/storage/plugins
         plugins_dir = os.path.join("server", "storage", "plugins")
         if not os.path.exists(plugins_dir):
@@ -96,7 +104,7 @@ class StoreService:
                 plugins.append({"name": name, "description": "A plugin"})
         return create_response(STATUS_OK, data={"plugins": plugins})
 
-    def handle_download_plugin(self, sock, data):
+    def handle_download_plugin(self, sock, data, user_info):
         plugin_name = data.get("plugin_name")
         plugin_path = os.path.join("server", "storage", "plugins", plugin_name)
         
@@ -112,8 +120,11 @@ class StoreService:
             zip_path = os.path.join(temp_dir, f"{plugin_name}.zip")
             shutil.make_archive(os.path.join(temp_dir, plugin_name), 'zip', plugin_path)
             
-            send_json(sock, create_response(STATUS_OK, message="Starting download", data={"file_size": os.path.getsize(zip_path)}))
-            send_file(sock, zip_path)
+            with socket_lock(sock):
+                send_json(sock, create_response(STATUS_OK, message="Starting download", data={"file_size": os.path.getsize(zip_path)}))
+                send_file(sock, zip_path)
+            self.downloads.inc(1, "plugin")
+            self.download_bytes.inc(os.path.getsize(zip_path), "plugin")
         finally:
             shutil.rmtree(temp_dir)
         
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+
+class PoolSaturated(Exception):
+    """Raised by WorkerPool.submit when every worker is busy and the queue is full."""
+
+class WorkerPool(Executor):
+    """Fixed number of worker threads with a bounded queue in front of them.
+
+    Work beyond max_workers waits in the queue; once max_queue items are waiting
+    further submissions are refused immediately, so the caller can tell the
+    client to come back later instead of piling up threads and memory.
+    """
+    def __init__(self, max_workers, max_queue, name="worker"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.name = name
+        self.cond = threading.Condition()
+        self.queue = deque() # (future, fn, args, kwargs)
+        self.threads = []
+        self.idle = 0 # workers waiting for work, including ones still starting
+        self.active = 0 # workers running work
+        self.rejected = 0
+        self.completed = 0
+        self.shutting_down = False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self.cond:
+            if self.shutting_down:
+                raise RuntimeError("cannot schedule new work after shutdown")
+            # Items that no idle worker is about to pick up
+            waiting = len(self.queue) - self.idle
+            if len(self.threads) >= self.max_workers and waiting >= self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool saturated")
+            self.queue.append((future, fn, args, kwargs))
+            if waiting >= 0 and len(self.threads) < self.max_workers:
+                self.idle += 1
+                thread = threading.Thread(target=self._worker, name=f"{self.name}-{len(self.threads)}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+            self.cond.notify()
+        return future
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.shutting_down:
+                    self.cond.wait()
+                self.idle -= 1
+                if not self.queue:
+                    return
+                future, fn, args, kwargs = self.queue.popleft()
+                self.active += 1
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            with self.cond:
+                self.active -= 1
+                self.idle += 1
+                self.completed += 1
+
+    def stats(self):
+        """Snapshot of the pool's load: active, queued, rejected and completed work."""
+        with self.cond:
+            return {
+                "workers": len(self.threads),
+                "active": self.active,
+                "queued": max(0, len(self.queue) - self.idle),
+                "rejected": self.rejected,
+                "completed": self.completed,
+            }
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.cond:
+            self.shutting_down = True
+            if cancel_futures:
+                while self.queue:
+                    self.queue.popleft()[0].cancel()
+            self.cond.notify_all()
+        if wait:
+            for thread in list(self.threads):
+                thread.join()
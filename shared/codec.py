@@ -0,0 +1,205 @@
+import struct
+from shared.protocol import MSG_ROOM_UPDATE, MSG_CHAT, MSG_PLUGIN_MESSAGE, MSG_BATCH
+
+# Compact binary encoding for the hot lobby pushes, used once both sides agree
+# on it at login. A schema code replaces the "type"/"data" envelope and field
+# names, and the field values use the MessagePack wire format (nil, bool, int,
+# float, str, array, map). Every other frame stays JSON. The messages inside a
+# batch are packed with their own schemas: an array whose items are a schema
+# code followed by that schema's fields, or a plain map for other messages.
+
+SCHEMAS = {
+    1: (MSG_ROOM_UPDATE, ("room_id", "players", "host", "status", "joined")),
+    2: (MSG_CHAT, ("room_id", "sender", "message")),
+    3: (MSG_PLUGIN_MESSAGE, ("room_id", "plugin_id", "sender", "payload")),
+    4: (MSG_BATCH, ("room_id", "messages")),
+}
+SCHEMA_BY_TYPE = {msg_type: (code, fields) for code, (msg_type, fields) in SCHEMAS.items()}
+
+# Marks an optional schema field that was not present in the message
+ABSENT = b'\xc1'
+
+_pack_u8 = struct.Struct('>B').pack
+_pack_u16 = struct.Struct('>H').pack
+_pack_u32 = struct.Struct('>I').pack
+_pack_i64 = struct.Struct('>q').pack
+_pack_f64 = struct.Struct('>d').pack
+
+def encode(msg):
+    """Encodes a hot lobby push to bytes. Raises ValueError if it cannot be packed."""
+    if not has_schema(msg):
+        raise ValueError("No compact schema for message")
+    code, fields = SCHEMA_BY_TYPE[msg["type"]]
+    out = [_pack_u8(code)]
+    _pack_fields(msg["data"], fields, out)
+    return b''.join(out)
+
+def _pack_fields(data, fields, out):
+    for field in fields:
+        if field not in data:
+            out.append(ABSENT)
+        elif field == "messages":
+            _pack_batch(data[field], out)
+        else:
+            _pack(data[field], out)
+
+def _pack_batch(messages, out):
+    _pack_array_header(len(messages), out)
+    for message in messages:
+        if has_schema(message) and message["type"] != MSG_BATCH:
+            code, fields = SCHEMA_BY_TYPE[message["type"]]
+            out.append(_pack_u8(code))
+            _pack_fields(message["data"], fields, out)
+        else:
+            _pack(message, out)
+
+def has_schema(msg):
+    """True if the message is a hot lobby push that has a compact layout."""
+    if not isinstance(msg, dict) or len(msg) != 2 or not isinstance(msg.get("data"), dict):
+        return False
+    schema = SCHEMA_BY_TYPE.get(msg.get("type"))
+    return schema is not None and set(msg["data"]).issubset(schema[1])
+
+def decode(buf):
+    """Decodes bytes produced by encode()."""
+    msg, _ = _unpack_message(buf, 0)
+    return msg
+
+def _unpack_message(buf, pos):
+    msg_type, fields = SCHEMAS[buf[pos]]
+    data = {}
+    pos += 1
+    for field in fields:
+        if buf[pos] == ABSENT[0]:
+            pos += 1
+        elif field == "messages":
+            data[field], pos = _unpack_batch(buf, pos)
+        else:
+            data[field], pos = _unpack(buf, pos)
+    return {"type": msg_type, "data": data}, pos
+
+def _unpack_batch(buf, pos):
+    b = buf[pos]
+    if 0x90 <= b <= 0x9f:
+        n, pos = b & 0x0f, pos + 1
+    else:
+        width = 2 if b == 0xdc else 4
+        n, pos = int.from_bytes(buf[pos + 1:pos + 1 + width], 'big'), pos + 1 + width
+    messages = []
+    for _ in range(n):
+        # Schema codes are positive fixints; anything else is a plain map
+        if buf[pos] in SCHEMAS:
+            message, pos = _unpack_message(buf, pos)
+        else:
+            message, pos = _unpack(buf, pos)
+        messages.append(message)
+    return messages, pos
+
+def _pack(value, out):
+    if value is None:
+        out.append(b'\xc0')
+    elif value is True:
+        out.append(b'\xc3')
+    elif value is False:
+        out.append(b'\xc2')
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(_pack_u8(value))
+        elif -32 <= value < 0:
+            out.append(_pack_u8(value & 0xff))
+        elif -2**63 <= value < 2**63:
+            out.append(b'\xd3' + _pack_i64(value))
+        else:
+            raise ValueError("Integer out of range for binary encoding")
+    elif isinstance(value, float):
+        out.append(b'\xcb' + _pack_f64(value))
+    elif isinstance(value, str):
+        raw = value.encode('utf-8')
+        n = len(raw)
+        if n < 32:
+            out.append(_pack_u8(0xa0 | n))
+        elif n < 0x100:
+            out.append(b'\xd9' + _pack_u8(n))
+        elif n < 0x10000:
+            out.append(b'\xda' + _pack_u16(n))
+        else:
+            out.append(b'\xdb' + _pack_u32(n))
+        out.append(raw)
+    elif isinstance(value, (list, tuple)):
+        _pack_array_header(len(value), out)
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        n = len(value)
+        if n < 16:
+            out.append(_pack_u8(0x80 | n))
+        elif n < 0x10000:
+            out.append(b'\xde' + _pack_u16(n))
+        else:
+            out.append(b'\xdf' + _pack_u32(n))
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise ValueError("Map keys must be strings")
+            _pack(key, out)
+            _pack(item, out)
+    else:
+        raise ValueError(f"Cannot encode {type(value).__name__}")
+
+def _pack_array_header(n, out):
+    if n < 16:
+        out.append(_pack_u8(0x90 | n))
+    elif n < 0x10000:
+        out.append(b'\xdc' + _pack_u16(n))
+    else:
+        out.append(b'\xdd' + _pack_u32(n))
+
+def _unpack(buf, pos):
+    b = buf[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xe0:
+        return b - 0x100, pos
+    if 0xa0 <= b <= 0xbf:
+        n = b & 0x1f
+        return buf[pos:pos + n].decode('utf-8'), pos + n
+    if 0x90 <= b <= 0x9f:
+        return _unpack_array(buf, pos, b & 0x0f)
+    if 0x80 <= b <= 0x8f:
+        return _unpack_map(buf, pos, b & 0x0f)
+    if b == 0xc0:
+        return None, pos
+    if b == 0xc2:
+        return False, pos
+    if b == 0xc3:
+        return True, pos
+    if b == 0xd3:
+        return struct.unpack_from('>q', buf, pos)[0], pos + 8
+    if b == 0xcb:
+        return struct.unpack_from('>d', buf, pos)[0], pos + 8
+    if b in (0xd9, 0xda, 0xdb):
+        width = {0xd9: 1, 0xda: 2, 0xdb: 4}[b]
+        n = int.from_bytes(buf[pos:pos + width], 'big')
+        pos += width
+        return buf[pos:pos + n].decode('utf-8'), pos + n
+    if b in (0xdc, 0xdd):
+        width = 2 if b == 0xdc else 4
+        return _unpack_array(buf, pos + width, int.from_bytes(buf[pos:pos + width], 'big'))
+    if b in (0xde, 0xdf):
+        width = 2 if b == 0xde else 4
+        return _unpack_map(buf, pos + width, int.from_bytes(buf[pos:pos + width], 'big'))
+    raise ValueError(f"Invalid type byte 0x{b:02x}")
+
+def _unpack_array(buf, pos, n):
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(buf, pos)
+        items.append(item)
+    return items, pos
+
+def _unpack_map(buf, pos, n):
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack(buf, pos)
+        result[key], pos = _unpack(buf, pos)
+    return result, pos
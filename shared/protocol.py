@@ -24,6 +24,11 @@ MSG_LOGOUT = "LOGOUT"
 MSG_ROOM_UPDATE = "ROOM_UPDATE"
 MSG_LEAVE_ROOM = "LEAVE_ROOM"
 MSG_CHAT = "CHAT"
+# Chat and plugin messages a room collected over one tick, when the server batches them
+MSG_BATCH = "BATCH"
+MSG_ADMIN = "ADMIN"
+# Client heartbeat; answered with a pong unless sent with {"reply": False}
+MSG_PING = "PING"
 
 # Response Status
 STATUS_OK = "OK"
@@ -33,17 +38,40 @@ STATUS_ERROR = "ERROR"
 ROLE_DEVELOPER = "DEVELOPER"
 ROLE_PLAYER = "PLAYER"
 
-def create_message(msg_type, data=None):
+# Wire encodings, negotiated at login (JSON unless both sides agree otherwise)
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+SUPPORTED_ENCODINGS = [ENCODING_BINARY, ENCODING_JSON]
+
+# Frame compression, negotiated at login; only frames above a size threshold are compressed
+COMPRESSION_ZLIB = "zlib"
+SUPPORTED_COMPRESSION = [COMPRESSION_ZLIB]
+
+def create_message(msg_type, data=None, request_id=None):
     if data is None:
         data = {}
-    return {
+    msg = {
         "type": msg_type,
         "data": data
     }
+    # Requests tagged with an id may be answered out of order; the response echoes it
+    if request_id is not None:
+        msg["id"] = request_id
+    return msg
 
-def create_response(status, data=None, message=""):
-    return {
+def create_response(status, data=None, message="", request_id=None):
+    response = {
         "status": status,
         "data": data if data else {},
         "message": message
     }
+    if request_id is not None:
+        response["id"] = request_id
+    return response
+
+def negotiate_encoding(offered, supported=SUPPORTED_ENCODINGS):
+    # Pick the first encoding in the client's preference list that we support
+    for encoding in offered or []:
+        if encoding in supported:
+            return encoding
+    return ENCODING_JSON
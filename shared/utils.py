@@ -3,69 +3,330 @@ import struct
 import json
 import os
 import hashlib
+import weakref
+import zlib
+import threading
+import itertools
+from collections import deque
+from shared import codec
+from shared.protocol import ENCODING_JSON, ENCODING_BINARY, MSG_PING, create_message
+
+HEADER = struct.Struct('>I')
+
+# Flags carried in the top two bits of the 4-byte length prefix
+FRAME_BINARY = 0x80000000
+FRAME_COMPRESSED = 0x40000000
+FRAME_LENGTH_MASK = 0x3FFFFFFF
+
+# Frames smaller than this are sent as-is so chat latency is unaffected
+DEFAULT_COMPRESS_THRESHOLD = 1024
+COMPRESS_LEVEL = 1
+
+# Receive buffer size for file transfers
+FILE_CHUNK_SIZE = 256 * 1024
+
+# File stream header: total size, offset the data starts at
+FILE_HEADER = struct.Struct('>QQ')
+
+# Clients ping this often so the server can tell an idle user from a dead connection
+HEARTBEAT_INTERVAL = 30
+# TCP keepalive: first probe after KEEPALIVE_IDLE seconds of silence, then every
+# KEEPALIVE_INTERVAL seconds, giving up after KEEPALIVE_COUNT unanswered probes
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 5
+# Interrupted transfers resume on a boundary of this size
+RESUME_CHUNK_SIZE = 1024 * 1024
+
+class SocketState:
+    """Per-connection state: settings agreed with the peer, the send lock and
+    frames set aside by recv_response while waiting for a specific reply."""
+    def __init__(self):
+        self.encoding = ENCODING_JSON
+        self.compress_threshold = None # None = compression not negotiated
+        # Re-entrant so a response and the file that follows it can be sent atomically
+        self.send_lock = threading.RLock()
+        self.responses = {None: deque()} # request id -> response that arrived early; untagged ones queue under None
+        self.pushes = deque() # unsolicited messages (ROOM_UPDATE, CHAT, ...)
+
+_socket_state = weakref.WeakKeyDictionary() # socket -> SocketState
+_socket_state_lock = threading.Lock()
+
+def socket_state(sock):
+    """Returns the (mutable) connection state of a socket."""
+    state = _socket_state.get(sock)
+    if state is None:
+        with _socket_state_lock:
+            state = _socket_state.get(sock)
+            if state is None:
+                state = _socket_state[sock] = SocketState()
+    return state
+
+def socket_lock(sock):
+    """Lock that serializes writers on a socket (hold it across multi-frame sends)."""
+    return socket_state(sock).send_lock
+
+def encode_frame(data, options=None):
+    """Encodes a message into [length prefix, body] buffers."""
+    flags = 0
+    body = None
+    if options is not None and options.encoding == ENCODING_BINARY and codec.has_schema(data):
+        try:
+            body = codec.encode(data)
+            flags |= FRAME_BINARY
+        except ValueError:
+            # Not representable in the binary encoding, fall back to JSON
+            body = None
+    if body is None:
+        body = json.dumps(data).encode('utf-8')
+    if options is not None and options.compress_threshold is not None and len(body) >= options.compress_threshold:
+        compressed = zlib.compress(body, COMPRESS_LEVEL)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FRAME_COMPRESSED
+    return [HEADER.pack(len(body) | flags), body]
+
+def encode_shared_frame(data, options, cache):
+    """encode_frame for fan-out: recipients with the same wire settings share
+    one bytes object, length prefix included. cache is a dict scoped to one message."""
+    key = (options.encoding, options.compress_threshold)
+    frame = cache.get(key)
+    if frame is None:
+        frame = cache[key] = [b''.join(encode_frame(data, options))]
+    return frame
+
+def decode_frame(header, body):
+    """Decodes a frame body according to the flags in its header."""
+    if header & FRAME_COMPRESSED:
+        body = zlib.decompress(body)
+    if header & FRAME_BINARY:
+        return codec.decode(body)
+    return json.loads(body)
 
 def send_json(sock, data):
-    """Sends a JSON object over the socket with a length prefix."""
-    json_str = json.dumps(data)
-    json_bytes = json_str.encode('utf-8')
-    # Send 4-byte length prefix (big-endian)
-    sock.sendall(struct.pack('>I', len(json_bytes)))
-    sock.sendall(json_bytes)
+    """Sends a message over the socket with a length prefix (JSON unless binary was negotiated)."""
+    state = socket_state(sock)
+    # Header and body go out together so the request is never split across
+    # two segments (avoids Nagle/delayed-ACK stalls)
+    buffers = encode_frame(data, state)
+    with state.send_lock:
+        send_buffers(sock, buffers)
 
 def recv_json(sock):
-    """Receives a JSON object from the socket."""
+    """Receives a message from the socket."""
     # Read 4-byte length prefix
-    len_bytes = recv_all(sock, 4)
+    len_bytes = recv_all(sock, HEADER.size)
     if not len_bytes:
         return None
-    msg_len = struct.unpack('>I', len_bytes)[0]
-    # Read the JSON data
-    json_bytes = recv_all(sock, msg_len)
-    if not json_bytes:
+    header = HEADER.unpack(len_bytes)[0]
+    # Read the body straight into a preallocated buffer
+    body = recv_all(sock, header & FRAME_LENGTH_MASK)
+    if not body:
         return None
-    return json.loads(json_bytes.decode('utf-8'))
+    return decode_frame(header, body)
+
+_request_ids = itertools.count(1)
+
+def send_request(sock, msg_type, data=None):
+    """Sends a request tagged with a fresh correlation id and returns the id."""
+    request_id = next(_request_ids)
+    send_json(sock, create_message(msg_type, data, request_id=request_id))
+    return request_id
+
+def recv_response(sock, request_id=None):
+    """Reads until the response to request_id arrives (None = the next untagged response).
+    Responses to other requests and unsolicited pushes are set aside, not lost."""
+    state = socket_state(sock)
+    while not state.responses.get(request_id):
+        msg = recv_json(sock)
+        if msg is None:
+            return None
+        if "status" not in msg:
+            state.pushes.append(msg)
+        elif msg.get("id") is None:
+            # Several untagged responses can be waiting; they are answered in order
+            state.responses[None].append(msg)
+        else:
+            state.responses[msg["id"]] = msg
+    if request_id is None:
+        return state.responses[None].popleft()
+    return state.responses.pop(request_id)
+
+def request(sock, msg_type, data=None):
+    """Sends one tagged request and waits for its response."""
+    return recv_response(sock, send_request(sock, msg_type, data))
+
+def request_many(sock, requests):
+    """Pipelines (msg_type, data) requests over one socket and returns the
+    responses in the same order; the server may answer them out of order."""
+    request_ids = [send_request(sock, msg_type, data) for msg_type, data in requests]
+    return [recv_response(sock, request_id) for request_id in request_ids]
+
+def pop_pushes(sock):
+    """Returns the pushes set aside by recv_response, oldest first."""
+    pushes = socket_state(sock).pushes
+    result = []
+    while pushes:
+        result.append(pushes.popleft())
+    return result
+
+def start_heartbeat(sock, interval=HEARTBEAT_INTERVAL):
+    """Pings the server every interval seconds from a daemon thread until the
+    socket fails or the returned Event is set. The pings ask for no reply, so
+    nothing turns up in the reads of the client's own request/response flow."""
+    stop = threading.Event()
+    def run():
+        while not stop.wait(interval):
+            try:
+                send_json(sock, create_message(MSG_PING, {"reply": False}))
+            except (OSError, ValueError):
+                return
+    threading.Thread(target=run, name="heartbeat", daemon=True).start()
+    return stop
+
+def enable_keepalive(sock, idle=KEEPALIVE_IDLE, interval=KEEPALIVE_INTERVAL, count=KEEPALIVE_COUNT):
+    """Turns on TCP keepalive so a peer that vanished without closing is noticed
+    after about idle + interval * count seconds, tuned where the platform allows."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+        elif hasattr(socket, "TCP_KEEPALIVE"): # macOS
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+        if hasattr(socket, "TCP_KEEPCNT"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+        if hasattr(socket, "TCP_USER_TIMEOUT"):
+            # Keepalive stays quiet while sent data is unacknowledged; this bounds that case too
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, (idle + interval * count) * 1000)
+    except OSError:
+        pass
+
+def send_buffers(sock, buffers):
+    """Sends a list of buffers, using a single sendmsg call when possible."""
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(buffers))
+        return
+    views = [memoryview(b) for b in buffers]
+    while views:
+        sent = sock.sendmsg(views)
+        # Drop fully sent buffers and trim a partially sent one
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+def recv_into_exact(sock, view):
+    """Fills the whole memoryview from the socket. Returns False on EOF."""
+    received = 0
+    total = len(view)
+    while received < total:
+        n = sock.recv_into(view[received:])
+        if not n:
+            return False
+        received += n
+    return True
 
 def recv_all(sock, n):
     """Helper to receive exactly n bytes."""
-    data = b''
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
-            return None
-        data += packet
+    data = bytearray(n)
+    if not recv_into_exact(sock, memoryview(data)):
+        return None
     return data
 
-def send_file(sock, file_path):
-    """Sends a file over the socket."""
+def send_file(sock, file_path, offset=0):
+    """Sends a file over the socket, starting at offset (for resumed transfers)."""
     file_size = os.path.getsize(file_path)
-    # Send file size first
-    sock.sendall(struct.pack('>Q', file_size))
+    with socket_lock(sock), open(file_path, 'rb') as f:
+        # Send file size and the offset we resume from first
+        sock.sendall(FILE_HEADER.pack(file_size, offset))
+        # Uses os.sendfile where available, so the data never enters Python
+        sock.sendfile(f, offset)
+
+def recv_file(sock, dest_path, chunk_size=FILE_CHUNK_SIZE):
+    """Receives a file from the socket and returns its SHA-256 hex digest
+    (None on failure), hashed as the bytes arrive. A resumed transfer appends
+    to the partial file already at dest_path, which is kept if the transfer fails."""
+    # Read file size and offset
+    header = recv_all(sock, FILE_HEADER.size)
+    if not header:
+        return None
+    file_size, offset = FILE_HEADER.unpack(header)
     
-    with open(file_path, 'rb') as f:
-        while True:
-            chunk = f.read(4096)
-            if not chunk:
-                break
-            sock.sendall(chunk)
-
-def recv_file(sock, dest_path):
-    """Receives a file from the socket."""
-    # Read file size
-    size_bytes = recv_all(sock, 8)
-    if not size_bytes:
-        return False
-    file_size = struct.unpack('>Q', size_bytes)[0]
+    if offset and (not os.path.exists(dest_path) or os.path.getsize(dest_path) < offset):
+        # The bytes are on their way regardless; read past them so the next frame is read from its start
+        _discard(sock, file_size - offset, chunk_size)
+        return None
     
-    with open(dest_path, 'wb') as f:
-        remaining = file_size
-        while remaining > 0:
-            chunk_size = 4096 if remaining > 4096 else remaining
-            chunk = recv_all(sock, chunk_size)
-            if not chunk:
-                return False
-            f.write(chunk)
-            remaining -= len(chunk)
-    return True
+    sha256_hash = hashlib.sha256()
+    # One buffer for the whole transfer, filled in place by recv_into
+    buf = memoryview(bytearray(max(1, min(chunk_size, max(file_size - offset, offset)))))
+    with open(dest_path, 'r+b' if offset else 'wb') as f:
+        # The part we already have only needs hashing
+        kept = offset
+        while kept > 0:
+            n = f.readinto(buf[:min(kept, len(buf))])
+            if not n:
+                _discard(sock, file_size - offset, chunk_size)
+                return None
+            sha256_hash.update(buf[:n])
+            kept -= n
+        f.seek(offset)
+        f.truncate()
+        
+        remaining = file_size - offset
+        try:
+            while remaining > 0:
+                n = sock.recv_into(buf[:min(remaining, len(buf))])
+                if not n:
+                    return None
+                f.write(buf[:n])
+                sha256_hash.update(buf[:n])
+                remaining -= n
+        except OSError:
+            return None
+    return sha256_hash.hexdigest()
+
+def _discard(sock, count, chunk_size=FILE_CHUNK_SIZE):
+    """Reads and drops count bytes of a refused transfer."""
+    buf = memoryview(bytearray(max(1, min(chunk_size, count))))
+    try:
+        while count > 0:
+            n = sock.recv_into(buf[:min(count, len(buf))])
+            if not n:
+                return
+            count -= n
+    except OSError:
+        pass
+
+def resume_point(part_path):
+    """Returns (offset, chunk_sha256) to resume a partial file from.
+    The offset is rounded down to a whole chunk and the digest covers the
+    last chunk before it, so the sender can check both sides hold the same bytes."""
+    if not os.path.exists(part_path):
+        return 0, None
+    offset = os.path.getsize(part_path) // RESUME_CHUNK_SIZE * RESUME_CHUNK_SIZE
+    if offset == 0:
+        return 0, None
+    return offset, _chunk_hash(part_path, offset - RESUME_CHUNK_SIZE)
+
+def verify_resume_point(file_path, offset, chunk_sha256):
+    """Returns the offset to send file_path from: offset if the peer's last
+    chunk matches ours, otherwise 0 (start over)."""
+    if not offset or not chunk_sha256 or offset % RESUME_CHUNK_SIZE:
+        return 0
+    if offset > os.path.getsize(file_path):
+        return 0
+    if _chunk_hash(file_path, offset - RESUME_CHUNK_SIZE) != chunk_sha256:
+        return 0
+    return offset
+
+def _chunk_hash(file_path, start):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(RESUME_CHUNK_SIZE)).hexdigest()
 
 def calculate_file_hash(file_path):
     """Calculates SHA256 hash of a file."""